@@ -0,0 +1,44 @@
+# Generated by Django 5.1.6 on 2026-10-18 10:30
+
+from django.db import migrations
+
+
+def seconds_to_milliseconds(apps, schema_editor):
+    """
+    `process_time_ms` is now stored in milliseconds, scale the alert threshold with it.
+    """
+    Configuration = apps.get_model('api', 'Configuration')
+    for configuration in Configuration.objects.filter(pk='RESPONSE_TIME_THRESHOLD'):
+        try:
+            configuration.value = str(float(configuration.value) * 1000)
+        except ValueError:
+            continue
+        configuration.save(update_fields=['value'])
+
+    # Drop the cached value so the alert task reloads it from PostgreSQL
+    try:
+        from template.redis_client import redis_instance
+        redis_instance.delete('RESPONSE_TIME_THRESHOLD')
+    except Exception:
+        pass
+
+
+def milliseconds_to_seconds(apps, schema_editor):
+    Configuration = apps.get_model('api', 'Configuration')
+    for configuration in Configuration.objects.filter(pk='RESPONSE_TIME_THRESHOLD'):
+        try:
+            configuration.value = str(float(configuration.value) / 1000)
+        except ValueError:
+            continue
+        configuration.save(update_fields=['value'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(seconds_to_milliseconds, milliseconds_to_seconds),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.1.6 on 2026-10-18 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_response_time_threshold_ms'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RequestLogMinuteRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.DateTimeField(verbose_name='bucket')),
+                ('app', models.CharField(max_length=255, verbose_name='app')),
+                ('path', models.TextField(verbose_name='path')),
+                ('method', models.CharField(max_length=8, verbose_name='method')),
+                ('status_code', models.IntegerField(verbose_name='status_code')),
+                ('country_code', models.CharField(default='', max_length=255, verbose_name='country_code')),
+                ('request_count', models.FloatField(verbose_name='request_count')),
+                ('row_count', models.BigIntegerField(verbose_name='row_count')),
+                ('sum_time_ms', models.FloatField(verbose_name='sum_time_ms')),
+                ('min_time_ms', models.FloatField(verbose_name='min_time_ms')),
+                ('max_time_ms', models.FloatField(verbose_name='max_time_ms')),
+            ],
+            options={
+                'db_table': 'request_log_rollup_minute',
+                'constraints': [models.UniqueConstraint(fields=('bucket', 'app', 'path', 'method', 'status_code', 'country_code'), name='request_log_rollup_minute_key')],
+            },
+        ),
+        migrations.CreateModel(
+            name='RequestLogRollupWatermark',
+            fields=[
+                ('app', models.CharField(max_length=255, primary_key=True, serialize=False, verbose_name='app')),
+                ('last_id', models.BigIntegerField(default=0, verbose_name='last_id')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'request_log_rollup_watermark',
+            },
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.1.6 on 2026-10-18 13:00
+
+from django.db import migrations, models
+
+
+def rollup_fields():
+    return [
+        ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+        ('bucket', models.DateTimeField(verbose_name='bucket')),
+        ('app', models.CharField(max_length=255, verbose_name='app')),
+        ('path', models.TextField(verbose_name='path')),
+        ('method', models.CharField(max_length=8, verbose_name='method')),
+        ('status_code', models.IntegerField(verbose_name='status_code')),
+        ('country_code', models.CharField(default='', max_length=255, verbose_name='country_code')),
+        ('request_count', models.FloatField(verbose_name='request_count')),
+        ('row_count', models.BigIntegerField(verbose_name='row_count')),
+        ('sum_time_ms', models.FloatField(verbose_name='sum_time_ms')),
+        ('min_time_ms', models.FloatField(verbose_name='min_time_ms')),
+        ('max_time_ms', models.FloatField(verbose_name='max_time_ms')),
+    ]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_request_log_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RequestLogHourRollup',
+            fields=rollup_fields(),
+            options={
+                'db_table': 'request_log_rollup_hour',
+                'constraints': [models.UniqueConstraint(fields=('bucket', 'app', 'path', 'method', 'status_code', 'country_code'), name='request_log_rollup_hour_key')],
+            },
+        ),
+        migrations.CreateModel(
+            name='RequestLogDayRollup',
+            fields=rollup_fields(),
+            options={
+                'db_table': 'request_log_rollup_day',
+                'constraints': [models.UniqueConstraint(fields=('bucket', 'app', 'path', 'method', 'status_code', 'country_code'), name='request_log_rollup_day_key')],
+            },
+        ),
+        migrations.AddField(
+            model_name='requestlogrollupwatermark',
+            name='hour_compacted_until',
+            field=models.DateTimeField(null=True, verbose_name='hour_compacted_until'),
+        ),
+        migrations.AddField(
+            model_name='requestlogrollupwatermark',
+            name='day_compacted_until',
+            field=models.DateTimeField(null=True, verbose_name='day_compacted_until'),
+        ),
+    ]
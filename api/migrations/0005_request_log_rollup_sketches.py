@@ -0,0 +1,57 @@
+# Generated by Django 5.1.6 on 2026-10-18 14:00
+
+from django.db import migrations, models
+
+# Latency sketches are {cell: weight} objects, merged by adding the weights of equal cells
+CREATE_SKETCH_FUNCTIONS = """
+CREATE OR REPLACE FUNCTION request_log_sketch_merge(a jsonb, b jsonb) RETURNS jsonb
+LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+    SELECT COALESCE(jsonb_object_agg(key, total), '{}'::jsonb)
+    FROM (
+        SELECT key, SUM(value::float8) AS total
+        FROM (
+            SELECT * FROM jsonb_each_text(COALESCE(a, '{}'::jsonb))
+            UNION ALL
+            SELECT * FROM jsonb_each_text(COALESCE(b, '{}'::jsonb))
+        ) AS cells
+        GROUP BY key
+    ) AS merged
+$$;
+
+CREATE OR REPLACE AGGREGATE request_log_sketch_merge_agg(jsonb) (
+    SFUNC = request_log_sketch_merge,
+    STYPE = jsonb,
+    INITCOND = '{}'
+);
+"""
+
+DROP_SKETCH_FUNCTIONS = """
+DROP AGGREGATE IF EXISTS request_log_sketch_merge_agg(jsonb);
+DROP FUNCTION IF EXISTS request_log_sketch_merge(jsonb, jsonb);
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_request_log_rollup_tiers'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='requestlogminuterollup',
+            name='latency_sketch',
+            field=models.JSONField(default=dict, verbose_name='latency_sketch'),
+        ),
+        migrations.AddField(
+            model_name='requestloghourrollup',
+            name='latency_sketch',
+            field=models.JSONField(default=dict, verbose_name='latency_sketch'),
+        ),
+        migrations.AddField(
+            model_name='requestlogdayrollup',
+            name='latency_sketch',
+            field=models.JSONField(default=dict, verbose_name='latency_sketch'),
+        ),
+        migrations.RunSQL(CREATE_SKETCH_FUNCTIONS, DROP_SKETCH_FUNCTIONS),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 5.1.6 on 2026-10-18 15:00
+
+from django.db import migrations, models
+
+# HyperLogLog registers are {register: rank} objects, merged by keeping the highest rank
+CREATE_HLL_FUNCTIONS = """
+CREATE OR REPLACE FUNCTION request_log_hll_merge(a jsonb, b jsonb) RETURNS jsonb
+LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+    SELECT COALESCE(jsonb_object_agg(key, rank), '{}'::jsonb)
+    FROM (
+        SELECT key, MAX(value::int) AS rank
+        FROM (
+            SELECT * FROM jsonb_each_text(COALESCE(a, '{}'::jsonb))
+            UNION ALL
+            SELECT * FROM jsonb_each_text(COALESCE(b, '{}'::jsonb))
+        ) AS registers
+        GROUP BY key
+    ) AS merged
+$$;
+
+CREATE OR REPLACE AGGREGATE request_log_hll_merge_agg(jsonb) (
+    SFUNC = request_log_hll_merge,
+    STYPE = jsonb,
+    INITCOND = '{}'
+);
+"""
+
+DROP_HLL_FUNCTIONS = """
+DROP AGGREGATE IF EXISTS request_log_hll_merge_agg(jsonb);
+DROP FUNCTION IF EXISTS request_log_hll_merge(jsonb, jsonb);
+"""
+
+
+def hll_fields(model_name):
+    return [
+        migrations.AddField(
+            model_name=model_name,
+            name='ip_hll',
+            field=models.JSONField(default=dict, verbose_name='ip_hll'),
+        ),
+        migrations.AddField(
+            model_name=model_name,
+            name='user_agent_hll',
+            field=models.JSONField(default=dict, verbose_name='user_agent_hll'),
+        ),
+    ]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_request_log_rollup_sketches'),
+    ]
+
+    operations = [
+        *hll_fields('requestlogminuterollup'),
+        *hll_fields('requestloghourrollup'),
+        *hll_fields('requestlogdayrollup'),
+        migrations.RunSQL(CREATE_HLL_FUNCTIONS, DROP_HLL_FUNCTIONS),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.1.6 on 2026-10-18 16:00
+
+from django.db import migrations
+
+# One table for the request logs of every application, shaped like request_log_requestlog
+# plus the Application id. Daily partitions are pre-created by Celery Beat.
+CREATE_CENTRAL_TABLE = """
+CREATE TABLE request_log_central (
+    app_id integer NOT NULL,
+    LIKE request_log_requestlog INCLUDING DEFAULTS INCLUDING IDENTITY
+) PARTITION BY RANGE (created_at);
+
+ALTER TABLE request_log_central ADD PRIMARY KEY (app_id, id, created_at);
+CREATE INDEX request_log_central_app_created_idx ON request_log_central (app_id, created_at);
+CREATE INDEX request_log_central_app_route_idx ON request_log_central (app_id, route, created_at);
+CREATE INDEX request_log_central_created_brin ON request_log_central USING brin (created_at) WITH (autosummarize = on);
+CREATE TABLE request_log_central_default PARTITION OF request_log_central DEFAULT;
+"""
+
+DROP_CENTRAL_TABLE = """
+DROP TABLE IF EXISTS request_log_central;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_request_log_rollup_hll'),
+        ('request_log', '0008_requestlog_dimensions'),
+    ]
+
+    operations = [
+        migrations.RunSQL(CREATE_CENTRAL_TABLE, DROP_CENTRAL_TABLE),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.6 on 2026-10-18 18:00
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_request_log_central'),
+    ]
+
+    operations = [
+        # Keyset pagination of the data tables
+        migrations.RunSQL(
+            "CREATE INDEX IF NOT EXISTS request_log_central_created_id_idx ON request_log_central (created_at, id);",
+            "DROP INDEX IF EXISTS request_log_central_created_id_idx;",
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.1.6 on 2026-10-18 19:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_request_log_central_created_id_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='requestlogrollupwatermark',
+            name='safe_id',
+            field=models.BigIntegerField(default=0, verbose_name='safe_id'),
+        ),
+        migrations.AddField(
+            model_name='requestlogrollupwatermark',
+            name='pending_id',
+            field=models.BigIntegerField(default=0, verbose_name='pending_id'),
+        ),
+        migrations.AddField(
+            model_name='requestlogrollupwatermark',
+            name='pending_xid',
+            field=models.BigIntegerField(null=True, verbose_name='pending_xid'),
+        ),
+    ]
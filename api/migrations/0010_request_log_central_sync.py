@@ -0,0 +1,28 @@
+# Generated by Django 5.1.6 on 2026-10-18 19:30
+
+from django.db import migrations
+
+# Commit horizon of the central store sync per application, see request_log.utils.watermark
+CREATE_SYNC_TABLE = """
+CREATE TABLE IF NOT EXISTS request_log_central_sync (
+    app_id integer PRIMARY KEY,
+    safe_id bigint NOT NULL DEFAULT 0,
+    pending_id bigint NOT NULL DEFAULT 0,
+    pending_xid bigint
+);
+"""
+
+DROP_SYNC_TABLE = """
+DROP TABLE IF EXISTS request_log_central_sync;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_request_log_rollup_commit_horizon'),
+    ]
+
+    operations = [
+        migrations.RunSQL(CREATE_SYNC_TABLE, DROP_SYNC_TABLE),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.1.6 on 2026-10-18 21:00
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_request_log_central_sync'),
+    ]
+
+    operations = [
+        # Keyset pagination of the data tables sorted by status code or process time
+        migrations.RunSQL(
+            "CREATE INDEX IF NOT EXISTS request_log_central_status_keyset_idx ON request_log_central (status_code, created_at, id);",
+            "DROP INDEX IF EXISTS request_log_central_status_keyset_idx;",
+        ),
+        migrations.RunSQL(
+            "CREATE INDEX IF NOT EXISTS request_log_central_ptime_keyset_idx ON request_log_central (process_time_ms, created_at, id);",
+            "DROP INDEX IF EXISTS request_log_central_ptime_keyset_idx;",
+        ),
+    ]
@@ -2,4 +2,5 @@ from .application_model import Application
 from .role_model import Role
 from .user_model import User
 from .configuration_model import Configuration
-from .token_model import AuthToken
\ No newline at end of file
+from .token_model import AuthToken
+from .request_log_rollup_model import RequestLogMinuteRollup, RequestLogHourRollup, RequestLogDayRollup, RequestLogRollupWatermark
\ No newline at end of file
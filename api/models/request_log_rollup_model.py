@@ -0,0 +1,66 @@
+from django.db import models
+
+ROLLUP_DIMENSIONS = ['bucket', 'app', 'path', 'method', 'status_code', 'country_code']
+
+class RequestLogRollup(models.Model):
+    """
+    Aggregate of the request logs of one application sharing a time bucket and dimensions.
+    Counts and latency sums are weighted by `sample_weight`, so they estimate all requests.
+    """
+    bucket = models.DateTimeField('bucket')
+    app = models.CharField('app', max_length=255)
+    path = models.TextField('path')  # Normalized, ids replaced by placeholders
+    method = models.CharField('method', max_length=8)
+    status_code = models.IntegerField('status_code')
+    country_code = models.CharField('country_code', max_length=255, default='')  # '' when unknown
+    request_count = models.FloatField('request_count')
+    row_count = models.BigIntegerField('row_count')  # Stored rows, before weighting
+    sum_time_ms = models.FloatField('sum_time_ms')
+    min_time_ms = models.FloatField('min_time_ms')
+    max_time_ms = models.FloatField('max_time_ms')
+    latency_sketch = models.JSONField('latency_sketch', default=dict)  # {cell: weight}, see api.utils.sketch
+    ip_hll = models.JSONField('ip_hll', default=dict)  # {register: rank}, see api.utils.hll
+    user_agent_hll = models.JSONField('user_agent_hll', default=dict)
+
+    class Meta:
+        abstract = True
+
+class RequestLogMinuteRollup(RequestLogRollup):
+    class Meta:
+        db_table = 'request_log_rollup_minute'
+        constraints = [
+            models.UniqueConstraint(fields=ROLLUP_DIMENSIONS, name='request_log_rollup_minute_key'),
+        ]
+
+class RequestLogHourRollup(RequestLogRollup):
+    class Meta:
+        db_table = 'request_log_rollup_hour'
+        constraints = [
+            models.UniqueConstraint(fields=ROLLUP_DIMENSIONS, name='request_log_rollup_hour_key'),
+        ]
+
+class RequestLogDayRollup(RequestLogRollup):
+    class Meta:
+        db_table = 'request_log_rollup_day'
+        constraints = [
+            models.UniqueConstraint(fields=ROLLUP_DIMENSIONS, name='request_log_rollup_day_key'),
+        ]
+
+class RequestLogRollupWatermark(models.Model):
+    """
+    Progress of the rollups of one application: the last request log id folded
+    into the minute tier, and up to when the hour and day tiers are complete.
+    Ids are only folded up to `safe_id`, the commit horizon of
+    `request_log.utils.watermark`, so rows committing late are not skipped.
+    """
+    app = models.CharField('app', max_length=255, primary_key=True)
+    last_id = models.BigIntegerField('last_id', default=0)
+    safe_id = models.BigIntegerField('safe_id', default=0)
+    pending_id = models.BigIntegerField('pending_id', default=0)
+    pending_xid = models.BigIntegerField('pending_xid', null=True)
+    hour_compacted_until = models.DateTimeField('hour_compacted_until', null=True)
+    day_compacted_until = models.DateTimeField('day_compacted_until', null=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'request_log_rollup_watermark'
@@ -1,15 +1,26 @@
 import logging
 import ast
+import json
 import pandas as pd
 from celery import shared_task
 from rest_framework.exceptions import APIException
 from django.core.mail import EmailMessage
 from django.template.loader import render_to_string
 
+from api.models.application_model import Application
 from api.models.configuration_model import Configuration
 from api.views.request_log_view import RequestLogView
 from template.redis_client import redis_instance
+from request_log.utils.stream import RequestLogStreamConsumer
+from api.utils.rollup import compact_rollups, update_minute_rollups
+from api.utils.matview import refresh_view
+from api.utils.streaming import MemoryBudget, PartialAggregate, stream_frames
+from request_log.utils.geoip import enrich_pending_locations
+from request_log.utils.partitions import ensure_partitions
+from request_log.utils.central import CENTRAL_TABLE, sync_central_store
+from request_log.utils.retention import parse_retention_policy, purge_central_request_logs, purge_request_logs as purge_schema_request_logs
 
+from django.conf import settings
 from luna.settings import EMAIL_HOST_USER
 
 logger = logging.getLogger(__name__)
@@ -81,12 +92,32 @@ def check_error_rates_and_alert():
     end_date = pd.Timestamp.now(tz='Asia/Jakarta')
     start_date = end_date - pd.Timedelta(minutes=SEND_EMAIL_EVERY)
 
-    request_logs = RequestLogView.get_all_requestlogs(start_date=start_date, end_date=end_date)
+    # Only what the alert uses, long text columns are left out
+    query, params = RequestLogView.build_requestlog_query(
+        start_date=start_date, end_date=end_date,
+        columns=['path', 'route', 'status_code', 'process_time_ms', 'sample_weight'],
+    ).compile()
 
-    if not request_logs.empty:
-        total_requests = request_logs.shape[0]
-        client_error_requests = request_logs[(request_logs['status_code'] >= 400) & (request_logs['status_code'] < 500)].shape[0]
-        server_error_requests = request_logs[request_logs['status_code'] >= 500].shape[0]
+    # Streamed in chunks folded into sums per route and service, memory follows the number of routes
+    totals = PartialAggregate(['route', 'app_name'], ['total_requests', 'errors_4xx', 'errors_5xx', 'weighted_time'], budget=MemoryBudget())
+    for chunk in stream_frames(query, params):
+        # Sampled rows stand for `sample_weight` requests each, and rows logged before routes existed for their own route
+        weight = RequestLogView.get_weights(chunk)
+        totals.add(chunk.assign(
+            route=chunk['route'].fillna(chunk['path']),
+            total_requests=weight,
+            errors_4xx=weight.where((chunk['status_code'] >= 400) & (chunk['status_code'] < 500), 0),
+            errors_5xx=weight.where(chunk['status_code'] >= 500, 0),
+            weighted_time=chunk['process_time_ms'] * weight,
+        ))
+    url_error_table = totals.result()
+
+    if not url_error_table.empty:
+        total_weight = url_error_table['total_requests'].sum()
+        total_requests = int(round(total_weight))
+        client_error_requests = int(round(url_error_table['errors_4xx'].sum()))
+        server_error_requests = int(round(url_error_table['errors_5xx'].sum()))
+        avg_response_time = url_error_table['weighted_time'].sum() / total_weight
         
         # Percentage of client and server errors
         client_error_percentage = ((client_error_requests / total_requests) * 100) if total_requests > 0 else 0
@@ -94,21 +125,21 @@ def check_error_rates_and_alert():
         error_percentage = client_error_percentage + server_error_percentage
 
         # Check if the error rate or average response time exceeds the threshold exceeds the threshold
-        if (error_percentage < ERROR_THRESHOLD) and (request_logs['process_time_ms'].mean() < RESPONSE_TIME_THRESHOLD):
+        if (error_percentage < ERROR_THRESHOLD) and (avg_response_time < RESPONSE_TIME_THRESHOLD):
             return
 
-        # Group by URL and service name
-        url_error_table = request_logs.groupby(['path', 'app_name']).agg(
-            total_requests=('status_code', 'count'),
-            errors_4xx=('status_code', lambda x: ((x >= 400) & (x < 500)).sum() if not x.empty else 0),
-            errors_5xx=('status_code', lambda x: (x >= 500).sum() if not x.empty else 0)
-        ).reset_index()
+        # Grouped by route and service name, so /users/1 and /users/2 are one row
+        url_error_table = (
+            url_error_table[['route', 'app_name', 'total_requests', 'errors_4xx', 'errors_5xx']]
+            .round()
+            .astype({'total_requests': int, 'errors_4xx': int, 'errors_5xx': int})
+        )
 
         # Filter out rows where both errors_4xx and errors_5xx are zero
         url_error_table = url_error_table[(url_error_table['errors_4xx'] > 0) | (url_error_table['errors_5xx'] > 0)]
         
         url_error_table = url_error_table.rename(columns={
-            'path': 'url', 
+            'route': 'url', 
             'app_name': 'service_name',
         })
         url_error_table = url_error_table.to_dict(orient='records')
@@ -121,7 +152,7 @@ def check_error_rates_and_alert():
             "total_5xx": server_error_requests,
             "error_rate_percent": round(error_percentage, 2),
             "threshold_rate_percent": ERROR_THRESHOLD,
-            "response_time": round(request_logs['process_time_ms'].mean(), 2),
+            "response_time": round(avg_response_time, 2),
             "response_time_threshold": RESPONSE_TIME_THRESHOLD,
             "url_error_table": url_error_table,
         }
@@ -139,4 +170,211 @@ def check_error_rates_and_alert():
         email.send()
         logger.info(f"✅ Email sent successfully")
     else:
-        logger.warning(f"No request logs found from {start_date} to {end_date}.")
\ No newline at end of file
+        logger.warning(f"No request logs found from {start_date} to {end_date}.")
+
+@shared_task(name="api.tasks.consume_request_log_stream")
+def consume_request_log_stream(max_batches=20):
+    """
+    Drain the request log stream into each application's `request_log_requestlog` table.
+    Every worker joins the same consumer group, so running more workers scales ingestion.
+    """
+    allowed_apps = {app.lower() for app in Application.objects.values_list('app', flat=True)}
+    stats = RequestLogStreamConsumer().drain(max_batches=max_batches, allowed_apps=allowed_apps)
+
+    if stats['batches']:
+        logger.info(f"Loaded {stats['loaded']} request logs from stream in {stats['batches']} batches ({stats['dead']} dead-lettered).")
+    if stats['loaded'] and getattr(settings, 'REQUEST_LOG_MATERIALIZED_VIEW_REFRESH_ON_INGEST', False):
+        refresh_request_log_view.delay()
+    return stats
+
+
+@shared_task(name="api.tasks.enrich_request_log_locations")
+def enrich_request_log_locations(max_batches=10):
+    """
+    Fill in GeoIP locations of request logs stored without one, in every application schema.
+    """
+    stats = {}
+    for app in Application.objects.values_list('app', flat=True):
+        schema = app.lower()
+        rows = 0
+        try:
+            for _ in range(max_batches):
+                batch = enrich_pending_locations(schema)
+                rows += batch['rows']
+                if not batch['rows']:
+                    break
+        except Exception as e:
+            logger.error(f"Failed to enrich request log locations of {schema}: {e}")
+        stats[schema] = rows
+
+    if any(stats.values()):
+        logger.info(f"Enriched request log locations: {stats}")
+    return stats
+
+
+@shared_task(name="api.tasks.create_request_log_partitions")
+def create_request_log_partitions():
+    """
+    Pre-create upcoming `request_log_requestlog` partitions in every partitioned application schema.
+    """
+    created = {}
+    for app in Application.objects.values_list('app', flat=True):
+        schema = app.lower()
+        try:
+            names = ensure_partitions(schema)
+        except Exception as e:
+            logger.error(f"Failed to create request log partitions of {schema}: {e}")
+            continue
+        if names:
+            created[schema] = names
+
+    if getattr(settings, 'REQUEST_LOG_CENTRAL_STORE_ENABLED', False):
+        try:
+            names = ensure_partitions(settings.POSTGRES_SCHEMA, table=CENTRAL_TABLE)
+        except Exception as e:
+            logger.error(f"Failed to create central request log partitions: {e}")
+            names = []
+        if names:
+            created[CENTRAL_TABLE] = names
+
+    if created:
+        logger.info(f"Created request log partitions: {created}")
+    return created
+
+
+RETENTION_KEY = 'RETENTION_DAYS'
+RETENTION_REPORT_KEY = 'request_log:retention:last_run'
+
+
+def get_retention_policies(apps):
+    """
+    Build the retention policy of each application from the `RETENTION_DAYS`
+    configuration, overridden per status class by `RETENTION_DAYS_<APP>`.
+    """
+    config_values = dict(Configuration.objects.filter(pk__startswith=RETENTION_KEY).values_list('pk', 'value'))
+    default_policy = parse_retention_policy(config_values.get(RETENTION_KEY))
+
+    policies = {}
+    for app in apps:
+        override = config_values.get(f"{RETENTION_KEY}_{app.upper()}")
+        policies[app.lower()] = {**default_policy, **parse_retention_policy(override)}
+    return policies
+
+
+@shared_task(name="api.tasks.purge_request_logs")
+def purge_request_logs():
+    """
+    Delete request logs older than their retention in every application schema,
+    and in the central store with the policy of each application.
+    The report of the last run is kept in Redis for the request log stats endpoint.
+    """
+    app_ids = dict(Application.objects.values_list('app', 'id'))
+    try:
+        policies = get_retention_policies(app_ids)
+    except (ValueError, SyntaxError) as e:
+        logger.error(f"Invalid request log retention configuration: {e}")
+        return {}
+
+    reports = {}
+    for schema, policy in policies.items():
+        try:
+            reports[schema] = purge_schema_request_logs(schema, policy)
+        except Exception as e:
+            logger.error(f"Failed to purge request logs of {schema}: {e}")
+            reports[schema] = {"schema": schema, "error": str(e)}
+            continue
+        logger.info(f"Purged {reports[schema]['rows']} request logs ({reports[schema]['bytes']} bytes) from {schema}.")
+
+    if getattr(settings, 'REQUEST_LOG_CENTRAL_STORE_ENABLED', False):
+        central_policies = {app_id: policies[app.lower()] for app, app_id in app_ids.items()}
+        try:
+            reports[CENTRAL_TABLE] = purge_central_request_logs(settings.POSTGRES_SCHEMA, central_policies)
+            logger.info(f"Purged {reports[CENTRAL_TABLE]['rows']} request logs ({reports[CENTRAL_TABLE]['bytes']} bytes) from {CENTRAL_TABLE}.")
+        except Exception as e:
+            logger.error(f"Failed to purge request logs of {CENTRAL_TABLE}: {e}")
+            reports[CENTRAL_TABLE] = {"schema": settings.POSTGRES_SCHEMA, "table": CENTRAL_TABLE, "error": str(e)}
+
+    try:
+        redis_instance.set(RETENTION_REPORT_KEY, json.dumps({"finished_at": pd.Timestamp.now(tz='UTC').isoformat(), "reports": reports}))
+    except Exception as e:
+        logger.error(f"Failed to store the retention report: {e}")
+    return reports
+
+
+@shared_task(name="api.tasks.update_request_log_rollups")
+def update_request_log_rollups():
+    """
+    Fold new request logs of every application into the minute rollups, starting from each watermark.
+    """
+    stats = {}
+    for app in Application.objects.values_list('app', flat=True):
+        try:
+            stats[app.lower()] = update_minute_rollups(app)
+        except Exception as e:
+            logger.error(f"Failed to update request log rollups of {app}: {e}")
+
+    if any(result['rows'] for result in stats.values()):
+        logger.info(f"Updated request log rollups: {stats}")
+    return stats
+
+
+@shared_task(name="api.tasks.compact_request_log_rollups")
+def compact_request_log_rollups():
+    """
+    Compact minute rollups into hour rollups and hour rollups into day rollups for every application.
+    """
+    stats = {}
+    for app in Application.objects.values_list('app', flat=True):
+        try:
+            stats[app.lower()] = compact_rollups(app)
+        except Exception as e:
+            logger.error(f"Failed to compact request log rollups of {app}: {e}")
+
+    logger.info(f"Compacted request log rollups: {stats}")
+    return stats
+
+
+@shared_task(name="api.tasks.sync_central_request_logs")
+def sync_central_request_logs():
+    """
+    Copy new request logs of every application schema into the central store.
+    """
+    if not getattr(settings, 'REQUEST_LOG_CENTRAL_STORE_ENABLED', False):
+        return {}
+
+    stats = {}
+    for app_id, app in Application.objects.values_list('id', 'app'):
+        try:
+            stats[app.lower()] = sync_central_store(app_id, app.lower())
+        except Exception as e:
+            logger.error(f"Failed to sync request logs of {app} to the central store: {e}")
+
+    if any(stats.values()):
+        logger.info(f"Synced request logs to the central store: {stats}")
+    return stats
+
+
+MATERIALIZED_VIEW_LOCK_KEY = 'request_log:matview:refresh'
+MATERIALIZED_VIEW_LOCK_TTL = 60 * 30  # seconds
+
+
+@shared_task(name="api.tasks.refresh_request_log_view")
+def refresh_request_log_view(rebuild=False):
+    """
+    Refresh the materialized view combining the request logs of every application schema.
+    Refreshes requested while one is running are skipped, the running one or the next scheduled one covers them.
+    """
+    if not getattr(settings, 'REQUEST_LOG_MATERIALIZED_VIEW_ENABLED', False):
+        return {}
+
+    if not redis_instance.set(MATERIALIZED_VIEW_LOCK_KEY, 1, nx=True, ex=MATERIALIZED_VIEW_LOCK_TTL):
+        return {'skipped': True}
+
+    try:
+        apps = [app.lower() for app in Application.objects.values_list('app', flat=True)]
+        stats = refresh_view(apps, RequestLogView.GUEST_COLUMNS, rebuild=rebuild)
+    finally:
+        redis_instance.delete(MATERIALIZED_VIEW_LOCK_KEY)
+
+    logger.info(f"Refreshed request log materialized view: {stats}")
+    return stats
@@ -1,3 +1,145 @@
-from django.test import TestCase
+import hashlib
 
-# Create your tests here.
+import numpy as np
+import pandas as pd
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+
+from api.utils.hll import PRECISION, REGISTERS, STANDARD_ERROR, estimate, hash_sql, rank_sql, register_sql
+from api.utils.pagination import InvalidCursor, decode_cursor, encode_cursor, keyset_columns, parse_sort
+from api.utils.sketch import QUANTILES, RELATIVE_ACCURACY, cells_of, weighted_quantiles
+
+
+class WeightedQuantilesTests(SimpleTestCase):
+    def assert_within_accuracy(self, estimated, exact):
+        self.assertLessEqual(abs(estimated - exact), RELATIVE_ACCURACY * exact + 1e-9, f"{estimated} is not within accuracy of {exact}")
+
+    def test_quantiles_within_relative_accuracy(self):
+        rng = np.random.default_rng(42)
+        frame = pd.DataFrame({
+            'route': ['/a'] * 5000 + ['/b'] * 5000,
+            'process_time_ms': np.concatenate([rng.lognormal(4, 1, 5000), rng.lognormal(6, 0.5, 5000)]),
+        })
+
+        result = weighted_quantiles(frame, ['route'])
+
+        for route, values in frame.groupby('route')['process_time_ms']:
+            for q in QUANTILES:
+                exact = np.quantile(values, q, method='inverted_cdf')
+                self.assert_within_accuracy(result.loc[route, f"p{round(q * 100):g}"], exact)
+
+    def test_sample_weight_counts_each_row_that_many_times(self):
+        frame = pd.DataFrame({'route': ['/a', '/a'], 'process_time_ms': [10.0, 1000.0], 'sample_weight': [1.0, 99.0]})
+
+        result = weighted_quantiles(frame, ['route'])
+
+        self.assert_within_accuracy(result.loc['/a', 'p50'], 1000.0)
+
+    def test_rollup_sketches_merge_like_raw_rows(self):
+        rng = np.random.default_rng(7)
+        values = rng.lognormal(5, 1, 2000)
+        raw = pd.DataFrame({'route': '/a', 'process_time_ms': values})
+        # Two rollup rows holding the cells of each half of the requests
+        sketches = [pd.Series(cells_of(half)).value_counts().to_dict() for half in (values[:1000], values[1000:])]
+        rollups = pd.DataFrame({'route': ['/a', '/a'], 'latency_sketch': [{str(c): w for c, w in s.items()} for s in sketches]})
+
+        pd.testing.assert_frame_equal(weighted_quantiles(rollups, ['route']), weighted_quantiles(raw, ['route']))
+
+    def test_empty_frame(self):
+        result = weighted_quantiles(pd.DataFrame({'route': [], 'process_time_ms': []}), ['route'])
+
+        self.assertTrue(result.empty)
+        self.assertEqual(list(result.columns), ['p50', 'p95', 'p99'])
+
+
+def register_ranks(values) -> dict:
+    """
+    Returns the `{register: rank}` registers of `values`, the Python twin of
+    `register_sql` and `rank_sql` over `hash_sql`.
+    """
+    registers = {}
+    for value in values:
+        hashed = int(hashlib.md5(("" if value is None else str(value)).encode("utf-8")).hexdigest()[:16], 16)
+        register = hashed & (REGISTERS - 1)
+        rank = 65 - PRECISION - (hashed >> PRECISION).bit_length()
+        registers[register] = max(registers.get(register, 0), rank)
+    return registers
+
+
+class HyperLogLogTests(SimpleTestCase):
+    def ranks(self, groups: dict) -> pd.Series:
+        """
+        Returns the merged ranks of `{group: values}`, indexed by group and register.
+        """
+        rows = [(group, register, rank) for group, values in groups.items() for register, rank in register_ranks(values).items()]
+        frame = pd.DataFrame(rows, columns=['group', 'register', 'rank'])
+        return frame.set_index(['group', 'register'])['rank']
+
+    def test_estimate_known_cardinalities(self):
+        cardinalities = (10, 100, 1000, 10000, 100000)
+        groups = {n: [f"10.0.{i // 256}.{i % 256}" for i in range(n)] for n in cardinalities}
+
+        estimates = estimate(self.ranks(groups), ['group'])
+
+        for n in cardinalities:
+            # Three standard errors, the estimate is deterministic for fixed values
+            self.assertLessEqual(abs(estimates[n] - n), 3 * STANDARD_ERROR * n, f"{estimates[n]} distinct estimated for {n}")
+
+    def test_duplicates_do_not_count(self):
+        values = [f"agent-{i}" for i in range(500)]
+
+        estimates = estimate(self.ranks({'once': values, 'twice': values * 2}), ['group'])
+
+        self.assertEqual(estimates['once'], estimates['twice'])
+
+    def test_registers_merge_by_max_rank(self):
+        values = [f"10.1.{i // 256}.{i % 256}" for i in range(5000)]
+        halves = [register_ranks(values[:2500]), register_ranks(values[2500:])]
+
+        merged = {register: max(half.get(register, 0) for half in halves) for register in set(halves[0]) | set(halves[1])}
+
+        self.assertEqual(merged, register_ranks(values))
+
+    def test_registers_and_ranks_in_range(self):
+        registers = register_ranks(str(i) for i in range(10000))
+
+        self.assertTrue(all(0 <= register < REGISTERS for register in registers))
+        self.assertTrue(all(1 <= rank <= 65 - PRECISION for rank in registers.values()))
+
+
+class HyperLogLogSqlTests(TestCase):
+    def test_sql_registers_match_python(self):
+        values = ['127.0.0.1', '2001:db8::1', 'Mozilla/5.0', '', 'ü']
+        with connection.cursor() as cursor:
+            for value in values:
+                cursor.execute(f"SELECT {register_sql(hash_sql('%s'))}, {rank_sql(hash_sql('%s'))}", [value, value])
+                register, rank = cursor.fetchone()
+                self.assertEqual({register: rank}, register_ranks([value]), value)
+
+
+class CursorTests(SimpleTestCase):
+    def test_round_trip(self):
+        cursor = encode_cursor('-created_at', [pd.Timestamp('2026-01-01T00:00:00+07:00'), np.int64(42), 'myapp'])
+
+        self.assertEqual(decode_cursor(cursor), ('-created_at', ['2026-01-01T00:00:00+07:00', 42, 'myapp']))
+
+    def test_padding_is_stripped(self):
+        cursor = encode_cursor('created_at', ['2026-01-01T00:00:00', 1, 'a'])
+
+        self.assertNotIn('=', cursor)
+        self.assertEqual(decode_cursor(cursor)[0], 'created_at')
+
+    def test_invalid_cursors(self):
+        for cursor in ('', '!!!', 'bm90IGpzb24', 'WzEsMl0', 'eyJzb3J0IjoiY3JlYXRlZF9hdCJ9', '/w'):
+            # Empty, not base64, not JSON, a JSON list, no key, not UTF-8
+            with self.subTest(cursor=cursor), self.assertRaises(InvalidCursor):
+                decode_cursor(cursor)
+
+    def test_sort(self):
+        self.assertEqual(parse_sort(None), ('created_at', True))
+        self.assertEqual(parse_sort('created_at'), ('created_at', False))
+        self.assertEqual(parse_sort('-process_time_ms'), ('process_time_ms', True))
+        self.assertEqual(keyset_columns('created_at'), ['created_at', 'id', 'app_name'])
+        self.assertEqual(keyset_columns('status_code'), ['status_code', 'created_at', 'id', 'app_name'])
+        with self.assertRaises(ValueError):
+            parse_sort('-path')
@@ -0,0 +1,9 @@
+from .rollup import choose_rollup_tier, compact_rollups, get_rollups, update_minute_rollups
+from .sketch import weighted_quantiles
+from .hll import unique_counts
+from .matview import refresh_view, view_exists
+from .aggregation import chart_frame, client_frame, country_counts, merge_phase_frames, phase_frame, recent_errors, route_tables, value_counts
+from .query import RequestLogQuery
+from .fanout import fan_out, fan_out_query, merge_counts, merge_frames
+from .streaming import MemoryBudget, MemoryLimitExceeded, PartialAggregate, read_frame, stream_frames
+from .pagination import decode_cursor, encode_cursor, estimate_count, paginate
@@ -0,0 +1,230 @@
+"""
+Aggregation of request logs inside PostgreSQL for the `overview2` dashboard.
+
+Each function wraps a request log query (see
+`RequestLogView.build_requestlog_query`) in GROUP BY / GROUPING SETS queries,
+so only aggregates are read back and memory does not grow with the number of
+matching rows. Results are shaped like what the pandas builders of
+`RequestLogView` produce from raw rows: weighted frames they can consume
+unchanged, or the finished records of the route, country and error tables.
+"""
+
+import pandas as pd
+from django.db import connection
+
+from api.utils.sketch import CELL_SQL, weighted_quantiles
+
+DASHBOARD_TIMEZONE = 'Asia/Jakarta'
+
+# Fixed-length chart frequencies of `RequestLogView.determine_frequency`, binned like `pd.Grouper(origin=start)`
+TICK_INTERVALS = {'min': '1 minute', '5min': '5 minutes', '10min': '10 minutes', 'h': '1 hour', 'D': '1 day'}
+
+# Routes are keyed alone for the grouped data table and per application for the slowest routes
+ROUTE_SETS = "GROUPING SETS ((route), (app_name, route))"
+
+
+def bucket_sql(freq: str) -> str:
+    """
+    Returns SQL for the chart bucket of `created_at`, see `bucket_params`.
+    Calendar frequencies (weeks, months, years) are read per local day and
+    regrouped by pandas, local days nest exactly in them.
+    """
+    if freq in TICK_INTERVALS:
+        return f"date_bin('{TICK_INTERVALS[freq]}', created_at, %s::timestamptz)"
+    return f"date_trunc('day', created_at, '{DASHBOARD_TIMEZONE}')"
+
+
+def bucket_params(freq: str, start_date) -> list:
+    # Fixed-length buckets start at `start_date`, like the chart range
+    return [start_date] if freq in TICK_INTERVALS else []
+
+
+def logs_sql(source: str) -> str:
+    """
+    Returns the common projection of `source` aggregated by every query below.
+    """
+    return (
+        f"SELECT app_name, COALESCE(route, path) AS route, method, status_code, created_at, "
+        f"COALESCE(sample_weight, 1)::float8 AS weight, process_time_ms, db_time_ms, db_query_count, {CELL_SQL} AS cell "
+        f"FROM ({source}) AS source"
+    )
+
+
+def _read(query: str, params: list) -> pd.DataFrame:
+    return pd.read_sql_query(query, connection, params=params)
+
+
+def _to_dashboard_time(series: pd.Series) -> pd.Series:
+    return pd.to_datetime(series, utc=True).dt.tz_convert(DASHBOARD_TIMEZONE)
+
+
+def chart_frame(source: str, params: list, freq: str, start_date) -> pd.DataFrame:
+    """
+    Returns one weighted row per chart bucket, application, method and status
+    code, with the mean latency and latency sketch of its requests, ordered
+    like raw rows so categories keep their order of first appearance.
+    """
+    query = (
+        f"WITH logs AS (SELECT {bucket_sql(freq)} AS bucket, l.* FROM ({logs_sql(source)}) AS l) "
+        f"SELECT bucket AS created_at, app_name, method, status_code, "
+        f"SUM(weight) AS sample_weight, SUM(weighted_time) / NULLIF(SUM(weight), 0) AS process_time_ms, "
+        f"jsonb_object_agg(cell, weight) AS latency_sketch, MIN(first_seen) AS first_seen "
+        f"FROM ("
+        f"SELECT bucket, app_name, method, status_code, cell, SUM(weight) AS weight, "
+        f"SUM(process_time_ms * weight) AS weighted_time, MIN(created_at) AS first_seen "
+        f"FROM logs GROUP BY 1, 2, 3, 4, 5"
+        f") AS cells "
+        f"GROUP BY 1, 2, 3, 4 ORDER BY created_at, first_seen"
+    )
+    frame = _read(query, [*bucket_params(freq, start_date), *params])
+    frame['created_at'] = _to_dashboard_time(frame['created_at'])
+    return frame
+
+
+def client_frame(source: str, params: list, freq: str, start_date) -> pd.DataFrame:
+    """
+    Returns the distinct clients of every chart bucket and application, enough
+    to count unique IPs and user agents exactly. `source` must select both.
+    """
+    query = (
+        f"SELECT {bucket_sql(freq)} AS created_at, app_name, ip_address, user_agent, MIN(created_at) AS first_seen "
+        f"FROM ({source}) AS source "
+        f"GROUP BY 1, 2, 3, 4 ORDER BY first_seen"
+    )
+    frame = _read(query, [*bucket_params(freq, start_date), *params])
+    frame['created_at'] = _to_dashboard_time(frame['created_at'])
+    return frame
+
+
+def phase_frame(source: str, params: list) -> pd.DataFrame:
+    """
+    Returns a single weighted row with the mean time of each request phase and
+    the number of matching rows in `row_count`.
+    """
+    columns = ('auth_time_ms', 'view_time_ms', 'db_time_ms', 'serialize_time_ms', 'process_time_ms', 'db_query_count')
+    weight = "COALESCE(sample_weight, 1)::float8"
+    means = ", ".join(f"SUM({column} * {weight}) / NULLIF(SUM({weight}), 0) AS {column}" for column in columns)
+    query = f"SELECT COUNT(*) AS row_count, SUM({weight}) AS sample_weight, {means} FROM ({source}) AS source"
+    return _read(query, params)
+
+
+def merge_phase_frames(frames: list) -> pd.DataFrame:
+    """
+    Combines `phase_frame` rows of disjoint sets of logs into one.
+    """
+    frame = pd.concat(frames, ignore_index=True)
+    weights = frame['sample_weight'].fillna(0)
+    total_weight = weights.sum()
+    merged = {'row_count': int(frame['row_count'].sum()), 'sample_weight': total_weight}
+    for column in frame.columns.drop(['row_count', 'sample_weight']):
+        # Each mean is a weighted sum over the weight of its own logs
+        merged[column] = (frame[column].fillna(0) * weights).sum() / total_weight if total_weight else None
+    return pd.DataFrame([merged])
+
+
+def route_tables(source: str, params: list) -> tuple:
+    """
+    Returns the records of the top 50 slowest routes per application and of
+    the grouped data table per route, computed in one pass over `source`.
+    Counts and means are weighted by sample weight.
+    """
+    query = (
+        f"WITH logs AS ({logs_sql(source)}), "
+        f"stats AS ("
+        f"SELECT GROUPING(app_name) = 1 AS by_route, app_name, route, "
+        f"SUM(weight) AS count, SUM(process_time_ms * weight) / NULLIF(SUM(weight), 0) AS avg_process_time_ms, "
+        f"MIN(process_time_ms) AS min_process_time_ms, MAX(process_time_ms) AS max_process_time_ms, "
+        f"SUM(db_time_ms * weight) / NULLIF(SUM(weight), 0) AS avg_db_time_ms, "
+        f"SUM(db_query_count * weight) / NULLIF(SUM(weight), 0) AS avg_db_query_count, "
+        f"array_agg(DISTINCT status_code ORDER BY status_code) AS status_codes, MAX(created_at) AS last_activity, "
+        f"COALESCE(SUM(weight) FILTER (WHERE status_code < 400), 0) AS success_count, "
+        f"COALESCE(SUM(weight) FILTER (WHERE status_code >= 400 AND status_code < 500), 0) AS client_error_count, "
+        f"COALESCE(SUM(weight) FILTER (WHERE status_code >= 500), 0) AS server_error_count "
+        f"FROM logs GROUP BY {ROUTE_SETS}"
+        f"), "
+        # Methods in order of first use, like `Series.unique` on rows sorted by time
+        f"methods AS ("
+        f"SELECT by_route, app_name, route, array_agg(method ORDER BY first_seen, method) AS methods "
+        f"FROM (SELECT GROUPING(app_name) = 1 AS by_route, app_name, route, method, MIN(created_at) AS first_seen "
+        f"FROM logs GROUP BY GROUPING SETS ((route, method), (app_name, route, method))) AS route_methods "
+        f"GROUP BY 1, 2, 3"
+        f"), "
+        f"sketches AS ("
+        f"SELECT by_route, app_name, route, jsonb_object_agg(cell, weight) AS latency_sketch "
+        f"FROM (SELECT GROUPING(app_name) = 1 AS by_route, app_name, route, cell, SUM(weight) AS weight "
+        f"FROM logs GROUP BY GROUPING SETS ((route, cell), (app_name, route, cell))) AS route_cells "
+        f"GROUP BY 1, 2, 3"
+        f") "
+        f"SELECT s.*, m.methods, k.latency_sketch FROM stats s "
+        f"JOIN methods m ON m.by_route = s.by_route AND m.route = s.route AND m.app_name IS NOT DISTINCT FROM s.app_name "
+        f"JOIN sketches k ON k.by_route = s.by_route AND k.route = s.route AND k.app_name IS NOT DISTINCT FROM s.app_name"
+    )
+    frame = _read(query, params)
+    frame['last_activity'] = _to_dashboard_time(frame['last_activity'])
+    # Requests stood for by sampled rows, as whole numbers like the summary stats
+    for column in ('count', 'success_count', 'client_error_count', 'server_error_count'):
+        frame[column] = frame[column].round().astype(int)
+
+    percentile_columns = ['p50_process_time_ms', 'p95_process_time_ms', 'p99_process_time_ms']
+
+    # ========== Top 50 Slowest Routes ==========
+    app_routes = frame[~frame['by_route']]
+    top_50 = app_routes.sort_values(by='avg_process_time_ms', ascending=False).head(50)
+    percentiles = weighted_quantiles(top_50, ['app_name', 'route']).round(4).add_suffix('_process_time_ms').reset_index()
+    top_50 = top_50.merge(percentiles, on=['app_name', 'route'], how='left')
+    for column in ('avg_process_time_ms', 'avg_db_time_ms', 'avg_db_query_count'):
+        top_50[column] = top_50[column].round(4)
+    top_50['path'] = top_50['route']  # Kept for clients reading the route as `path`
+    top_50 = top_50[['app_name', 'route', 'avg_process_time_ms', 'avg_db_time_ms', 'avg_db_query_count', 'methods', *percentile_columns, 'path']]
+
+    # ========== Grouped Data Table ==========
+    routes = frame[frame['by_route']]
+    percentiles = weighted_quantiles(routes, ['route']).round(4).add_suffix('_process_time_ms').reset_index()
+    grouped_data = routes.merge(percentiles, on='route', how='left')
+    for column in ('avg_process_time_ms', 'min_process_time_ms', 'max_process_time_ms'):
+        grouped_data[column] = grouped_data[column].round(4)
+    grouped_data['path'] = grouped_data['route']
+    grouped_data = grouped_data[[
+        'route', 'methods', 'avg_process_time_ms', 'min_process_time_ms', 'max_process_time_ms', 'status_codes',
+        'last_activity', 'count', 'success_count', 'client_error_count', 'server_error_count', *percentile_columns, 'path',
+    ]].sort_values(by='count', ascending=False)
+
+    return top_50.to_dict(orient='records'), grouped_data.to_dict(orient='records')
+
+
+def value_counts(source: str, params: list, column: str) -> pd.DataFrame:
+    """
+    Returns the number of requests per value of `column`, most first, like `Series.value_counts`.
+    """
+    query = f"SELECT {column}, COUNT(*) AS count FROM ({source}) AS source GROUP BY 1 ORDER BY count DESC"
+    return _read(query, params)
+
+
+def country_counts(source: str, params: list, limit: int = None) -> pd.DataFrame:
+    """
+    Returns the number of requests per country, most first, rows without a
+    country counting as 'Unknown'.
+    """
+    query = (
+        f"SELECT COALESCE(country_name, 'Unknown') AS country_name, country_code, COUNT(*) AS value "
+        f"FROM ({source}) AS source "
+        f"WHERE TRIM(COALESCE(country_name, 'Unknown')) <> '' AND country_code IS NOT NULL "
+        f"GROUP BY 1, 2 ORDER BY value DESC"
+    )
+    if limit is not None:
+        query += " LIMIT %s"
+        params = [*params, limit]
+    return _read(query, params)
+
+
+def recent_errors(source: str, params: list, limit: int = 50) -> pd.DataFrame:
+    """
+    Returns the most recent failed requests, newest first.
+    """
+    query = (
+        f"SELECT id, path, method, status_code, error_message, created_at, app_name "
+        f"FROM ({source}) AS source WHERE status_code >= 400 ORDER BY created_at DESC LIMIT %s"
+    )
+    frame = _read(query, [*params, limit])
+    frame['created_at'] = _to_dashboard_time(frame['created_at'])
+    return frame
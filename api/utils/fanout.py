@@ -0,0 +1,171 @@
+"""
+Parallel per-application execution of request log queries.
+
+`fan_out_query` runs a function on every branch of a `RequestLogQuery`
+concurrently, each on its own database connection. Connections belong to the
+threads of one process-wide pool of `REQUEST_LOG_FANOUT_MAX_CONNECTIONS`
+workers, so concurrent dashboards share a bounded number of them. Every
+branch runs under `REQUEST_LOG_FANOUT_TIMEOUT_MS`; a branch failing or timing
+out is reported in `FanoutResult.failures` instead of failing the others.
+Other errors are raised, they are not about one branch. The `merge_*`
+helpers combine the per-branch results.
+"""
+
+import heapq
+import logging
+import threading
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import pandas as pd
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections, connection, transaction
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_CONNECTIONS = 8
+DEFAULT_TIMEOUT_MS = 30000
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_max_connections() -> int:
+    return getattr(settings, 'REQUEST_LOG_FANOUT_MAX_CONNECTIONS', DEFAULT_MAX_CONNECTIONS)
+
+
+def get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=get_max_connections(), thread_name_prefix='request-log-fanout')
+        return _executor
+
+
+class FanoutResult:
+    """
+    Results of a fan-out by branch name, and the error of each failed branch.
+    """
+
+    def __init__(self):
+        self.results = {}
+        self.failures = {}
+
+    @property
+    def is_partial(self) -> bool:
+        return bool(self.failures)
+
+    def values(self) -> list:
+        return list(self.results.values())
+
+
+def run_with_timeout(function, timeout_ms: int):
+    """
+    Call `function` with queries cancelled by Postgres after `timeout_ms`.
+    """
+    if connection.in_atomic_block:
+        # SET LOCAL would outlive this call in the caller's transaction
+        return function()
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL statement_timeout = %s", [int(timeout_ms)])
+        return function()
+
+
+def _run_in_worker(function, timeout_ms: int):
+    # Worker threads keep their connection between tasks, drop it once unusable or past CONN_MAX_AGE
+    close_old_connections()
+    try:
+        return run_with_timeout(function, timeout_ms)
+    finally:
+        close_old_connections()
+
+
+def fan_out(tasks: dict, timeout_ms: int = None) -> FanoutResult:
+    """
+    Run `tasks` (name to function without arguments) concurrently and collect
+    their results. A single task runs inline on the caller's connection.
+    Raises the first error when every task failed.
+    """
+    timeout_ms = timeout_ms or getattr(settings, 'REQUEST_LOG_FANOUT_TIMEOUT_MS', DEFAULT_TIMEOUT_MS)
+    result = FanoutResult()
+    errors = {}
+
+    if len(tasks) == 1:
+        (name, function), = tasks.items()
+        result.results[name] = run_with_timeout(function, timeout_ms)
+        return result
+
+    futures = {get_executor().submit(_run_in_worker, function, timeout_ms): name for name, function in tasks.items()}
+    # Tasks queue for a free connection, allow one timeout per round of the pool
+    rounds = -(-len(tasks) // get_max_connections())
+    done, pending = wait(futures, timeout=timeout_ms / 1000 * rounds + 1)
+
+    for future in done:
+        name = futures[future]
+        try:
+            result.results[name] = future.result()
+        except DatabaseError as e:
+            logger.warning(f"Request log query of {name} failed: {e}")
+            errors[name] = e
+            result.failures[name] = str(e).strip() or e.__class__.__name__
+    for future in pending:
+        future.cancel()
+        result.failures[futures[future]] = "Timed out"
+
+    if not result.results and errors:
+        raise next(iter(errors.values()))
+    # Keep the order of `tasks`, merges relying on it stay deterministic
+    result.results = {name: result.results[name] for name in tasks if name in result.results}
+    return result
+
+
+def fan_out_query(query, function, *args, timeout_ms: int = None) -> FanoutResult:
+    """
+    Call `function(sql, params, *args)` on every branch of `query`, see `RequestLogQuery.split`.
+    """
+    tasks = {}
+    for name, branch_query in query.split():
+        sql, params = branch_query.compile()
+        tasks[name] = lambda sql=sql, params=params: function(sql, params, *args)
+    if not tasks:
+        # No branch, the query still compiles to an empty result
+        sql, params = query.compile()
+        tasks[None] = lambda: function(sql, params, *args)
+    return fan_out(tasks, timeout_ms=timeout_ms)
+
+
+def merge_frames(frames: list, by: list = None, ascending: bool = True, limit: int = None) -> pd.DataFrame:
+    """
+    Concatenate per-branch frames, each already sorted by `by` when given,
+    into one sorted frame, keeping the first `limit` rows.
+    """
+    frames = [frame for frame in frames if not frame.empty] or frames[:1]
+    if not frames:
+        return pd.DataFrame()
+    if by and limit is not None:
+        # k-way merge of the sorted heads, only `limit` rows are ever read
+        columns = [frame.columns.get_loc(column) for column in by]
+        runs = [
+            ((tuple(row[column] for column in columns), row) for row in frame.head(limit).itertuples(index=False))
+            for frame in frames
+        ]
+        rows = [row for _, row in islice(heapq.merge(*runs, key=lambda item: item[0], reverse=not ascending), limit)]
+        return pd.DataFrame(rows, columns=frames[0].columns)
+
+    merged = pd.concat(frames, ignore_index=True)
+    if by:
+        # The stable sort merges the sorted runs instead of sorting from scratch
+        merged = merged.sort_values(by=by, ascending=ascending, kind='stable', ignore_index=True)
+    return merged.head(limit) if limit is not None else merged
+
+
+def merge_counts(frames: list, keys: list, value: str, limit: int = None) -> pd.DataFrame:
+    """
+    Sum `value` of per-branch counts by `keys`, largest first.
+    """
+    if not frames:
+        return pd.DataFrame(columns=[*keys, value])
+    merged = pd.concat([frame for frame in frames if not frame.empty] or frames[:1], ignore_index=True)
+    merged = merged.groupby(keys, as_index=False, sort=False)[value].sum().sort_values(by=value, ascending=False, kind='stable')
+    return merged.head(limit) if limit is not None else merged
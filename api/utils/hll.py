@@ -0,0 +1,81 @@
+"""
+HyperLogLog counters of unique clients.
+
+Every rollup row keeps the HLL registers of the IP addresses and user agents
+it covers as sparse `{register: rank}` JSON. Registers merge by taking the
+maximum rank, so any set of buckets and applications can be combined, and
+the distinct count read back has a standard error of `STANDARD_ERROR`
+(about 3.25%) with at most `REGISTERS` entries per row.
+"""
+
+import math
+
+import numpy as np
+import pandas as pd
+
+PRECISION = 10
+REGISTERS = 1 << PRECISION
+STANDARD_ERROR = 1.04 / math.sqrt(REGISTERS)
+ALPHA = 0.7213 / (1 + 1.079 / REGISTERS)
+
+
+def hash_sql(expression: str) -> str:
+    """
+    Returns SQL for a 64-bit hash of `expression`, from the first half of its md5.
+    """
+    return f"('x' || substr(md5(COALESCE(({expression})::text, '')), 1, 16))::bit(64)::bigint"
+
+
+def register_sql(hashed: str) -> str:
+    return f"({hashed} & {REGISTERS - 1})"
+
+
+def rank_sql(hashed: str) -> str:
+    """
+    Returns SQL for the position of the first set bit above the register bits.
+    """
+    return f"({65 - PRECISION} - length(ltrim((({hashed}) >> {PRECISION})::bit({64 - PRECISION})::text, '0')))"
+
+
+def estimate(ranks: pd.Series, group_names: list) -> pd.Series:
+    """
+    Returns the estimated distinct count per group from the merged `ranks`
+    of its non-empty registers (indexed by group and register).
+    """
+    filled = ranks.groupby(level=group_names).count()
+    empty = REGISTERS - filled
+    # Empty registers count as rank 0
+    harmonic = np.power(2.0, -ranks.astype(float)).groupby(level=group_names).sum() + empty
+    raw = ALPHA * REGISTERS * REGISTERS / harmonic
+
+    # Linear counting is more accurate while many registers are still empty
+    small = (raw <= 2.5 * REGISTERS) & (empty > 0)
+    linear = REGISTERS * np.log(REGISTERS / empty.where(empty > 0, 1))
+    return raw.where(~small, linear).round()
+
+
+def unique_counts(frame: pd.DataFrame, keys: list, hll_column: str, raw_column: str):
+    """
+    Returns the number of distinct clients per group of `keys` (column names
+    or a `pd.Grouper`), merging the `hll_column` registers of rollup rows, or
+    counting `raw_column` exactly on raw request logs. `None` when neither is present.
+    """
+    names = [key.key if isinstance(key, pd.Grouper) else key for key in keys]
+
+    if hll_column not in frame.columns:
+        if raw_column not in frame.columns:
+            return None
+        return frame.groupby(keys, observed=True)[raw_column].nunique()
+
+    index, registers, ranks = [], [], []
+    for row, registers_of_row in zip(frame.index, frame[hll_column]):
+        for register, rank in (registers_of_row or {}).items():
+            index.append(row)
+            registers.append(int(register))
+            ranks.append(int(rank))
+    if not index:
+        return pd.Series(dtype=float)
+
+    cells = pd.DataFrame({'register': registers, 'rank': ranks}, index=pd.Index(index, dtype=frame.index.dtype)).join(frame[names])
+    merged = cells.groupby([*keys, 'register'], observed=True)['rank'].max()
+    return estimate(merged, names)
@@ -0,0 +1,117 @@
+"""
+Materialized view combining the request logs of every application schema.
+
+`request_log_combined` holds the dashboard columns of all
+`{app}.request_log_requestlog` tables plus `app_name`, with its own indexes,
+so dashboards read one relation instead of planning a union over every
+schema. It is refreshed with `REFRESH MATERIALIZED VIEW CONCURRENTLY`, which
+keeps it readable, and rebuilt under a new name then swapped in when the set
+of applications, columns or indexes changes.
+"""
+
+import logging
+import time
+
+from django.db import connection, transaction
+
+from request_log.utils.dimensions import DIMENSIONS, decode_sql
+from request_log.utils.schema import qualified_table, validate_schema
+
+logger = logging.getLogger(__name__)
+
+VIEW_NAME = 'request_log_combined'
+BUILD_SUFFIX = 'build'
+SIGNATURE_PREFIX = 'request_log_combined:'
+
+# (name suffix, definition), the unique index is what allows concurrent refreshes
+VIEW_INDEXES = (
+    ('app_id_uniq', 'UNIQUE INDEX {name} ON {view} (app_name, id)'),
+    ('created_idx', 'INDEX {name} ON {view} (created_at)'),
+    ('created_id_idx', 'INDEX {name} ON {view} (created_at, id)'),  # Keyset pagination
+    ('status_keyset_idx', 'INDEX {name} ON {view} (status_code, created_at, id)'),
+    ('ptime_keyset_idx', 'INDEX {name} ON {view} (process_time_ms, created_at, id)'),
+    ('app_created_idx', 'INDEX {name} ON {view} (app_name, created_at)'),
+    ('route_created_idx', 'INDEX {name} ON {view} (route, created_at)'),
+    ('status_created_idx', 'INDEX {name} ON {view} (status_code, created_at)'),
+)
+
+
+def view_signature(apps: list, columns: list) -> str:
+    # Indexes are part of it, so a view built without a new index is rebuilt
+    indexes = ','.join(suffix for suffix, _ in VIEW_INDEXES)
+    return f"{SIGNATURE_PREFIX}{','.join(sorted(apps))}|{','.join(columns)}|{indexes}"
+
+
+def view_definition_sql(apps: list, columns: list) -> str:
+    """
+    Returns the `SELECT` of the view over the request log tables of `apps`.
+    """
+    branches = []
+    for app in sorted(apps):
+        schema = validate_schema(app.lower())
+        select = ", ".join(f"{decode_sql(schema, column)} AS {column}" if column in DIMENSIONS else column for column in columns)
+        branches.append(f"SELECT {select}, '{schema}'::text AS app_name FROM {qualified_table(schema)}")
+    return " UNION ALL ".join(branches)
+
+
+def get_view_signature() -> "str | None":
+    """
+    Returns the signature stored on the view, `None` when it does not exist.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT to_regclass(%s) IS NOT NULL, obj_description(to_regclass(%s), 'pg_class')", [VIEW_NAME, VIEW_NAME])
+        exists, comment = cursor.fetchone()
+    if not exists:
+        return None
+    return comment or ''
+
+
+def view_exists() -> bool:
+    return get_view_signature() is not None
+
+
+def build_view(apps: list, columns: list) -> None:
+    """
+    Create the view for `apps` under a temporary name and swap it in, so
+    readers only wait for the renames.
+    """
+    quote = connection.ops.quote_name
+    build_name = f"{VIEW_NAME}_{BUILD_SUFFIX}"
+    with connection.cursor() as cursor:
+        cursor.execute(f"DROP MATERIALIZED VIEW IF EXISTS {quote(build_name)}")
+        cursor.execute(f"CREATE MATERIALIZED VIEW {quote(build_name)} AS {view_definition_sql(apps, columns)} WITH DATA")
+        for suffix, definition in VIEW_INDEXES:
+            cursor.execute(f"CREATE {definition.format(name=quote(f'{build_name}_{suffix}'), view=quote(build_name))}")
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"DROP MATERIALIZED VIEW IF EXISTS {quote(VIEW_NAME)}")
+        cursor.execute(f"ALTER MATERIALIZED VIEW {quote(build_name)} RENAME TO {quote(VIEW_NAME)}")
+        for suffix, _ in VIEW_INDEXES:
+            cursor.execute(f"ALTER INDEX {quote(f'{build_name}_{suffix}')} RENAME TO {quote(f'{VIEW_NAME}_{suffix}')}")
+        cursor.execute(f"COMMENT ON MATERIALIZED VIEW {quote(VIEW_NAME)} IS %s", [view_signature(apps, columns)])
+
+
+def refresh_view(apps: list, columns: list, rebuild: bool = False) -> dict:
+    """
+    Refresh the view concurrently, or rebuild it when it is missing, `rebuild`
+    is set or it was built for other applications, columns or indexes.
+    """
+    started = time.perf_counter()
+    signature = get_view_signature()
+    rebuilt = rebuild or signature != view_signature(apps, columns)
+
+    if not apps:
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP MATERIALIZED VIEW IF EXISTS {connection.ops.quote_name(VIEW_NAME)}")
+        return {'rebuilt': False, 'rows': 0, 'elapsed_ms': 0}
+
+    if rebuilt:
+        build_view(apps, columns)
+    else:
+        with connection.cursor() as cursor:
+            cursor.execute(f"REFRESH MATERIALIZED VIEW CONCURRENTLY {connection.ops.quote_name(VIEW_NAME)}")
+
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT GREATEST(reltuples, 0)::bigint FROM pg_class WHERE oid = to_regclass(%s)", [VIEW_NAME])
+        rows = cursor.fetchone()[0]
+    return {'rebuilt': rebuilt, 'rows': rows, 'elapsed_ms': round((time.perf_counter() - started) * 1000, 4)}
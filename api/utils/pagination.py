@@ -0,0 +1,108 @@
+"""
+Keyset pagination of request logs.
+
+A page is read with `RequestLogQuery.seek` from where the previous one ended
+instead of with an `OFFSET`, so every page costs an index seek and the page
+size, however deep. Rows are ordered by the sort column then by
+`(created_at, id, app_name)`, which is unique across applications. Cursors are
+opaque to clients: URL-safe base64 JSON of the sort and the key of the last row.
+"""
+
+import base64
+import binascii
+import json
+
+from django.db import connection
+
+from api.utils.fanout import fan_out_query, merge_frames
+from api.utils.streaming import read_frame
+
+# Only sorts every source has a (column, created_at, id) index for, others would sort all matching rows
+SORT_FIELDS = ('created_at', 'process_time_ms', 'status_code')
+TIEBREAK_COLUMNS = ['created_at', 'id', 'app_name']
+DEFAULT_SORT = '-created_at'
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def parse_sort(sort: str) -> tuple:
+    """
+    Returns `(column, descending)` of a sort like `-created_at`.
+    """
+    sort = sort or DEFAULT_SORT
+    column = sort.removeprefix('-')
+    if column not in SORT_FIELDS:
+        raise ValueError(f"sort must be one of {', '.join(SORT_FIELDS)}, optionally prefixed with '-'")
+    return column, sort.startswith('-')
+
+
+def keyset_columns(column: str) -> list:
+    return TIEBREAK_COLUMNS if column == 'created_at' else [column, *TIEBREAK_COLUMNS]
+
+
+def _json_value(value):
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value.item() if hasattr(value, 'item') else value
+
+
+def encode_cursor(sort: str, values: list) -> str:
+    payload = json.dumps({'sort': sort, 'key': [_json_value(value) for value in values]}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> tuple:
+    """
+    Returns `(sort, key)` of a cursor made by `encode_cursor`.
+    """
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        return payload['sort'], payload['key']
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError, KeyError) as e:
+        raise InvalidCursor("Invalid cursor") from e
+
+
+def estimate_count(query) -> int:
+    """
+    Returns the planner's estimate of the number of rows of `query`, read from
+    `EXPLAIN` without running it.
+    """
+    sql, params = query.compile()
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        plan = cursor.fetchone()[0]
+    plan = json.loads(plan) if isinstance(plan, str) else plan
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+def paginate(query, sort: str = None, cursor: str = None, page_size: int = None) -> dict:
+    """
+    Returns the page of `query` after `cursor`, as `results` (a DataFrame),
+    `next_cursor` (`None` on the last page) and `failed_applications`.
+    Applications are read concurrently and their pages merged.
+    """
+    sort = sort or DEFAULT_SORT
+    column, descending = parse_sort(sort)
+    page_size = min(max(int(page_size or DEFAULT_PAGE_SIZE), 1), MAX_PAGE_SIZE)
+    columns = keyset_columns(column)
+
+    query = query.copy().order_by(*(f"-{name}" if descending else name for name in columns)).limit(page_size + 1)
+    if cursor:
+        cursor_sort, key = decode_cursor(cursor)
+        if cursor_sort != sort or len(key) != len(columns):
+            raise InvalidCursor("Cursor does not match the sort")
+        query = query.seek(columns, key, descending=descending)
+
+    result = fan_out_query(query, read_frame)
+    # One extra row tells whether a next page exists
+    rows = merge_frames(result.values(), by=columns, ascending=not descending, limit=page_size + 1)
+    page = rows.head(page_size)
+
+    next_cursor = None
+    if len(rows) > page_size:
+        next_cursor = encode_cursor(sort, [page.iloc[-1][name] for name in columns])
+    return {'results': page, 'next_cursor': next_cursor, 'failed_applications': result.failures}
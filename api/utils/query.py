@@ -0,0 +1,195 @@
+"""
+Composable, parameterized request log queries.
+
+A `RequestLogQuery` reads the same columns from one or more branches, a
+branch being a relation holding request logs (an application's table, the
+central store or the materialized view). It compiles to a `UNION ALL` of its
+branches with every filter repeated inside each of them, so each branch is
+planned against its own indexes and partitions, and every value is bound as
+a parameter.
+"""
+
+import copy
+
+from django.db import connection
+
+
+class Branch:
+    """
+    A relation request logs are read from, named after the application it
+    holds by default. `expressions` maps the columns not stored as-is to
+    `(sql, params)`, `condition` and `params` restrict it to the rows of the branch.
+    `predicates` maps columns to a function of the filtered values returning
+    `(sql, params)`, for columns better filtered than through their expression.
+    """
+
+    def __init__(self, table: str, expressions: dict = None, condition: str = None, params: list = None, name: str = None, predicates: dict = None):
+        self.table = table
+        self.name = name or table
+        self.expressions = expressions or {}
+        self.condition = condition
+        self.params = list(params or [])
+        self.predicates = predicates or {}
+
+    def expression(self, column: str) -> tuple:
+        return self.expressions.get(column, (column, []))
+
+
+class RequestLogQuery:
+    """
+    Builds the `SELECT` of `columns` over request log branches, e.g.
+
+        query = RequestLogQuery(['id', 'path', 'created_at'])
+        query.add_branch('myapp.request_log_requestlog')
+        query.filter('status_code', [500, 502]).between('created_at', start, end).order_by('-created_at')
+        sql, params = query.compile()
+
+    Filters and ordering refer to columns by name and are applied to each
+    branch's expression of them. Filter methods return the query for chaining.
+    """
+
+    def __init__(self, columns: list):
+        self.columns = list(columns)
+        self.branches = []
+        self.filters = []  # (column, operator, values)
+        self.ordering = []
+        self.limit_value = None
+
+    def add_branch(self, table: str, expressions: dict = None, condition: str = None, params: list = None, name: str = None, predicates: dict = None) -> "RequestLogQuery":
+        self.branches.append(Branch(table, expressions, condition, params, name, predicates))
+        return self
+
+    def split(self) -> list:
+        """
+        Returns `(name, query)` for every branch, each query reading that
+        branch alone with the same filters, ordering and limit.
+        """
+        return [(branch.name, self._with_branches([branch])) for branch in self.branches]
+
+    def copy(self) -> "RequestLogQuery":
+        return self._with_branches(self.branches)
+
+    def without(self, names) -> "RequestLogQuery":
+        """
+        Returns a copy of the query leaving out the branches named in `names`.
+        """
+        return self._with_branches([branch for branch in self.branches if branch.name not in names])
+
+    def _with_branches(self, branches: list) -> "RequestLogQuery":
+        query = copy.copy(self)
+        query.branches = list(branches)
+        query.filters = list(self.filters)
+        query.ordering = list(self.ordering)
+        return query
+
+    def filter(self, column: str, values) -> "RequestLogQuery":
+        """
+        Keep rows whose `column` equals `values`, or any of them for a list.
+        Empty values do not filter.
+        """
+        if values is None or values == '' or values == []:
+            return self
+        self.filters.append((column, 'IN', values if isinstance(values, list) else [values]))
+        return self
+
+    def between(self, column: str, start, end) -> "RequestLogQuery":
+        if start is not None and end is not None:
+            self.filters.append((column, 'BETWEEN', [start, end]))
+        return self
+
+    def seek(self, columns: list, values: list, descending: bool = False) -> "RequestLogQuery":
+        """
+        Keep rows sorting after `values` on `columns`, all in the same
+        direction, so a keyset page starts where the previous one ended.
+        """
+        self.filters.append((tuple(columns), '<' if descending else '>', list(values)))
+        return self
+
+    def order_by(self, *columns: str) -> "RequestLogQuery":
+        """
+        Order by `columns`, descending for names prefixed with `-`.
+        """
+        self.ordering = list(columns)
+        return self
+
+    def limit(self, limit: "int | None") -> "RequestLogQuery":
+        self.limit_value = limit
+        return self
+
+    def _predicate(self, branch: Branch, column, operator: str, values: list) -> tuple:
+        if isinstance(column, tuple):
+            # Row comparison, which Postgres answers with an index seek on matching indexes
+            expressions = [branch.expression(name) for name in column]
+            sql = ", ".join(expression for expression, _ in expressions)
+            params = [param for _, expression_params in expressions for param in expression_params]
+            return f"({sql}) {operator} ({', '.join(['%s'] * len(values))})", [*params, *values]
+
+        if operator == 'IN' and column in branch.predicates:
+            return branch.predicates[column](values)
+
+        expression, params = branch.expression(column)
+        if operator == 'BETWEEN':
+            return f"{expression} BETWEEN %s AND %s", [*params, *values]
+        return f"{expression} IN ({', '.join(['%s'] * len(values))})", [*params, *values]
+
+    def _compile_branch(self, branch: Branch) -> tuple:
+        select, params = [], []
+        for column in self.columns:
+            expression, expression_params = branch.expression(column)
+            select.append(column if expression == column else f"{expression} AS {column}")
+            params += expression_params
+
+        conditions = []
+        if branch.condition:
+            conditions.append(branch.condition)
+            params += branch.params
+        for column, operator, values in self.filters:
+            predicate, predicate_params = self._predicate(branch, column, operator, values)
+            conditions.append(predicate)
+            params += predicate_params
+
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        return f"SELECT {', '.join(select)} FROM {branch.table}{where}", params
+
+    def _order_sql(self) -> str:
+        return " ORDER BY " + ", ".join(
+            f"{column[1:]} DESC" if column.startswith('-') else column for column in self.ordering
+        )
+
+    def compile(self) -> tuple:
+        """
+        Returns the query and its parameters. An ordered, limited query over
+        several branches also orders and limits each of them, so every branch
+        stops after reading `limit` rows from its indexes.
+        """
+        if self.branches:
+            compiled = [self._compile_branch(branch) for branch in self.branches]
+            if self.ordering and self.limit_value is not None and len(compiled) > 1:
+                compiled = [
+                    (f"({branch_sql}{self._order_sql()} LIMIT %s)", [*branch_params, self.limit_value])
+                    for branch_sql, branch_params in compiled
+                ]
+            # Rows of different branches never collide, UNION ALL skips the dedup sort of UNION
+            sql = " UNION ALL ".join(branch_sql for branch_sql, _ in compiled)
+            params = [param for _, branch_params in compiled for param in branch_params]
+        else:
+            sql = f"SELECT {', '.join(f'NULL AS {column}' for column in self.columns)} WHERE FALSE"
+            params = []
+
+        if self.ordering:
+            sql += self._order_sql()
+        if self.limit_value is not None:
+            sql += " LIMIT %s"
+            params.append(self.limit_value)
+        return sql, params
+
+    def debug_sql(self) -> str:
+        """
+        Returns the compiled query with its parameters inlined, for logs and debugging only.
+        """
+        sql, params = self.compile()
+        with connection.cursor() as cursor:
+            return cursor.mogrify(sql, params).decode()
+
+    def __str__(self) -> str:
+        return self.compile()[0]
@@ -0,0 +1,80 @@
+"""
+Mergeable latency sketches.
+
+A sketch is a sparse log-bucketed histogram (as in DDSketch): a latency `x`
+falls in cell `ceil(log_gamma(x))` and every cell keeps the weighted number of
+requests in it. Sketches merge by adding cell weights, and any quantile read
+back is within `RELATIVE_ACCURACY` of the true value, whatever the number of
+requests. Stored as `{cell: weight}` JSON on every rollup row.
+"""
+
+import math
+
+import numpy as np
+import pandas as pd
+
+RELATIVE_ACCURACY = 0.01
+GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+LOG_GAMMA = math.log(GAMMA)
+MIN_VALUE_MS = 0.001  # Faster requests share the lowest cell
+QUANTILES = (0.5, 0.95, 0.99)
+
+# Cell of `process_time_ms`, the SQL twin of `cells_of`
+CELL_SQL = f"CEIL(LN(GREATEST(process_time_ms, {MIN_VALUE_MS})) / {LOG_GAMMA!r})::int"
+
+
+def cells_of(values) -> np.ndarray:
+    return np.ceil(np.log(np.maximum(np.asarray(values, dtype=float), MIN_VALUE_MS)) / LOG_GAMMA).astype(int)
+
+
+def cell_values(cells):
+    """
+    Returns the representative latency of each cell, the one minimizing relative error.
+    """
+    return 2 * np.power(GAMMA, cells) / (GAMMA + 1)
+
+
+def sketch_cells(frame: pd.DataFrame) -> pd.DataFrame:
+    """
+    Returns one `(cell, weight)` row per sketch cell of every row of `frame`,
+    indexed like `frame`. Rollup rows carry a `latency_sketch`, raw request
+    logs are one cell each, weighted by their `sample_weight`.
+    """
+    if 'latency_sketch' in frame.columns:
+        index, cells, weights = [], [], []
+        for row, sketch in zip(frame.index, frame['latency_sketch']):
+            for cell, weight in (sketch or {}).items():
+                index.append(row)
+                cells.append(int(cell))
+                weights.append(float(weight))
+        return pd.DataFrame({'cell': cells, 'weight': weights}, index=pd.Index(index, dtype=frame.index.dtype))
+
+    weights = frame['sample_weight'].fillna(1.0) if 'sample_weight' in frame.columns else 1.0
+    return pd.DataFrame({'cell': cells_of(frame['process_time_ms']), 'weight': weights}, index=frame.index)
+
+
+def weighted_quantiles(frame: pd.DataFrame, keys: list, quantiles=QUANTILES) -> pd.DataFrame:
+    """
+    Merge the sketches of `frame` per group of `keys` (column names or a
+    `pd.Grouper`) and return columns `p50`, `p95`, ... indexed by group.
+    Cost depends on the number of cells, not on the requests they stand for.
+    """
+    names = [key.key if isinstance(key, pd.Grouper) else key for key in keys]
+    columns = [f"p{round(q * 100):g}" for q in quantiles]
+
+    cells = sketch_cells(frame)
+    if cells.empty:
+        return pd.DataFrame(columns=[*names, *columns]).set_index(names)
+    cells = cells.join(frame[names])
+
+    merged = cells.groupby([*keys, 'cell'], observed=True)['weight'].sum().reset_index()
+    grouped = merged.groupby(names, observed=True)
+    merged['cumulative'] = grouped['weight'].cumsum()
+    merged['total'] = grouped['weight'].transform('sum')
+
+    result = {}
+    for column, q in zip(columns, quantiles):
+        # The tolerance keeps float rounding of the running sum from skipping the last cell
+        reached = merged[merged['cumulative'] >= q * merged['total'] * (1 - 1e-9)]
+        result[column] = cell_values(reached.groupby(names, observed=True)['cell'].first())
+    return pd.DataFrame(result)
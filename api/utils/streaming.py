@@ -0,0 +1,123 @@
+"""
+Chunked reads of request logs through server-side cursors.
+
+`pd.read_sql_query` holds the whole result twice, as fetched tuples and as
+the DataFrame built from them. `stream_frames` reads through a named cursor
+instead and yields DataFrames of `REQUEST_LOG_STREAM_CHUNK_SIZE` rows, so only
+one chunk of tuples is alive at a time. Consumers either fold chunks into a
+`PartialAggregate`, whose size depends on the number of groups, not rows, or
+keep them under a `MemoryBudget` that stops the read once the frames kept by
+one request exceed `REQUEST_LOG_STREAM_MEMORY_LIMIT_MB`.
+"""
+
+import threading
+
+import pandas as pd
+from django.conf import settings
+from django.db import connection
+
+DEFAULT_CHUNK_SIZE = 10000  # rows
+DEFAULT_MEMORY_LIMIT_MB = 512  # per request
+
+
+class MemoryLimitExceeded(Exception):
+    pass
+
+
+class MemoryBudget:
+    """
+    Bytes of DataFrames kept by one request, possibly across threads.
+    """
+
+    def __init__(self, limit_mb=None):
+        limit_mb = limit_mb or getattr(settings, 'REQUEST_LOG_STREAM_MEMORY_LIMIT_MB', DEFAULT_MEMORY_LIMIT_MB)
+        self.limit = int(limit_mb * 1024 * 1024)
+        self.used = 0
+        self._lock = threading.Lock()
+
+    def charge(self, frame: pd.DataFrame) -> None:
+        """
+        Account for keeping `frame`, raising `MemoryLimitExceeded` past the limit.
+        """
+        size = int(frame.memory_usage(index=True, deep=True).sum())
+        with self._lock:
+            self.used += size
+            if self.used > self.limit:
+                raise MemoryLimitExceeded(
+                    f"Request log result exceeds {self.limit // (1024 * 1024)} MB, narrow the date range or filters"
+                )
+
+    def release(self, frame: pd.DataFrame) -> None:
+        size = int(frame.memory_usage(index=True, deep=True).sum())
+        with self._lock:
+            self.used = max(self.used - size, 0)
+
+
+def stream_frames(sql: str, params: list, chunk_size: int = None):
+    """
+    Yield the rows of `sql` as DataFrames of at most `chunk_size` rows, read
+    through a server-side cursor of the current connection. An empty result
+    yields one empty frame, which still carries the columns.
+    """
+    chunk_size = chunk_size or getattr(settings, 'REQUEST_LOG_STREAM_CHUNK_SIZE', DEFAULT_CHUNK_SIZE)
+    # A named cursor, held across commits when in autocommit
+    with connection.chunked_cursor() as cursor:
+        cursor.execute(sql, params)
+        yielded = False
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows and yielded:
+                break
+            yield pd.DataFrame.from_records(rows, columns=[column[0] for column in cursor.description])
+            yielded = True
+            if len(rows) < chunk_size:
+                break
+
+
+def read_frame(sql: str, params: list, budget: MemoryBudget = None, chunk_size: int = None) -> pd.DataFrame:
+    """
+    Returns all the rows of `sql`, read in chunks charged to `budget`.
+    """
+    budget = budget or MemoryBudget()
+    frames = []
+    for frame in stream_frames(sql, params, chunk_size):
+        budget.charge(frame)
+        frames.append(frame)
+    return pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+
+
+class PartialAggregate:
+    """
+    Running sums of columns per group of `keys`, folded chunk by chunk:
+
+        totals = PartialAggregate(['route', 'app_name'], ['weight', 'weighted_time'])
+        for chunk in stream_frames(sql, params):
+            totals.add(chunk)
+        totals.result()
+
+    Means are derived from the sums of their numerator and weight. The state
+    holds one row per group, charged to `budget` when given.
+    """
+
+    def __init__(self, keys: list, columns: list, budget: MemoryBudget = None):
+        self.keys = list(keys)
+        self.columns = list(columns)
+        self.budget = budget
+        self.state = None
+
+    def add(self, frame: pd.DataFrame) -> None:
+        if frame.empty:
+            return
+        partial = frame.groupby(self.keys, observed=True, sort=False)[self.columns].sum()
+        if self.state is not None:
+            if self.budget:
+                self.budget.release(self.state)
+            partial = pd.concat([self.state, partial]).groupby(level=self.keys, sort=False).sum()
+        if self.budget:
+            self.budget.charge(partial)
+        self.state = partial
+
+    def result(self) -> pd.DataFrame:
+        if self.state is None:
+            return pd.DataFrame(columns=[*self.keys, *self.columns])
+        return self.state.reset_index()
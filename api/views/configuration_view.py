@@ -1,6 +1,6 @@
 from rest_framework.response import Response
 from rest_framework.viewsets import ViewSet
-from rest_framework.exceptions import APIException
+from rest_framework.exceptions import APIException, ValidationError
 from rest_framework.permissions import IsAuthenticated
 from template.redis_client import redis_instance
 from template.authentication import TokenAuthentication
@@ -9,6 +9,7 @@ from api.models.configuration_model import Configuration
 from api.models.application_model import Application
 from api.serializers.configuration_serializer import ConfigurationSerializer
 from django_celery_beat.models import PeriodicTask, IntervalSchedule
+from request_log.utils.retention import parse_retention_policy
 
 import ast
 
@@ -78,6 +79,17 @@ class ConfigurationView(ViewSet):
         # Store data from the body request, where each key-value pair will be stored or updated as a configuration
         data = request.data
 
+        # Validate every retention policy before saving anything, so a bad one does not leave a partial update
+        errors = {}
+        for name, value in data.items():
+            if name.upper().startswith('RETENTION_DAYS'):
+                try:
+                    parse_retention_policy(value)
+                except (ValueError, SyntaxError) as e:
+                    errors[name] = str(e)
+        if errors:
+            raise ValidationError(errors)
+
         processed_configurations = []
         for name, value in data.items():
             # Check if the name already exists in the database
@@ -3,15 +3,36 @@ from rest_framework.response import Response
 from rest_framework.status import HTTP_200_OK, HTTP_400_BAD_REQUEST
 from rest_framework.decorators import action
 from rest_framework.exceptions import ValidationError
-from django.db import connection
+from django.db import connection, transaction
+from django.conf import settings
+from rest_framework_api_key.permissions import HasAPIKey
+from celery import current_app
 
 from request_log.serializers.request_log_serializer import RequestLogSerializer
+from request_log.utils.buffer import request_log_buffer
+from request_log.utils.stream import publish_request_log, get_stream_app
+from request_log.utils.bulk import BulkRecordError, UnsupportedContentTypeError, ingest_bulk
+from request_log.utils.dimensions import DIMENSIONS, decode_sql, dimension_cache, filter_sql
+from request_log.utils.central import CENTRAL_TABLE
+from request_log.utils.schema import qualified_table
+from template.redis_client import redis_instance
+from request_log.utils.geoip import geoip_stats
+from request_log.utils.sampling import request_log_sampler
 from api.models.application_model import Application
+from api.utils.rollup import MINUTE, choose_rollup_tier, get_rollups
+from api.utils.sketch import weighted_quantiles
+from api.utils.hll import STANDARD_ERROR, unique_counts
+from api.utils.matview import VIEW_NAME, view_exists
+from api.utils.query import RequestLogQuery
+from api.utils.aggregation import chart_frame, client_frame, country_counts, merge_phase_frames, phase_frame, recent_errors, route_tables, value_counts
+from api.utils.pagination import DEFAULT_SORT, InvalidCursor, estimate_count, paginate
+from api.utils.fanout import fan_out_query, merge_counts, merge_frames
+from api.utils.streaming import MemoryBudget, MemoryLimitExceeded, read_frame
 
 import pandas as pd
-from rest_framework.pagination import PageNumberPagination
+import json
 from concurrent.futures import ThreadPoolExecutor
-from request_log.exceptions.api_exception import ValidationException
+from request_log.exceptions.api_exception import ResultTooLargeException, ValidationException
 from template.authentication import TokenAuthentication
 from rest_framework.permissions import IsAuthenticated
 import time
@@ -20,76 +41,110 @@ class RequestLogView(ViewSet):
     permission_classes = [IsAuthenticated]
     
     DEFAULT_DATE_RANGE = 7
+    BULK_IDEMPOTENCY_TTL = 60 * 60 * 24  # seconds
+    BULK_PENDING_TTL = 60 * 5  # seconds, frees the key of a batch whose worker died
+
+    # Define columns for ADMIN and non-ADMIN users
+    GUEST_COLUMNS = [
+        "id", "path", "route", "method", "country_name", "country_code", "process_time_ms",
+        "status_code", "error_message", "created_at", "sample_weight",
+        "auth_time_ms", "view_time_ms", "serialize_time_ms", "db_query_count", "db_time_ms"
+    ]
+    ADMIN_COLUMNS = GUEST_COLUMNS + [
+        "body", "headers", "ip_address", "user_agent", "city"
+    ]
 
     @staticmethod
-    def get_all_requestlogs(role="GUEST", start_date=None, end_date=None, application_name=None, status_code=None, request_method=None, path=None):
+    def build_requestlog_query(role="GUEST", start_date=None, end_date=None, application_name=None, status_code=None, request_method=None, path=None, route=None, columns=None):
         """
-        Get all request logs from the database.
+        Build the query of the request logs matching the filters, see `RequestLogQuery`.
+        `columns` narrows the role's columns to those the caller uses, values stored
+        in dimension tables are only decoded for the columns selected.
         """
-        # Define columns for ADMIN and non-ADMIN users
-        guest_cols = [
-            "id", "path", "method", "country_name", "country_code", "process_time_ms",
-            "status_code", "error_message", "created_at"
-        ]
-        admin_cols = guest_cols + [
-            "body", "headers", "ip_address", "user_agent", "city"
-        ]
-        print('role:', role)
         is_admin = role == 'ADMIN'
-        query_cols = ", ".join(admin_cols if is_admin else guest_cols)
-        queries = []
+        selected_cols = RequestLogView.ADMIN_COLUMNS if is_admin else RequestLogView.GUEST_COLUMNS
+        if columns:
+            selected_cols = [col for col in selected_cols if col in columns]
+        query = RequestLogQuery(selected_cols + ['app_name'])
 
         if application_name is None:
             applications = Application.objects.all()
         else:
             applications = Application.objects.filter(app__in=application_name if isinstance(application_name, list) else [application_name])
-        
-        for schema in applications:
-            app_name = schema.app.lower()
-            queries.append(f"SELECT {query_cols}, '{app_name}' as app_name FROM {app_name}.request_log_requestlog")
-        
-        query = " UNION ".join(queries)
-        
-        # Add WHERE clauses based on the provided filters
-        where_clauses = []
-        
-        # Add filters for start_date and end_date
-        if start_date and end_date:
-            where_clauses.append(f"created_at BETWEEN '{start_date}' AND '{end_date}'")
-
-        # Add filter for status_code
-        if status_code:
-            if isinstance(status_code, list):
-                status_code_list = ', '.join([f"'{code}'" for code in status_code])
-                where_clauses.append(f"status_code IN ({status_code_list})")
-            else:
-                where_clauses.append(f"status_code = '{status_code}'")
-
-        # Add filter for request_method
-        if request_method:
-            if isinstance(request_method, list):
-                request_method_list = ', '.join([f"'{method}'" for method in request_method])
-                where_clauses.append(f"method IN ({request_method_list})")
-            else:
-                where_clauses.append(f"method = '{request_method}'")
-        
-        # Add filter for path
-        if path:
-            if isinstance(path, list):
-                path_list = ', '.join([f"'{p}'" for p in path])
-                where_clauses.append(f"path IN ({path_list})")
-            else:
-                where_clauses.append(f"path = '{path}'")
+        applications = list(applications)
+
+        if getattr(settings, 'REQUEST_LOG_CENTRAL_STORE_ENABLED', False):
+            # One indexed scan of the central store serves any set of applications
+            if applications:
+                app_ids = [schema.id for schema in applications]
+                app_names = ' '.join('WHEN %s THEN %s' for _ in applications)
+                query.add_branch(
+                    CENTRAL_TABLE,
+                    expressions={'app_name': (f"CASE app_id {app_names} END", [value for schema in applications for value in (schema.id, schema.app.lower())])},
+                    condition=f"app_id IN ({', '.join(['%s'] * len(app_ids))})",
+                    params=app_ids,
+                )
+
+        elif (
+            getattr(settings, 'REQUEST_LOG_MATERIALIZED_VIEW_ENABLED', False)
+            and set(selected_cols) <= set(RequestLogView.GUEST_COLUMNS)
+            and view_exists()
+        ):
+            # The materialized view only carries the guest columns, admins read the tables
+            if applications:
+                query.add_branch(
+                    VIEW_NAME,
+                    condition=f"app_name IN ({', '.join(['%s'] * len(applications))})",
+                    params=[schema.app.lower() for schema in applications],
+                )
 
-        if where_clauses:
-            query = f"SELECT * FROM ({query}) AS combined_query WHERE {' AND '.join(where_clauses)}"
         else:
-            query = f"SELECT * FROM ({query}) AS combined_query"
+            for schema in applications:
+                app_name = schema.app.lower()
+                expressions = {col: (decode_sql(app_name, col), []) for col in selected_cols if col in DIMENSIONS}
+                expressions['app_name'] = ('%s::text', [app_name])
+                # Filter paths by dimension id rather than decoded value, keeping their indexes usable
+                predicates = {'path': lambda values, app_name=app_name: filter_sql(app_name, 'path', values)}
+                query.add_branch(qualified_table(app_name), expressions=expressions, name=app_name, predicates=predicates)
+
+        # Every filter is repeated inside each branch, so partitions and indexes are used per table
+        return (
+            query
+            .between('created_at', start_date, end_date)
+            .filter('status_code', status_code)
+            .filter('method', request_method)
+            .filter('path', path)
+            .filter('route', route)
+        )
 
-        query += " ORDER BY created_at"
+    @staticmethod
+    def get_all_requestlogs(role="GUEST", start_date=None, end_date=None, application_name=None, status_code=None, request_method=None, path=None, route=None, columns=None):
+        """
+        Get all request logs from the database, see `build_requestlog_query`.
+        Applications are read concurrently, those that failed or timed out are
+        left out and listed in `df.attrs['failed_applications']`. Rows are read in
+        chunks, past `REQUEST_LOG_STREAM_MEMORY_LIMIT_MB` the request is rejected.
+        """
+        print('role:', role)
+        query = RequestLogView.build_requestlog_query(
+            role=role, start_date=start_date, end_date=end_date, application_name=application_name,
+            status_code=status_code, request_method=request_method, path=path, route=route, columns=columns,
+        ).order_by('created_at')
 
-        df = pd.read_sql_query(query, connection)
+        budget = MemoryBudget()
+        try:
+            result = fan_out_query(query, read_frame, budget)
+        except MemoryLimitExceeded as e:
+            raise ResultTooLargeException(detail=str(e))
+        df = RequestLogView.format_requestlogs(merge_frames(result.values(), by=['created_at']))
+        df.attrs['failed_applications'] = result.failures
+        return df
 
+    @staticmethod
+    def format_requestlogs(df):
+        """
+        Convert request log rows read from the database for the dashboards.
+        """
         # Transform 'created_at' column to datetime with timezone Asia/Jakarta
         if 'created_at' in df.columns and not df['created_at'].empty:
             df['created_at'] = pd.to_datetime(df['created_at']).dt.tz_convert('Asia/Jakarta')
@@ -98,8 +153,37 @@ class RequestLogView(ViewSet):
         if 'country_name' in df.columns and not df['country_name'].empty:
             df['country_name'] = df['country_name'].fillna('Unknown')
 
+        # Rows logged before routes existed stand for their own route. A route repeats
+        # across many rows, keep it dictionary-encoded so grouping compares integer codes
+        if 'route' in df.columns:
+            df['route'] = df['route'].fillna(df['path']).astype('category')
+
+        # Few distinct user agents repeat over many rows
+        if 'user_agent' in df.columns:
+            df['user_agent'] = df['user_agent'].astype('category')
+
         return df
 
+    @staticmethod
+    def get_rollup_logs(start_date, end_date, application_name=None, status_code=None, request_method=None, tier=MINUTE):
+        """
+        Get rollups shaped like request logs, one weighted row per bucket and dimensions,
+        read from `tier` (see `choose_rollup_tier`) where it is complete.
+        """
+        if application_name is None:
+            applications = Application.objects.all()
+        else:
+            applications = Application.objects.filter(app__in=application_name if isinstance(application_name, list) else [application_name])
+
+        return get_rollups(
+            list(applications.values_list('app', flat=True)),
+            start_date=start_date,
+            end_date=end_date,
+            tier=tier,
+            status_code=status_code,
+            request_method=request_method,
+        )
+
     @staticmethod
     def determine_frequency(delta_days, delta_hours):
         """
@@ -141,34 +225,51 @@ class RequestLogView(ViewSet):
 
         return freq, start, end, pd.date_range(start=start, end=end, freq=freq)
 
+    @staticmethod
+    def get_weights(request_logs):
+        """
+        Returns the sample weight of each row, 1 for rows stored without sampling.
+        """
+        if 'sample_weight' in request_logs.columns:
+            return request_logs['sample_weight'].fillna(1.0)
+        return pd.Series(1.0, index=request_logs.index)
+
     @staticmethod
     def build_time_chart(request_log, complete_date_range, time_index):
         """
         Build time chart with success and error groups.
         """
+        # Sampled rows stand for `sample_weight` requests each
+        weights = RequestLogView.get_weights(request_log)
+        request_log = request_log.assign(weight=weights, weighted_time=request_log['process_time_ms'] * weights)
+
         # Success: status_code < 400
         success_series = (
             request_log[request_log['status_code'] < 400]
-            .groupby(time_index)
-            .size()
+            .groupby(time_index)['weight']
+            .sum()
             .reindex(complete_date_range)
+            .round()
             .fillna(0)
         )
         # Error: status_code >= 400
         error_series = (
             request_log[request_log['status_code'] >= 400]
-            .groupby(time_index)
-            .size()
+            .groupby(time_index)['weight']
+            .sum()
             .reindex(complete_date_range)
+            .round()
             .fillna(0)
         )
+        weighted_sums = request_log.groupby(time_index)[['weighted_time', 'weight']].sum()
         response_series = (
-            request_log.groupby(time_index)['process_time_ms']
-            .mean()
+            (weighted_sums['weighted_time'] / weighted_sums['weight'])
             .reindex(complete_date_range)
             .round(4)
             .fillna(0)
         )
+        # Tail latency from merged sketches, rollup rows carry theirs
+        percentile_series = weighted_quantiles(request_log, [time_index]).reindex(complete_date_range).round(4).fillna(0)
 
         return {
             'categories': complete_date_range.tz_convert('Asia/Jakarta').strftime('%Y-%m-%dT%H:%M:%S%z').to_list(),
@@ -184,21 +285,55 @@ class RequestLogView(ViewSet):
             ],
             'response_time_series': [
                 {
-                    'name': 'Response Time (s)',
+                    'name': 'Response Time (ms)',
                     'data': response_series.to_list()
-                }
+                },
+                *[
+                    {
+                        'name': f"{column} (ms)",
+                        'data': percentile_series[column].to_list()
+                    }
+                    for column in percentile_series.columns
+                ]
             ]
         }
 
+    @staticmethod
+    def build_unique_client_chart(request_log, complete_date_range, time_index):
+        """
+        Build unique IP and user agent series per time bucket and per application.
+        Rollups give HyperLogLog estimates, raw rows of admins are counted exactly.
+        """
+        counters = {'Unique IPs': ('ip_hll', 'ip_address'), 'Unique User Agents': ('user_agent_hll', 'user_agent')}
+        app_categories = request_log['app_name'].dropna().unique()
+
+        time_series, app_series = [], []
+        for name, (hll_column, raw_column) in counters.items():
+            per_bucket = unique_counts(request_log, [time_index], hll_column, raw_column)
+            per_app = unique_counts(request_log, ['app_name'], hll_column, raw_column)
+            if per_bucket is None:
+                continue
+            time_series.append({'name': name, 'data': per_bucket.reindex(complete_date_range).fillna(0).astype(int).to_list()})
+            app_series.append({'name': name, 'data': per_app.reindex(app_categories).fillna(0).astype(int).to_list()})
+
+        return {
+            'categories': complete_date_range.tz_convert('Asia/Jakarta').strftime('%Y-%m-%dT%H:%M:%S%z').to_list(),
+            'series': time_series,
+            'app_categories': app_categories.tolist(),
+            'app_series': app_series,
+            'standard_error': round(STANDARD_ERROR, 4) if 'ip_hll' in request_log.columns else 0,
+        }
+
     @staticmethod
     def build_app_chart(request_log):
         """
         Build application chart.
         """
         app_categories = request_log['app_name'].dropna().unique()
+        request_log = request_log.assign(weight=RequestLogView.get_weights(request_log))
         
-        app_success_series = request_log[request_log['status_code'] < 400].groupby('app_name').size().reindex(app_categories).fillna(0)
-        app_error_series = request_log[request_log['status_code'] >= 400].groupby('app_name').size().reindex(app_categories).fillna(0)
+        app_success_series = request_log[request_log['status_code'] < 400].groupby('app_name')['weight'].sum().reindex(app_categories).round().fillna(0)
+        app_error_series = request_log[request_log['status_code'] >= 400].groupby('app_name')['weight'].sum().reindex(app_categories).round().fillna(0)
 
         return {
             'categories': app_categories.tolist(),
@@ -220,10 +355,11 @@ class RequestLogView(ViewSet):
         Build status code chart.
         """
         status_code_categories = sorted(request_log[request_log['status_code'] >= 400]['status_code'].dropna().unique())
+        request_log = request_log.assign(weight=RequestLogView.get_weights(request_log))
         status_code_series = [
             {
                 'name': app_name,
-                'data': request_log[request_log['app_name'] == app_name].groupby('status_code').size().reindex(status_code_categories).fillna(0).to_list()
+                'data': request_log[request_log['app_name'] == app_name].groupby('status_code')['weight'].sum().reindex(status_code_categories).round().fillna(0).to_list()
             }
             for app_name in request_log['app_name'].dropna().unique()
         ]
@@ -239,10 +375,11 @@ class RequestLogView(ViewSet):
         Build request method chart.
         """
         request_method_categories = sorted(request_log['method'].dropna().unique())
+        request_log = request_log.assign(weight=RequestLogView.get_weights(request_log))
         request_method_series = [
             {
                 'name': app_name,
-                'data': request_log[request_log['app_name'] == app_name].groupby('method').size().reindex(request_method_categories).fillna(0).to_list()
+                'data': request_log[request_log['app_name'] == app_name].groupby('method')['weight'].sum().reindex(request_method_categories).round().fillna(0).to_list()
             }
             for app_name in request_log['app_name'].dropna().unique()
         ]
@@ -257,18 +394,20 @@ class RequestLogView(ViewSet):
         """
         Build summary statistics for request logs.
         """
-        total = len(request_logs)
+        # Sampled rows stand for `sample_weight` requests each
+        weights = RequestLogView.get_weights(request_logs)
+        total = int(round(weights.sum()))
 
         def get_success():
-            return request_logs[request_logs['status_code'] < 400]
+            return weights[request_logs['status_code'] < 400].sum()
 
         def get_client_err():
-            return request_logs[(request_logs['status_code'] >= 400) & (request_logs['status_code'] < 500)]
+            return weights[(request_logs['status_code'] >= 400) & (request_logs['status_code'] < 500)].sum()
 
         def get_server_err():
-            return request_logs[request_logs['status_code'] >= 500]
+            return weights[request_logs['status_code'] >= 500].sum()
 
-        def to_percent(part): return f"{round(len(part) / total * 100, 2)}%" if total else "0%"
+        def to_percent(part): return f"{round(part / total * 100, 2)}%" if total else "0%"
 
         with ThreadPoolExecutor(max_workers=3) as executor:
             future_success = executor.submit(get_success)
@@ -281,45 +420,102 @@ class RequestLogView(ViewSet):
 
         return {
             'total_requests': total,
-            'success_requests': len(success),
-            'client_error_requests': len(client_err),
-            'server_error_requests': len(server_err),
+            'success_requests': int(round(success)),
+            'client_error_requests': int(round(client_err)),
+            'server_error_requests': int(round(server_err)),
             'success_rate': to_percent(success),
             'client_error_rate': to_percent(client_err),
             'server_error_rate': to_percent(server_err),
-            'avg_process_time_ms': round(request_logs['process_time_ms'].mean(), 4) if total else 0
+            'avg_process_time_ms': round((request_logs['process_time_ms'] * weights).sum() / weights.sum(), 4) if total else 0
+        }
+
+    @staticmethod
+    def build_phase_chart(request_logs):
+        """
+        Build the average time spent per request phase, weighted by sample weight.
+        """
+        weights = RequestLogView.get_weights(request_logs)
+        total_weight = weights.sum()
+
+        def weighted_mean(values):
+            return round((values * weights).sum() / total_weight, 4) if total_weight else 0
+
+        auth = weighted_mean(request_logs['auth_time_ms'])
+        view = weighted_mean(request_logs['view_time_ms'])
+        db = weighted_mean(request_logs['db_time_ms'])
+        serialize = weighted_mean(request_logs['serialize_time_ms'])
+        total = weighted_mean(request_logs['process_time_ms'])
+
+        return {
+            'categories': ['Authentication', 'View', 'Database', 'Serialization', 'Other'],
+            'series': [
+                {
+                    'name': 'Avg Time (ms)',
+                    # View time includes its queries, show them separately
+                    'data': [auth, round(max(view - db, 0), 4), db, serialize, round(max(total - auth - view - serialize, 0), 4)]
+                }
+            ],
+            'avg_db_query_count': weighted_mean(request_logs['db_query_count']),
         }
 
     @staticmethod
     def top_50_slowest_routes(request_logs):
         """
-        Get the top 50 slowest routes based on average process time, grouped by app_name and path.
+        Get the top 50 slowest routes based on average process time, grouped by app_name and route.
+        Means are weighted by sample weight, like the time chart.
         """
-        # Group by app_name and path, calculate mean process_time_ms, and get top 50
-        top_50 = (
+        # Sampled rows stand for `sample_weight` requests each
+        weights = RequestLogView.get_weights(request_logs)
+        sums = (
             request_logs
-            .groupby(['app_name', 'path'], as_index=False)['process_time_ms']
-            .mean()
+            .assign(
+                weight=weights,
+                weighted_time=request_logs['process_time_ms'] * weights,
+                weighted_db_time=request_logs['db_time_ms'] * weights,
+                weighted_db_query_count=request_logs['db_query_count'] * weights,
+            )
+            .groupby(['app_name', 'route'], as_index=False, observed=True)[['weight', 'weighted_time', 'weighted_db_time', 'weighted_db_query_count']]
+            .sum()
+        )
+
+        # Weighted mean process_time_ms of each route and where the time goes: database share, top 50
+        top_50 = (
+            sums
+            .assign(
+                process_time_ms=sums['weighted_time'] / sums['weight'],
+                avg_db_time_ms=(sums['weighted_db_time'] / sums['weight']).round(4),
+                avg_db_query_count=(sums['weighted_db_query_count'] / sums['weight']).round(4),
+            )
             .sort_values(by='process_time_ms', ascending=False)
             .head(50)
-        )
+        )[['app_name', 'route', 'process_time_ms', 'avg_db_time_ms', 'avg_db_query_count']]
 
-        # For each (app_name, path), get unique methods used
+        # For each (app_name, route), get unique methods used
         methods = (
             request_logs
-            .groupby(['app_name', 'path'])['method']
+            .groupby(['app_name', 'route'], observed=True)['method']
             .unique()
             .reset_index()
         )
 
         # Merge methods into top_50
-        top_50 = top_50.merge(methods, on=['app_name', 'path'], how='left')
+        top_50 = top_50.merge(methods, on=['app_name', 'route'], how='left')
+
+        # Tail latency of each route
+        percentiles = (
+            weighted_quantiles(request_logs, ['app_name', 'route'])
+            .round(4)
+            .add_suffix('_process_time_ms')
+            .reset_index()
+        )
+        top_50 = top_50.merge(percentiles, on=['app_name', 'route'], how='left')
 
         # Round process_time_ms
         top_50['process_time_ms'] = top_50['process_time_ms'].round(4)
 
         # Rename columns for clarity
         top_50.rename(columns={'method': 'methods', 'process_time_ms': 'avg_process_time_ms'}, inplace=True)
+        top_50['path'] = top_50['route']  # Kept for clients reading the route as `path`
 
         return top_50.to_dict(orient='records')
     
@@ -381,30 +577,59 @@ class RequestLogView(ViewSet):
     @staticmethod
     def build_grouped_data_table(request_logs):
         """
-        Build grouped data table by unique path and aggregate the data to get count, average response_time, and list of methods.
+        Build grouped data table by unique route and aggregate the data to get count, average response_time, and list of methods.
+        Counts and means are weighted by sample weight, like the summary stats.
         """
-        grouped_data = request_logs.groupby('path').agg(
+        # Sampled rows stand for `sample_weight` requests each
+        weights = RequestLogView.get_weights(request_logs)
+        status_codes = request_logs['status_code']
+        grouped_data = request_logs.assign(
+            weight=weights,
+            weighted_time=request_logs['process_time_ms'] * weights,
+            success_weight=weights.where(status_codes < 400, 0),
+            client_error_weight=weights.where((status_codes >= 400) & (status_codes < 500), 0),
+            server_error_weight=weights.where(status_codes >= 500, 0),
+        ).groupby('route', observed=True).agg(
             methods=('method', lambda x: list(x.unique())),
-            avg_process_time_ms=('process_time_ms', lambda x: round(x.mean(), 4)),
+            weighted_time=('weighted_time', 'sum'),
             min_process_time_ms=('process_time_ms', lambda x: round(x.min(), 4)),
             max_process_time_ms=('process_time_ms', lambda x: round(x.max(), 4)),
             status_codes=('status_code', lambda x: sorted(list(x.unique()))),
             last_activity=('created_at', 'max'),
-            count=('path', 'count'),  # count of rows per path
-            success_count=('status_code', lambda x: len(x[x < 400])),
-            client_error_count=('status_code', lambda x: len(x[(x >= 400) & (x < 500)])),
-            server_error_count=('status_code', lambda x: len(x[x >= 500])),
+            count=('weight', 'sum'),  # requests per route
+            success_count=('success_weight', 'sum'),
+            client_error_count=('client_error_weight', 'sum'),
+            server_error_count=('server_error_weight', 'sum'),
         ).reset_index()
 
+        grouped_data['avg_process_time_ms'] = (grouped_data['weighted_time'] / grouped_data['count']).round(4)
+        for column in ('count', 'success_count', 'client_error_count', 'server_error_count'):
+            grouped_data[column] = grouped_data[column].round().astype(int)
+        grouped_data = grouped_data[[
+            'route', 'methods', 'avg_process_time_ms', 'min_process_time_ms', 'max_process_time_ms', 'status_codes',
+            'last_activity', 'count', 'success_count', 'client_error_count', 'server_error_count',
+        ]]
+
+        percentiles = weighted_quantiles(request_logs, ['route']).round(4).add_suffix('_process_time_ms').reset_index()
+        grouped_data = grouped_data.merge(percentiles, on='route', how='left')
+        grouped_data['path'] = grouped_data['route']  # Kept for clients reading the route as `path`
+
         # Sort the grouped data by created_at in descending order
         grouped_data.sort_values(by='count', ascending=False, inplace=True)
 
         return grouped_data.to_dict(orient='records')
 
+    @staticmethod
+    def partial_failures(failed_applications):
+        """
+        Returns the response fields reporting applications that could not be read, none when all were.
+        """
+        return {'failed_applications': failed_applications} if failed_applications else {}
+
     @staticmethod
     def build_response(
         filters=None, general=None,
-        time_chart=None, app_chart=None, status_code_chart=None, request_method_chart=None,
+        time_chart=None, app_chart=None, status_code_chart=None, request_method_chart=None, phase_chart=None, unique_client_chart=None,
         top_50_slowest_routes=None, top_50_countries=None, top_50_errors=None,
         data_table=None, status=HTTP_200_OK, **kwargs
     ):
@@ -417,6 +642,8 @@ class RequestLogView(ViewSet):
         app_chart = app_chart or {}
         status_code_chart = status_code_chart or {}
         request_method_chart = request_method_chart or {}
+        phase_chart = phase_chart or {}
+        unique_client_chart = unique_client_chart or {}
         data_table = data_table or {}
 
         return Response({
@@ -455,6 +682,18 @@ class RequestLogView(ViewSet):
                 'categories': request_method_chart.get('categories', []),
                 'series': request_method_chart.get('series', [])
             },
+            'phase_chart': {
+                'categories': phase_chart.get('categories', []),
+                'series': phase_chart.get('series', []),
+                'avg_db_query_count': phase_chart.get('avg_db_query_count', 0)
+            },
+            'unique_client_chart': {
+                'categories': unique_client_chart.get('categories', []),
+                'series': unique_client_chart.get('series', []),
+                'app_categories': unique_client_chart.get('app_categories', []),
+                'app_series': unique_client_chart.get('app_series', []),
+                'standard_error': unique_client_chart.get('standard_error', 0)
+            },
             'top_50_slowest_routes': top_50_slowest_routes or [],
             'top_50_countries': top_50_countries or [],
             'top_50_errors': top_50_errors or [],
@@ -537,7 +776,7 @@ class RequestLogView(ViewSet):
                 ],
                 'response_time_series': [
                     {
-                        'name': 'Response Time (s)',
+                        'name': 'Response Time (ms)',
                         'data': response_time_chart.values
                     }
                 ]
@@ -560,12 +799,65 @@ class RequestLogView(ViewSet):
         Create a new request log.
         """
         serializer = RequestLogSerializer(data=request.data)
-        if serializer.is_valid():
-            serializer.save()
-            return Response(serializer.data, status=HTTP_200_OK)
-        else:
+        if not serializer.is_valid():
             raise ValidationError(serializer.errors)
 
+        if getattr(settings, 'REQUEST_LOG_STREAM_ENABLED', False):
+            # Only append to the stream, the consumer loads it into PostgreSQL
+            entry_id = publish_request_log(serializer.validated_data)
+            return Response({**serializer.data, 'stream_id': entry_id}, status=HTTP_200_OK)
+
+        serializer.save()
+        return Response(serializer.data, status=HTTP_200_OK)
+
+    @action(detail=False, methods=['POST'], url_path='bulk', permission_classes=[HasAPIKey | IsAuthenticated])
+    def bulk_create(self, request):
+        """
+        Ingest many request logs at once from an NDJSON or msgpack body.
+
+        Records are validated while streaming and loaded with COPY in one
+        transaction. Send an `Idempotency-Key` header to make retries of the
+        same batch return the first result instead of inserting it again.
+        """
+        application_name = (request.query_params.get('application_name') or get_stream_app()).lower()
+        if not Application.objects.filter(app__iexact=application_name).exists():
+            raise ValidationException(f"Application {application_name} is not registered")
+
+        if request.stream is None:
+            raise ValidationException("Request body is empty")
+
+        idempotency_key = request.headers.get('Idempotency-Key')
+        redis_key = f"request_log:bulk:{application_name}:{idempotency_key}"
+        if idempotency_key:
+            # Claim the key before ingesting so concurrent retries can not both insert
+            if not redis_instance.set(redis_key, 'PENDING', nx=True, ex=self.BULK_PENDING_TTL):
+                previous = redis_instance.get(redis_key)
+                if previous == 'PENDING':
+                    raise ValidationException("A batch with this Idempotency-Key is still being processed", status_code=409)
+                return Response({**json.loads(previous), 'duplicate': True}, status=HTTP_200_OK)
+
+        try:
+            with transaction.atomic():
+                result = ingest_bulk(request.stream, request.content_type, application_name)
+        except BulkRecordError as e:
+            if idempotency_key:
+                redis_instance.delete(redis_key)
+            # The body as a whole is unusable, records are not reported one by one
+            status_code = 415 if isinstance(e, UnsupportedContentTypeError) else 400
+            raise ValidationException(str(e), status_code=status_code)
+        except Exception:
+            if idempotency_key:
+                redis_instance.delete(redis_key)
+            raise
+
+        if idempotency_key:
+            redis_instance.set(redis_key, json.dumps(result), ex=self.BULK_IDEMPOTENCY_TTL)
+
+        if result['accepted'] and getattr(settings, 'REQUEST_LOG_MATERIALIZED_VIEW_REFRESH_ON_INGEST', False):
+            current_app.send_task('api.tasks.refresh_request_log_view')
+
+        return Response({**result, 'duplicate': False}, status=HTTP_200_OK)
+
     def retrieve(self, request, pk=None):
         """
         Return a specific request log.
@@ -577,6 +869,19 @@ class RequestLogView(ViewSet):
             'data': data.to_dict(orient='records')
             }, status=HTTP_200_OK)
 
+    @action(detail=False, methods=['GET'], url_path='stats')
+    def get_stats(self, request):
+        """
+        Return ingestion counters of the current worker process and the last retention run.
+        """
+        return Response({
+            'buffer': request_log_buffer.stats(),
+            'geoip': geoip_stats(),
+            'sampling': request_log_sampler.stats(),
+            'dimensions': dimension_cache.stats(),
+            'retention': json.loads(redis_instance.get('request_log:retention:last_run') or 'null'),
+        }, status=HTTP_200_OK)
+
     @action(detail=False, methods=['POST'], url_path='overview')
     def get_overview(self, request):
         """
@@ -716,7 +1021,7 @@ class RequestLogView(ViewSet):
                 ],
                 'response_time_series': [
                     {
-                        'name': 'Response Time (s)',
+                        'name': 'Response Time (ms)',
                         'data': response_time_chart.values
                     }
                 ]
@@ -757,70 +1062,114 @@ class RequestLogView(ViewSet):
         request_method = request.data.get('request_method', None)
 
         freq, start_date, end_date, complete_date_range = self.determine_frequency_and_range(start=start_date, end=end_date)
+        filters = {
+            'start_date': start_date.isoformat(),
+            'end_date': end_date.isoformat(),
+            'status_code': status_code,
+            'request_method': request_method,
+            'application_name': application_name,
+        }
+        query_filters = {
+            'start_date': start_date,
+            'end_date': end_date,
+            'application_name': application_name,
+            'status_code': status_code,
+            'request_method': request_method,
+        }
 
         # ========== Get All Request Logs ==========
-        request_logs = self.get_all_requestlogs(
-            role=request.user.role.id,
-            start_date=start_date, 
-            end_date=end_date, 
-            application_name=application_name, 
-            status_code=status_code, 
-            request_method=request_method
-            )
-        
+        # With pushdown, Postgres aggregates the logs and only aggregates are read back
+        pushdown = getattr(settings, 'REQUEST_LOG_PUSHDOWN_ENABLED', True)
+        if pushdown:
+            query = self.build_requestlog_query(role=request.user.role.id, columns=self.GUEST_COLUMNS, **query_filters)
+            # Applications are aggregated concurrently, those failing here are left out of every later query
+            phases = fan_out_query(query, phase_frame)
+            failed_applications = dict(phases.failures)
+            query = query.without(failed_applications)
+            source, params = query.compile()
+            request_logs = None
+            phase_logs = merge_phase_frames(phases.values())
+            is_empty = phase_logs['row_count'].iloc[0] == 0
+        else:
+            request_logs = self.get_all_requestlogs(role=request.user.role.id, **query_filters)
+            failed_applications = request_logs.attrs.get('failed_applications', {})
+            phase_logs = request_logs
+            is_empty = request_logs.empty
+
         # Check if request_logs is empty
-        if request_logs.empty:
+        if is_empty:
             return self.build_response(
                 execution_time=(pd.Timestamp.now('Asia/Jakarta') - start_time).total_seconds(),
-                filters={
-                    'start_date': start_date.isoformat(),
-                    'end_date': end_date.isoformat(),
-                    'status_code': status_code,
-                    'request_method': request_method,
-                    'application_name': application_name,
-                }
+                filters=filters,
+                **self.partial_failures(failed_applications)
             )
 
         # ========== Sort Request Logs ==========
-        request_logs.sort_values(by='created_at', inplace=True)
+        if request_logs is not None:
+            request_logs.sort_values(by='created_at', inplace=True)
 
         # ========== Time Index ==========
         time_index = pd.Grouper(key='created_at', freq=freq, origin=start_date)
 
+        # ========== Chart Source ==========
+        # Rollups carry the same weighted totals in far fewer rows, read from the coarsest tier fitting `freq`
+        chart_logs, client_logs, chart_source = request_logs, request_logs, 'raw'
+        if getattr(settings, 'REQUEST_LOG_ROLLUPS_ENABLED', True):
+            chart_source = choose_rollup_tier(start_date, end_date, freq)
+            chart_logs = client_logs = self.get_rollup_logs(start_date, end_date, application_name, status_code, request_method, tier=chart_source)
+        elif pushdown:
+            # Weighted rows per chart bucket, application, method and status code stand in for the raw rows
+            # Applications are disjoint groups, their rows only need merging back in time order
+            charts = fan_out_query(query, chart_frame, freq, start_date)
+            failed_applications.update(charts.failures)
+            chart_logs = client_logs = merge_frames(charts.values(), by=['created_at', 'first_seen'])
+            if request.user.role.id == 'ADMIN':
+                client_query = self.build_requestlog_query(
+                    role=request.user.role.id, columns=['created_at', 'ip_address', 'user_agent'], **query_filters
+                ).without(failed_applications)
+                clients = fan_out_query(client_query, client_frame, freq, start_date)
+                failed_applications.update(clients.failures)
+                client_logs = merge_frames(clients.values(), by=['first_seen'])
+
         # ========== Grouping Data ==========
-        time_chart = self.build_time_chart(request_logs, complete_date_range, time_index)
-        app_chart = self.build_app_chart(request_logs)
-        status_code_chart = self.build_status_code_chart(request_logs)
-        request_method_chart = self.build_request_method_chart(request_logs)
+        time_chart = self.build_time_chart(chart_logs, complete_date_range, time_index)
+        app_chart = self.build_app_chart(chart_logs)
+        status_code_chart = self.build_status_code_chart(chart_logs)
+        request_method_chart = self.build_request_method_chart(chart_logs)
+        phase_chart = self.build_phase_chart(phase_logs)
+        unique_client_chart = self.build_unique_client_chart(client_logs, complete_date_range, time_index)
 
         # ========== Summary Statistics ==========
-        summary_stats = self.build_summary_stats(request_logs)
-
-        # ========== Top 50 ==========
-        top_50s = self.compute_top_50s_parallel(request_logs)
-
-        # ========== Top 50 Slowest Routes ==========
-        # top_50_slowest_route = self.top_50_slowest_routes(request_logs)
-        # top_50_countries = self.top_50_countries(request_logs)
-        # top_50_errors = self.top_50_errors(request_logs)
-
-        # ========== Grouped Data Table ==========
-        grouped_data_table = self.build_grouped_data_table(request_logs)
+        summary_stats = self.build_summary_stats(chart_logs)
+
+        # ========== Top 50 and Grouped Data Table ==========
+        if pushdown:
+            # Routes span applications, they are grouped by one query over the applications read so far
+            top_50_slowest_routes, grouped_data_table = route_tables(source, params)
+            countries = fan_out_query(query, country_counts)
+            errors = fan_out_query(query, recent_errors)
+            failed_applications.update({**countries.failures, **errors.failures})
+            top_50s = {
+                'top_50_slowest_routes': top_50_slowest_routes,
+                'top_50_countries': merge_counts(countries.values(), ['country_name', 'country_code'], 'value', limit=50).to_dict(orient='records'),
+                'top_50_errors': merge_frames(errors.values(), by=['created_at'], ascending=False, limit=50).to_dict(orient='records'),
+            }
+        else:
+            top_50s = self.compute_top_50s_parallel(request_logs)
+            grouped_data_table = self.build_grouped_data_table(request_logs)
 
         return self.build_response(
             execution_time=(pd.Timestamp.now('Asia/Jakarta') - start_time).total_seconds(),
-            filters={
-                'start_date': start_date.isoformat(),
-                'end_date': end_date.isoformat(),
-                'status_code': status_code,
-                'request_method': request_method,
-                'application_name': application_name,
-            },
+            chart_source=chart_source,
+            **self.partial_failures(failed_applications),
+            filters=filters,
             general=summary_stats,
             time_chart=time_chart,
             app_chart=app_chart,
             status_code_chart=status_code_chart,
             request_method_chart=request_method_chart,
+            phase_chart=phase_chart,
+            unique_client_chart=unique_client_chart,
             top_50_slowest_routes=top_50s['top_50_slowest_routes'],
             top_50_countries=top_50s['top_50_countries'],
             top_50_errors=top_50s['top_50_errors'],
@@ -829,10 +1178,36 @@ class RequestLogView(ViewSet):
             },
         )
 
+    def get_requestlog_page(self, request, query):
+        """
+        Read the page of `query` requested by `sort`, `cursor` and `page_size`,
+        see `paginate`. `include_count` adds the planner's estimate of the total.
+        """
+        try:
+            page = paginate(query, sort=request.data.get('sort'), cursor=request.data.get('cursor'), page_size=request.data.get('page_size'))
+        except (InvalidCursor, ValueError) as e:
+            raise ValidationException(str(e))
+        except MemoryLimitExceeded as e:
+            raise ResultTooLargeException(detail=str(e))
+
+        pagination = {
+            'sort': request.data.get('sort') or DEFAULT_SORT,
+            'page_size': len(page['results']),
+            'next_cursor': page['next_cursor'],
+        }
+        if request.data.get('include_count'):
+            pagination['estimated_count'] = estimate_count(query)
+
+        return {
+            'data_table': self.format_requestlogs(page['results']).to_dict(orient='records'),
+            'pagination': pagination,
+            **self.partial_failures(page['failed_applications']),
+        }
+
     @action(detail=False, methods=['POST'], url_path='data-table-by-path')
     def get_data_table_by_path(self, request):
         """
-        Return a list of all request logs with pagination.
+        Return one page of the request logs of a path or route, newest first by default.
         """
         try:
             start_date = pd.to_datetime(request.data.get('start_date', pd.Timestamp.now(tz='Asia/Jakarta') - pd.Timedelta(days=self.DEFAULT_DATE_RANGE))).tz_convert('Asia/Jakarta')
@@ -845,34 +1220,26 @@ class RequestLogView(ViewSet):
         request_method = request.data.get('request_method', None)
 
         path = request.data.get('path', None)
+        route = request.data.get('route', None)
+
+        query = self.build_requestlog_query(role=request.user.role.id, start_date=start_date, end_date=end_date,
+                                            application_name=application_name, status_code=status_code,
+                                            request_method=request_method, path=path, route=route)
 
-        request_logs = self.get_all_requestlogs(role=request.user.role.id, start_date=start_date, end_date=end_date, 
-                                                application_name=application_name, status_code=status_code, 
-                                                request_method=request_method, path=path)
-        
-        if request_logs.empty:
-            return Response({
-                'filters': {
-                    'start_date': start_date.isoformat(),
-                    'end_date': end_date.isoformat(),
-                    'path': path,
-                },
-                'data_table': []
-            }, status=HTTP_200_OK)
-        time.sleep(2)
         return Response({
             'filters': {
                 'start_date': start_date.isoformat(),
                 'end_date': end_date.isoformat(),
                 'path': path,
+                'route': route,
             },
-            'data_table': request_logs.sort_values(by='created_at', ascending=False).to_dict(orient='records')
+            **self.get_requestlog_page(request, query),
         }, status=HTTP_200_OK)
 
     @action(detail=False, methods=['POST'], url_path='data-table')
     def get_data_table(self, request):
         """
-        Return a list of all request logs with pagination.
+        Return one page of request logs, newest first by default, with the counts per status code, method and application.
         """
         try:
             start_date = pd.to_datetime(request.data.get('start_date', pd.Timestamp.now(tz='Asia/Jakarta') - pd.Timedelta(days=1))).tz_convert('Asia/Jakarta')
@@ -884,24 +1251,17 @@ class RequestLogView(ViewSet):
         application_name = request.data.get('application_name', None)
         request_method = request.data.get('request_method', None)
 
-        request_logs = self.get_all_requestlogs(role=request.user.role.id, start_date=start_date, end_date=end_date, application_name=application_name, status_code=status_code, request_method=request_method)
-        
-        # ========== Grouping Data ==========
-        # Group by unique status_code and count the number of occurrences
-        status_code_counts = request_logs['status_code'].value_counts().reset_index()
-
-        # Group by unique request_method and count the number of occurrences
-        request_method_counts = request_logs['method'].value_counts().reset_index()
-
-        # Group by application name and count the number of occurrences
-        app_name_counts = request_logs['app_name'].value_counts().reset_index()
+        query = self.build_requestlog_query(role=request.user.role.id, start_date=start_date, end_date=end_date, application_name=application_name, status_code=status_code, request_method=request_method)
+        page = self.get_requestlog_page(request, query)
 
-        data_table = request_logs.sort_values(by='created_at', ascending=False).to_dict(orient='records')
-
-        # Apply pagination only to the data_table
-        # paginator = PageNumberPagination()
-        # paginator.page_size = 10  # Set the page size
-        # paginated_logs = paginator.paginate_queryset(data_table, request)
+        # ========== Grouping Data ==========
+        # Counted by Postgres over every matching row, not only the page
+        counts = {}
+        failed_applications = dict(page.pop('failed_applications', {}))
+        for name, column in (('status_code_counts', 'status_code'), ('request_method_counts', 'method'), ('app_name_counts', 'app_name')):
+            result = fan_out_query(query, value_counts, column)
+            counts[name] = merge_counts(result.values(), [column], 'count').to_dict(orient='records')
+            failed_applications.update(result.failures)
 
         return Response({
             'filters': {
@@ -911,14 +1271,7 @@ class RequestLogView(ViewSet):
                 'request_method': request_method,
                 'application_name': application_name,
             },
-            'status_code_counts': status_code_counts.to_dict(orient='records'),
-            'request_method_counts': request_method_counts.to_dict(orient='records'),
-            'app_name_counts': app_name_counts.to_dict(orient='records'),
-            'data_table': data_table
-            # 'data_table': {
-            #     'previous': paginator.get_previous_link(),
-            #     'next': paginator.get_next_link(),
-            #     'count': paginator.page.paginator.count,
-            #     'results': paginated_logs
-            # }
-        })
\ No newline at end of file
+            **counts,
+            **page,
+            **self.partial_failures(failed_applications),
+        })
@@ -74,6 +74,10 @@ INSTALLED_APPS = [
 
 REST_FRAMEWORK = {
     'EXCEPTION_HANDLER': 'request_log.exceptions.custom_exception.custom_exception_handler',
+    'DEFAULT_RENDERER_CLASSES': [
+        'request_log.utils.timing.TimedJSONRenderer',  # Records serialization time in the request log
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
     # 'DEFAULT_AUTHENTICATION_CLASSES': [
     #     'template.authentication.TokenAuthentication',
     # ], # Turn this off when first executing `makemigrations`
@@ -113,6 +117,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'luna.wsgi.application'
+ASGI_APPLICATION = 'luna.asgi.application'
 
 # Logging
 LOGGING = {
@@ -207,12 +212,91 @@ CORS_ORIGIN_ALLOW_ALL = True
 
 # GEOIP2
 GEOIP_PATH = os.path.join(BASE_DIR, 'geoip')
+REQUEST_LOG_GEOIP_ASYNC = True  # Store only the IP, locations are filled in by a Celery task
+REQUEST_LOG_GEOIP_CACHE_SIZE = 10000  # IP lookups kept per process
+REQUEST_LOG_GEOIP_CACHE_TTL = 60 * 60  # seconds
+REQUEST_LOG_GEOIP_CACHE_PREFIX_V4 = None  # e.g. 24 to cache per /24 network
+REQUEST_LOG_GEOIP_CACHE_PREFIX_V6 = None  # e.g. 48 to cache per /48 network
 
 # Celery for task queue
 CELERY_BROKER_URL = f'redis://{REDIS_HOST}:{REDIS_PORT}/0'  # Broker (Redis)
 CELERY_RESULT_BACKEND = f'redis://{REDIS_HOST}:{REDIS_PORT}/0'  # Optional (for task results)
 CELERY_BEAT_SCHEDULER = 'django_celery_beat.schedulers:DatabaseScheduler'  # Use DB for schedules
 
+# Request log write-behind buffer
+REQUEST_LOG_BUFFER_ENABLED = True
+REQUEST_LOG_BUFFER_SIZE = 100  # Flush after this many logs
+REQUEST_LOG_FLUSH_INTERVAL = 5  # Flush at least every N seconds
+
+# Request log body and header capture
+REQUEST_LOG_MAX_BODY_SIZE = 10 * 1024  # Bodies over this size (bytes) are not read, only their size is logged
+REQUEST_LOG_MAX_HEADER_SIZE = 1024  # Characters kept per header value
+REQUEST_LOG_BODY_CONTENT_TYPES = ['application/json', 'application/*+json', 'application/x-www-form-urlencoded', 'text/*']
+REQUEST_LOG_HEADER_ALLOWLIST = None  # e.g. ['Content-Type', 'User-Agent'] to only keep these
+REQUEST_LOG_HEADER_DENYLIST = ['Authorization', 'Cookie', 'Proxy-Authorization', 'X-Api-Key', 'X-Csrftoken']
+REQUEST_LOG_CAPTURE_RULES = [
+    # {'path': r'^/api/upload', 'body': False},  # First matching rule wins
+]
+
+# Request log sampling, errors (status >= 400) and slow requests are always kept
+REQUEST_LOG_SAMPLE_RATE = 1.0  # Fraction of healthy requests kept
+REQUEST_LOG_SAMPLE_TARGET_PER_SECOND = None  # e.g. 50 to adapt the rate to this many healthy logs per second
+REQUEST_LOG_SAMPLE_MIN_RATE = 0.01
+REQUEST_LOG_SAMPLE_SLOW_THRESHOLD = 1000  # milliseconds
+
+# Request log Redis stream ingestion
+REQUEST_LOG_STREAM_ENABLED = False  # True to only append logs to the stream instead of PostgreSQL
+REQUEST_LOG_STREAM_URL = CELERY_BROKER_URL
+REQUEST_LOG_STREAM_KEY = 'request_log:stream'
+REQUEST_LOG_STREAM_BATCH_SIZE = 5000  # Entries loaded per COPY
+REQUEST_LOG_APP = POSTGRES_SCHEMA  # Schema the logs of this service are loaded into
+
+# Request log time partitioning (see `python manage.py partition_request_logs`)
+REQUEST_LOG_PARTITION_INTERVAL = 'day'  # 'day' or 'week'
+REQUEST_LOG_PARTITION_PRECREATE = 7  # Partitions created ahead of time
+
+# Request log retention, days per status class are set with the RETENTION_DAYS configuration
+REQUEST_LOG_RETENTION_BATCH_SIZE = 5000  # Rows deleted per transaction
+REQUEST_LOG_RETENTION_PAUSE = 0.1  # Seconds between batches
+REQUEST_LOG_RETENTION_MAX_BATCHES = 200  # Per status class and run
+
+# Request log rollups, dashboard charts read per-minute aggregates instead of raw rows
+REQUEST_LOG_ROLLUPS_ENABLED = True
+REQUEST_LOG_ROLLUP_BATCH_SIZE = 100000  # Request log ids folded per transaction
+REQUEST_LOG_ROLLUP_RETENTION = {'minute': 7, 'hour': 90, 'day': None}  # Days each tier is kept, None keeps forever
+
+# Request log routes, paths normalized at ingest so /users/1 and /users/2 share the route /users/{id}
+REQUEST_LOG_ROUTE_PATTERNS = {
+    # 'myapp': [(r'/api/files/.+', '/api/files/{path}')],  # Per application, '*' applies to all
+}
+REQUEST_LOG_ROUTE_LEARNING = False  # True to also learn templates from the paths seen
+REQUEST_LOG_ROUTE_LEARNING_THRESHOLD = 100  # Distinct values before a segment becomes {param}
+
+# Request log compact storage, path, user agent, headers and error message are stored once
+# in request_log_requestlogdimension and rows keep their ids
+REQUEST_LOG_COMPACT_STORAGE = False
+REQUEST_LOG_DIMENSION_CACHE_SIZE = 100000  # Dimension ids cached per process
+
+# Central request log store, one table partitioned by created_at for every application
+REQUEST_LOG_CENTRAL_STORE_ENABLED = False  # True to sync application schemas into it and read dashboards from it
+REQUEST_LOG_CENTRAL_SCHEMA = None  # Set in a monitored service to write its logs straight into the store of this schema
+REQUEST_LOG_CENTRAL_SYNC_BATCH_SIZE = 50000  # Rows copied per transaction
+
+# Materialized view of every application's request logs (see `python manage.py refresh_request_log_view`)
+REQUEST_LOG_MATERIALIZED_VIEW_ENABLED = False  # True to refresh it and read dashboards from it
+REQUEST_LOG_MATERIALIZED_VIEW_REFRESH_ON_INGEST = False  # Also refresh after each stream or bulk batch
+
+# Aggregate the overview dashboard in Postgres, False to load the rows and aggregate them with pandas
+REQUEST_LOG_PUSHDOWN_ENABLED = True
+
+# Dashboards query applications concurrently, each on its own database connection
+REQUEST_LOG_FANOUT_MAX_CONNECTIONS = 8  # Connections per process shared by all requests
+REQUEST_LOG_FANOUT_TIMEOUT_MS = 30000  # Statement timeout of each application's query
+
+# Request logs are read through server-side cursors in chunks
+REQUEST_LOG_STREAM_CHUNK_SIZE = 10000  # Rows fetched at a time
+REQUEST_LOG_STREAM_MEMORY_LIMIT_MB = 512  # Rows a request may keep in memory, larger results are rejected
+
 # Password reset timeout
 # https://docs.djangoproject.com/en/5.1/topics/auth/default/#using-password-reset-views
 PASSWORD_RESET_TIMEOUT = 60 * 10 # 10 minutes
\ No newline at end of file
@@ -0,0 +1,13 @@
+from django.apps import AppConfig
+
+
+class RequestLogConfig(AppConfig):
+    name = 'request_log'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+
+        from request_log.utils.timing import install_query_wrapper
+
+        # Before any connection opens, so every thread's connection reports queries
+        connection_created.connect(install_query_wrapper, dispatch_uid='request_log_query_wrapper')
@@ -1,2 +1,2 @@
-from .api_exception import CustomAPIException, ValidationException, NotFoundException, UnauthorizedException
+from .api_exception import CustomAPIException, ValidationException, NotFoundException, UnauthorizedException, ResultTooLargeException
 from .custom_exception import custom_exception_handler
\ No newline at end of file
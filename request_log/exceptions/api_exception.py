@@ -38,4 +38,10 @@ class ValidationException(CustomAPIException):
 class UnauthorizedException(CustomAPIException):
     status_code = status.HTTP_401_UNAUTHORIZED
     default_message = 'Unauthorized'
-    default_detail = 'Authentication credentials were not provided or are invalid.'
\ No newline at end of file
+    default_detail = 'Authentication credentials were not provided or are invalid.'
+
+
+class ResultTooLargeException(CustomAPIException):
+    status_code = status.HTTP_400_BAD_REQUEST
+    default_message = 'Result too large'
+    default_detail = 'The requested data exceeds the memory limit, narrow the date range or filters.'
@@ -14,10 +14,9 @@ def custom_exception_handler(exc, context):
         trace_back = traceback.format_exc()
         error_message = f"{str(exc)}\n\n{trace_back}"
 
+        # The middleware persists the log once the response is ready
         if req_log.error_message != error_message:
             req_log.error_message = error_message
-            req_log.save()
-        req_log.save()
 
         # Customize the error response
         custom_response = {
@@ -1,77 +1,190 @@
-from django.contrib.gis.geoip2 import GeoIP2
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
 from request_log.models.request_log_model import RequestLog
 from request_log.utils.threading import set_current_request_log
+from request_log.utils.buffer import request_log_buffer
+from request_log.utils.stream import publish_request_log, apublish_request_log, get_stream_app, copy_central_records, instance_values, to_stream_record
+from request_log.utils.central import get_central_schema
+from request_log.utils.geoip import EMPTY_LOCATION, lookup_location
+from request_log.utils.capture import get_capture_policy
+from request_log.utils.sampling import request_log_sampler
+from request_log.utils.routes import normalize_route
+from request_log.utils.dimensions import encode_request_logs, is_compact_storage_enabled
+from request_log.utils.timing import AUTH_PHASE, SERIALIZE_PHASE, QueryTimer, get_phase_time, instrument_queries
 
 import time
-import json
+import logging
+
+logger = logging.getLogger(__name__)
 
 class RequestLogMiddleware:
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
+        self.buffer_enabled = getattr(settings, 'REQUEST_LOG_BUFFER_ENABLED', True)
+        self.stream_enabled = getattr(settings, 'REQUEST_LOG_STREAM_ENABLED', False)
+        self.geoip_async = getattr(settings, 'REQUEST_LOG_GEOIP_ASYNC', True)
+
+        # Run natively on the event loop when served through ASGI
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
     
     def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+
+        req_log = self.start_log(request)
+        if req_log is None:
+            return self.get_response(request)
+
+        with instrument_queries(req_log._query_timer):
+            view_start = time.perf_counter()
+            response = self.get_response(request)
+            req_log._view_ms = (time.perf_counter() - view_start) * 1000
+
+        self.finish_log(req_log, response, request)
+        if request_log_sampler.should_keep(req_log):
+            self.persist(req_log)
+
+        return response
+
+    async def __acall__(self, request):
+        req_log = self.start_log(request)
+        if req_log is None:
+            return await self.get_response(request)
+
+        with instrument_queries(req_log._query_timer):
+            view_start = time.perf_counter()
+            response = await self.get_response(request)
+            req_log._view_ms = (time.perf_counter() - view_start) * 1000
+
+        self.finish_log(req_log, response, request)
+        if request_log_sampler.should_keep(req_log):
+            await self.apersist(req_log)
+
+        return response
+
+    def is_whitelisted(self, request):
         whitelisted_urls = [
             "/favicon.ico",
             # "/api/request-log/"
         ]
-        
-        for url in whitelisted_urls:
-            if url in request.path:
-                return self.get_response(request)
-            
-        start_time = time.time()
+        return any(url in request.path for url in whitelisted_urls)
+
+    def start_log(self, request):
+        """
+        Build the log of an incoming request and make it the current request log.
+        Returns `None` for requests that are not logged.
+        """
+        if self.is_whitelisted(request):
+            return None
+
+        start_time = time.perf_counter()  # Monotonic, high resolution
 
         client_ip = self.get_client_ip_address(request)
-        print(f"Client IP: {client_ip}")
-        g = GeoIP2()
 
-        try:
-            location_data = g.city(client_ip)  # Get city info based on IP
-        except Exception:
-            location_data = {"city": None, 'country_name': None, 'country_code': None}
+        # Location is filled in later by the background enrichment task
+        if self.geoip_async:
+            location_data = EMPTY_LOCATION
+        else:
+            location_data = lookup_location(client_ip)  # Cached city info based on IP
+
+        # Bounded body and header capture, see request_log.utils.capture
+        policy = get_capture_policy()
+        rule = policy.rule_for(request.path)
 
         data = {
             'path': request.path,
-            'body': {},
-            'headers': dict(request.headers),
+            'body': policy.capture_body(request, rule),
+            'headers': policy.capture_headers(request, rule),
             'method': request.method,
             'ip_address': client_ip,
             'user_agent': request.META['HTTP_USER_AGENT'],
             'city': location_data['city'] or None,
             'country_name': location_data['country_name'] or None,
             'country_code': location_data['country_code'] or None,
+            'geo_enriched': not self.geoip_async,
             'process_time_ms': '0',
             'status_code': '0',
             'error_message': None
         }
 
-        # Retrieve request body safely
-        try:
-            if request.content_type == "application/json":
-                body = json.loads(request.body.decode("utf-8"))
-            else:
-                body = dict(request.POST)
-        except json.JSONDecodeError:
-            body = {}
-
-        data['body'] = json.dumps(body, default=str)  # Ensure serialization
-
         req_log = RequestLog(**data)
-        set_current_request_log(req_log)  # Store in thread-local storage
+        req_log._start_time = start_time
+        req_log._query_timer = QueryTimer()
+        set_current_request_log(req_log)  # Store in the current request context
+
+        return req_log
 
-        response = self.get_response(request)
+    def finish_log(self, req_log, response, request=None):
+        """
+        Update log with response details.
+        """
+        # URL resolution happened inside the view layer, its pattern is the best route
+        req_log.route = normalize_route(req_log.path, app=get_stream_app(), resolver_match=getattr(request, 'resolver_match', None))
+        req_log.process_time_ms = round((time.perf_counter() - req_log._start_time) * 1000, 4)
 
-        # Update log with response details
-        req_log.process_time_ms = round(time.time() - start_time, 4)  # Convert to ms
+        # Phase breakdown, auth and serialization are reported by request_log.utils.timing
+        req_log.auth_time_ms = round(get_phase_time(req_log, AUTH_PHASE), 4)
+        req_log.serialize_time_ms = round(get_phase_time(req_log, SERIALIZE_PHASE), 4)
+        req_log.view_time_ms = round(max(req_log._view_ms - req_log.auth_time_ms - req_log.serialize_time_ms, 0), 4)
+        req_log.db_query_count = req_log._query_timer.count
+        req_log.db_time_ms = round(req_log._query_timer.total_ms, 4)
         req_log.status_code = response.status_code
 
         if response.status_code == 400 and req_log.error_message is None:
             req_log.error_message = f'Response: {response.data}'
 
+    def persist(self, req_log):
+        """
+        Hand the finished log to the configured ingestion path.
+        """
+        if self.stream_enabled:
+            # Append to the Redis stream, a consumer loads it into PostgreSQL
+            try:
+                publish_request_log(req_log)
+                return
+            except Exception:
+                logger.exception("Failed to publish request log to stream, falling back to the database.")
+
+        # Persist through the write-behind buffer so the response is not blocked by an INSERT
+        if self.buffer_enabled:
+            request_log_buffer.add(req_log)
+        else:
+            self.save(req_log)
+
+    async def apersist(self, req_log):
+        """
+        Async counterpart of `persist` that never blocks the event loop.
+        """
+        if self.stream_enabled:
+            try:
+                await apublish_request_log(req_log)
+                return
+            except Exception:
+                logger.exception("Failed to publish request log to stream, falling back to the database.")
+
+        if self.buffer_enabled:
+            # A full buffer is flushed by the buffer's own thread, not on the event loop
+            request_log_buffer.add(req_log, flush_inline=False)
+        else:
+            await sync_to_async(self.save)(req_log)
+
+    def save(self, req_log):
+        """
+        Save one log directly, to the central store when configured, otherwise
+        interning its long values first under compact storage.
+        """
+        if get_central_schema():
+            copy_central_records(get_stream_app(), [to_stream_record(instance_values(req_log))])
+            return
+        if is_compact_storage_enabled():
+            encode_request_logs([req_log])
         req_log.save()
 
-        return response
-    
     def get_client_ip_address(self, request):
         req_headers = request.META
         x_forwarded_for_value = request.META.get('HTTP_X_FORWARDED_FOR')
@@ -80,4 +193,3 @@ class RequestLogMiddleware:
         else:
             ip_addr = req_headers.get('REMOTE_ADDR')
         return ip_addr
-    
\ No newline at end of file
@@ -0,0 +1,29 @@
+# Generated by Django 5.1.6 on 2026-10-18 09:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('request_log', '0002_alter_requestlog_created_at'),
+    ]
+
+    operations = [
+        # Existing rows were enriched synchronously by the middleware
+        migrations.AddField(
+            model_name='requestlog',
+            name='geo_enriched',
+            field=models.BooleanField(default=True, verbose_name='geo_enriched'),
+            preserve_default=False,
+        ),
+        migrations.AlterField(
+            model_name='requestlog',
+            name='geo_enriched',
+            field=models.BooleanField(default=False, verbose_name='geo_enriched'),
+        ),
+        migrations.AddIndex(
+            model_name='requestlog',
+            index=models.Index(condition=models.Q(('geo_enriched', False)), fields=['id'], name='requestlog_geo_pending_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.6 on 2026-10-18 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('request_log', '0003_requestlog_geo_enriched'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='requestlog',
+            name='sample_weight',
+            field=models.FloatField(default=1.0, verbose_name='sample_weight'),
+        ),
+    ]
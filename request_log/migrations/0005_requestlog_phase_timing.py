@@ -0,0 +1,43 @@
+# Generated by Django 5.1.6 on 2026-10-18 10:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('request_log', '0004_requestlog_sample_weight'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='requestlog',
+            name='auth_time_ms',
+            field=models.FloatField(default=0, verbose_name='auth_time_ms'),
+        ),
+        migrations.AddField(
+            model_name='requestlog',
+            name='view_time_ms',
+            field=models.FloatField(default=0, verbose_name='view_time_ms'),
+        ),
+        migrations.AddField(
+            model_name='requestlog',
+            name='serialize_time_ms',
+            field=models.FloatField(default=0, verbose_name='serialize_time_ms'),
+        ),
+        migrations.AddField(
+            model_name='requestlog',
+            name='db_query_count',
+            field=models.IntegerField(default=0, verbose_name='db_query_count'),
+        ),
+        migrations.AddField(
+            model_name='requestlog',
+            name='db_time_ms',
+            field=models.FloatField(default=0, verbose_name='db_time_ms'),
+        ),
+        # process_time_ms used to be stored in seconds
+        migrations.RunSQL(
+            sql="UPDATE request_log_requestlog SET process_time_ms = process_time_ms * 1000",
+            reverse_sql="UPDATE request_log_requestlog SET process_time_ms = process_time_ms / 1000",
+        ),
+    ]
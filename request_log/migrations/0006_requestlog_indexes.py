@@ -0,0 +1,33 @@
+# Generated by Django 5.1.6 on 2026-10-18 11:00
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY can not run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('request_log', '0005_requestlog_phase_timing'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='requestlog',
+            index=django.contrib.postgres.indexes.BrinIndex(autosummarize=True, fields=['created_at'], name='requestlog_created_brin'),
+        ),
+        AddIndexConcurrently(
+            model_name='requestlog',
+            index=models.Index(fields=['status_code', 'created_at'], name='requestlog_status_created_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='requestlog',
+            index=models.Index(fields=['path', 'created_at'], name='requestlog_path_created_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='requestlog',
+            index=models.Index(condition=models.Q(('status_code__gte', 400)), fields=['created_at'], name='requestlog_errors_created_idx'),
+        ),
+    ]
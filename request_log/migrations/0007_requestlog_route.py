@@ -0,0 +1,27 @@
+# Generated by Django 5.1.6 on 2026-10-18 15:00
+
+from django.db import migrations, models
+
+from request_log.utils.indexes import add_index_operation
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY can not run inside a transaction, the index is
+    # built by ensure_indexes, which also handles a partitioned table
+    atomic = False
+
+    dependencies = [
+        ('request_log', '0006_requestlog_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='requestlog',
+            name='route',
+            field=models.TextField(null=True, verbose_name='route'),
+        ),
+        add_index_operation(
+            model_name='requestlog',
+            index=models.Index(fields=['route', 'created_at'], name='requestlog_route_created_idx'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.1.6 on 2026-10-18 16:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('request_log', '0007_requestlog_route'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RequestLogDimension',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=16, verbose_name='kind')),
+                ('digest', models.CharField(max_length=32, verbose_name='digest')),
+                ('value', models.TextField(verbose_name='value')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('kind', 'digest'), name='requestlogdimension_kind_digest_uniq')],
+            },
+        ),
+        migrations.AddField(
+            model_name='requestlog',
+            name='path_key',
+            field=models.BigIntegerField(null=True, verbose_name='path_key'),
+        ),
+        migrations.AddField(
+            model_name='requestlog',
+            name='user_agent_key',
+            field=models.BigIntegerField(null=True, verbose_name='user_agent_key'),
+        ),
+        migrations.AddField(
+            model_name='requestlog',
+            name='headers_key',
+            field=models.BigIntegerField(null=True, verbose_name='headers_key'),
+        ),
+        migrations.AddField(
+            model_name='requestlog',
+            name='error_message_key',
+            field=models.BigIntegerField(null=True, verbose_name='error_message_key'),
+        ),
+    ]
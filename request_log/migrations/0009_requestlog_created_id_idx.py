@@ -0,0 +1,22 @@
+# Generated by Django 5.1.6 on 2026-10-18 18:00
+
+from django.db import migrations, models
+
+from request_log.utils.indexes import add_index_operation
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY can not run inside a transaction, the index is
+    # built by ensure_indexes, which also handles a partitioned table
+    atomic = False
+
+    dependencies = [
+        ('request_log', '0008_requestlog_dimensions'),
+    ]
+
+    operations = [
+        add_index_operation(
+            model_name='requestlog',
+            index=models.Index(fields=['created_at', 'id'], name='requestlog_created_id_idx'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.1.6 on 2026-10-18 21:00
+
+from django.db import migrations, models
+
+from request_log.utils.indexes import add_index_operation
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY can not run inside a transaction, the indexes are
+    # built by ensure_indexes, which also handles a partitioned table
+    atomic = False
+
+    dependencies = [
+        ('request_log', '0010_requestlog_pathkey_created_idx'),
+    ]
+
+    operations = [
+        add_index_operation(
+            model_name='requestlog',
+            index=models.Index(fields=['status_code', 'created_at', 'id'], name='requestlog_status_keyset_idx'),
+        ),
+        add_index_operation(
+            model_name='requestlog',
+            index=models.Index(fields=['process_time_ms', 'created_at', 'id'], name='requestlog_ptime_keyset_idx'),
+        ),
+    ]
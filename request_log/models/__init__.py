@@ -1 +1,2 @@
-from .request_log_model import RequestLog
\ No newline at end of file
+from .request_log_model import RequestLog
+from .request_log_dimension_model import RequestLogDimension
@@ -0,0 +1,15 @@
+from django.db import models
+
+class RequestLogDimension(models.Model):
+    """
+    One distinct value of a long `RequestLog` column, referenced by its id
+    from `<column>_key` when compact storage is enabled (see request_log.utils.dimensions).
+    """
+    kind = models.CharField('kind', max_length=16)  # Column the value belongs to
+    digest = models.CharField('digest', max_length=32)  # md5 of value, keeps the unique index small
+    value = models.TextField('value')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'digest'], name='requestlogdimension_kind_digest_uniq'),
+        ]
@@ -1,7 +1,11 @@
+from django.contrib.postgres.indexes import BrinIndex
 from django.db import models
+from django.db.models import Q
+from django.utils import timezone
 
 class RequestLog(models.Model):
     path = models.TextField('path')
+    route = models.TextField('route', null=True)  # Normalized path, see request_log.utils.routes
     body = models.TextField('body')
     headers = models.JSONField('headers', null=True)  # Use JSONField if using PostgreSQL
     method = models.CharField('method', max_length=8)
@@ -10,7 +14,39 @@ class RequestLog(models.Model):
     city = models.CharField('city', max_length=255, null=True)
     country_name = models.CharField('country_name', max_length=255, null=True)
     country_code = models.CharField('country_code', max_length=255, null=True)
-    process_time_ms = models.FloatField('process_time_ms')
+    geo_enriched = models.BooleanField('geo_enriched', default=False)
+    process_time_ms = models.FloatField('process_time_ms')  # Total time spent in the middleware
+    auth_time_ms = models.FloatField('auth_time_ms', default=0)
+    view_time_ms = models.FloatField('view_time_ms', default=0)  # View execution, excluding auth and serialization
+    serialize_time_ms = models.FloatField('serialize_time_ms', default=0)
+    db_query_count = models.IntegerField('db_query_count', default=0)
+    db_time_ms = models.FloatField('db_time_ms', default=0)
     status_code = models.IntegerField('status_code')
+    sample_weight = models.FloatField('sample_weight', default=1.0)  # Requests this row stands for
     error_message = models.TextField('error_message', null=True)
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(default=timezone.now)  # Request time, not flush time
+
+    # Compact storage, ids of RequestLogDimension values replacing the column of the same name
+    path_key = models.BigIntegerField('path_key', null=True)
+    user_agent_key = models.BigIntegerField('user_agent_key', null=True)
+    headers_key = models.BigIntegerField('headers_key', null=True)
+    error_message_key = models.BigIntegerField('error_message_key', null=True)
+
+    class Meta:
+        # Kept in every application schema by `manage.py ensure_request_log_indexes`
+        indexes = [
+            # Rows still waiting for background GeoIP enrichment
+            models.Index(fields=['id'], condition=Q(geo_enriched=False), name='requestlog_geo_pending_idx'),
+            # Time-range scans over append-only data
+            BrinIndex(fields=['created_at'], name='requestlog_created_brin', autosummarize=True),
+            models.Index(fields=['status_code', 'created_at'], name='requestlog_status_created_idx'),
+            models.Index(fields=['path', 'created_at'], name='requestlog_path_created_idx'),
+            models.Index(fields=['path_key', 'created_at'], name='requestlog_pathkey_created_idx'),  # Paths under compact storage
+            models.Index(fields=['route', 'created_at'], name='requestlog_route_created_idx'),
+            # Keyset pagination of the data tables, per sortable column
+            models.Index(fields=['created_at', 'id'], name='requestlog_created_id_idx'),
+            models.Index(fields=['status_code', 'created_at', 'id'], name='requestlog_status_keyset_idx'),
+            models.Index(fields=['process_time_ms', 'created_at', 'id'], name='requestlog_ptime_keyset_idx'),
+            # Error dashboards and alerts
+            models.Index(fields=['created_at'], condition=Q(status_code__gte=400), name='requestlog_errors_created_idx'),
+        ]
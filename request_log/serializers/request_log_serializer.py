@@ -1,7 +1,17 @@
 from request_log.models import RequestLog
+from request_log.utils.routes import normalize_route
 from rest_framework import serializers
 
 class RequestLogSerializer(serializers.ModelSerializer):
     class Meta:
         model = RequestLog
         fields = '__all__'
+
+    def validate(self, attrs):
+        # Clients sending only the raw path get its normalized route
+        if not attrs.get('route') and attrs.get('path'):
+            attrs['route'] = normalize_route(attrs['path'])
+        # Logs sent with a location are not enriched again in the background, like bulk records
+        if 'geo_enriched' not in attrs and any(attrs.get(key) for key in ('city', 'country_name', 'country_code')):
+            attrs['geo_enriched'] = True
+        return attrs
@@ -0,0 +1,233 @@
+import io
+from datetime import datetime, timezone as dt_timezone
+from types import SimpleNamespace
+from unittest import mock
+
+import msgpack
+from django.db import DatabaseError, connection, transaction
+from django.http import HttpResponse
+from django.test import AsyncClient, RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import path
+
+from request_log.middlewares.request_log_middleware import RequestLogMiddleware
+from request_log.utils.bulk import BulkRecordError, UnsupportedContentTypeError, iter_raw_records, validate_record
+from request_log.utils.capture import CapturePolicy
+from request_log.utils.dimensions import DimensionCache
+from request_log.utils.retention import parse_retention_policy
+from request_log.utils.routes import RouteNormalizer, route_from_resolver
+
+
+def query_view(request):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1")
+    return HttpResponse()
+
+
+urlpatterns = [path('query/', query_view)]
+
+
+class NormalizeRouteTests(SimpleTestCase):
+    def setUp(self):
+        self.normalizer = RouteNormalizer(patterns={}, learning=False)
+
+    def test_builtin_rules(self):
+        cases = {
+            '/api/users/42': '/api/users/{id}',
+            '/api/orders/9f3c2b1e-0a4d-4c5e-8f6a-1b2c3d4e5f60/items': '/api/orders/{uuid}/items',
+            '/files/0123456789abcdef0123': '/files/{hash}',
+            '/invite/Zx9_kq2LmN4pR7sT1vW3yA': '/invite/{token}',
+            '/api/v1/health': '/api/v1/health',
+        }
+        for path, route in cases.items():
+            with self.subTest(path=path):
+                self.assertEqual(self.normalizer.normalize(path), route)
+
+    def test_edge_paths(self):
+        self.assertEqual(self.normalizer.normalize(''), '')
+        self.assertEqual(self.normalizer.normalize('/'), '/')
+        self.assertEqual(self.normalizer.normalize('/api/users/42/'), '/api/users/{id}/')
+        self.assertEqual(self.normalizer.normalize('//api//users//42'), '/api/users/{id}')
+        # Short hex words and plain words are left alone
+        self.assertEqual(self.normalizer.normalize('/beef/cafe'), '/beef/cafe')
+
+    def test_patterns_per_application(self):
+        normalizer = RouteNormalizer(patterns={'shop': [(r'/p/.+', '/p/{slug}')], '*': [(r'/static/.*', '/static/{file}')]}, learning=False)
+
+        self.assertEqual(normalizer.normalize('/p/red-shoes', app='SHOP'), '/p/{slug}')
+        self.assertEqual(normalizer.normalize('/p/red-shoes', app='blog'), '/p/red-shoes')
+        self.assertEqual(normalizer.normalize('/static/app.js', app='blog'), '/static/{file}')
+
+    def test_learned_parameters(self):
+        normalizer = RouteNormalizer(patterns={}, learning=True, threshold=3)
+        for name in ('alice', 'bob', 'carol'):
+            normalizer.normalize(f'/profiles/{name}', app='myapp')
+
+        self.assertEqual(normalizer.normalize('/profiles/dave', app='myapp'), '/profiles/{param}')
+        self.assertEqual(normalizer.normalize('/profiles/alice', app='myapp'), '/profiles/{param}')
+        # Learned per application
+        self.assertEqual(normalizer.normalize('/profiles/dave', app='other'), '/profiles/dave')
+
+    def test_route_from_resolver(self):
+        self.assertEqual(route_from_resolver(SimpleNamespace(route='api/users/<int:pk>/')), '/api/users/{pk}/')
+        self.assertEqual(route_from_resolver(SimpleNamespace(route='^api/(?P<pk>[0-9]+)/$')), '/api/{pk}/')
+        self.assertIsNone(route_from_resolver(SimpleNamespace(route='^api/users/?$')))
+        self.assertIsNone(route_from_resolver(None))
+
+
+class ValidateRecordTests(SimpleTestCase):
+    RECORD = {'path': '/api/users/42', 'method': 'get', 'ip_address': '10.0.0.1', 'status_code': 200, 'process_time_ms': 12.5}
+
+    def test_defaults(self):
+        values = validate_record(dict(self.RECORD))
+
+        self.assertEqual(values['method'], 'GET')
+        self.assertEqual(values['sample_weight'], 1.0)
+        self.assertFalse(values['geo_enriched'])
+        self.assertEqual(values['body'], '{}')
+        for column in ('auth_time_ms', 'view_time_ms', 'serialize_time_ms', 'db_time_ms', 'db_query_count'):
+            self.assertEqual(values[column], 0, column)
+        self.assertIsNotNone(values['created_at'].tzinfo)
+
+    def test_location_marks_record_enriched(self):
+        values = validate_record({**self.RECORD, 'country_code': 'ID'})
+
+        self.assertTrue(values['geo_enriched'])
+
+    def test_created_at(self):
+        values = validate_record({**self.RECORD, 'created_at': '2026-01-01T00:00:00+00:00'})
+
+        self.assertEqual(values['created_at'], datetime(2026, 1, 1, tzinfo=dt_timezone.utc))
+
+    def test_invalid_records(self):
+        invalid = [
+            'not an object',
+            {**self.RECORD, 'path': ''},
+            {**self.RECORD, 'ip_address': '10.0.0.256'},
+            {**self.RECORD, 'status_code': 700},
+            {**self.RECORD, 'status_code': 'ok'},
+            {**self.RECORD, 'process_time_ms': -1},
+            {**self.RECORD, 'sample_weight': -2},
+            {**self.RECORD, 'db_time_ms': -1},
+            {**self.RECORD, 'method': 'PROPPATCHX'},
+            {**self.RECORD, 'headers': ['a']},
+            {**self.RECORD, 'created_at': 'yesterday'},
+            BulkRecordError('Invalid JSON'),
+        ]
+        for raw in invalid:
+            with self.subTest(raw=raw), self.assertRaises(BulkRecordError):
+                validate_record(raw)
+
+
+class IterRawRecordsTests(SimpleTestCase):
+    def test_ndjson(self):
+        stream = io.BytesIO(b'{"a": 1}\n\nnot json\n{"b": 2}\n')
+
+        records = list(iter_raw_records(stream, 'application/x-ndjson; charset=utf-8'))
+
+        self.assertEqual(records[0], {'a': 1})
+        self.assertIsInstance(records[1], BulkRecordError)
+        self.assertEqual(records[2], {'b': 2})
+
+    def test_msgpack_stream_and_array(self):
+        body = msgpack.packb({'a': 1}) + msgpack.packb([{'b': 2}, {'c': 3}])
+
+        self.assertEqual(list(iter_raw_records(io.BytesIO(body), 'application/msgpack')), [{'a': 1}, {'b': 2}, {'c': 3}])
+
+    def test_malformed_msgpack(self):
+        for body in (b'\xc1', b'\xa2\xff\xfe'):
+            # Reserved type byte, string that is not UTF-8
+            with self.subTest(body=body[:4]), self.assertRaises(BulkRecordError):
+                list(iter_raw_records(io.BytesIO(body), 'application/msgpack'))
+
+    def test_unsupported_content_type(self):
+        with self.assertRaises(UnsupportedContentTypeError):
+            list(iter_raw_records(io.BytesIO(b''), 'text/csv'))
+
+
+class ParseRetentionPolicyTests(SimpleTestCase):
+    def test_policies(self):
+        self.assertEqual(parse_retention_policy(None), {})
+        self.assertEqual(parse_retention_policy(''), {})
+        self.assertEqual(parse_retention_policy('{}'), {})
+        self.assertEqual(parse_retention_policy("{'2XX': 7, '5xx': 90}"), {'2xx': 7, '5xx': 90})
+        # None keeps the class forever
+        self.assertEqual(parse_retention_policy({'2xx': 7, '4xx': None}), {'2xx': 7})
+
+    def test_invalid_policies(self):
+        for value in ("[7]", "{'6xx': 7}", "{'2xx': 0}", "{'2xx': 1.5}", "{'2xx': '7'}", {'2xx': True}, "{'2xx': False}"):
+            with self.subTest(value=value), self.assertRaises(ValueError):
+                parse_retention_policy(value)
+
+    def test_malformed_policy(self):
+        with self.assertRaises((ValueError, SyntaxError)):
+            parse_retention_policy("{'2xx': ")
+
+
+@override_settings(ROOT_URLCONF=__name__)
+class AsgiQueryTimingTests(TestCase):
+    async def test_sync_view_queries_are_counted(self):
+        # The sync view runs on another thread, with its own connection, than the middleware
+        with mock.patch('request_log.middlewares.request_log_middleware.request_log_sampler.should_keep', return_value=True), \
+                mock.patch('request_log.middlewares.request_log_middleware.normalize_route', return_value='/query/'), \
+                mock.patch.object(RequestLogMiddleware, 'apersist') as apersist:
+            response = await AsyncClient().get('/query/', headers={'user-agent': 'tests'})
+
+        self.assertEqual(response.status_code, 200)
+        req_log = apersist.call_args.args[0]
+        self.assertEqual(req_log.db_query_count, 1)
+        self.assertGreater(req_log.db_time_ms, 0)
+
+
+class DimensionCacheTests(TestCase):
+    def test_ids_are_cached_on_commit(self):
+        cache = DimensionCache(max_size=10)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ids = cache.get_ids(None, 'path', ['/committed'])
+            self.assertEqual(cache.stats()['size'], 0)
+
+        self.assertEqual(cache.stats()['size'], 1)
+        self.assertEqual(cache.get_ids(None, 'path', ['/committed']), ids)
+        self.assertEqual(cache.stats()['hits'], 1)
+
+    def test_rolled_back_ids_are_not_cached(self):
+        cache = DimensionCache(max_size=10)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(DatabaseError), transaction.atomic():
+                cache.get_ids(None, 'path', ['/rolled-back'])
+                raise DatabaseError('rollback')
+
+        self.assertEqual(cache.stats()['size'], 0)
+        self.assertEqual(cache.find_ids(None, 'path', ['/rolled-back']), {})
+
+
+class CaptureBodyTests(SimpleTestCase):
+    def setUp(self):
+        self.policy = CapturePolicy(max_body_size=8, rules=[])
+
+    def post(self, body: bytes):
+        return RequestFactory().post('/api/items', data=body, content_type='application/json')
+
+    def test_body_within_limit(self):
+        request = self.post(b'{"a": 1}')
+
+        self.assertEqual(self.policy.capture_body(request), '{"a": 1}')
+        self.assertEqual(request.body, b'{"a": 1}')
+
+    def test_oversize_body_keeps_prefix_and_is_replayed(self):
+        body = b'{"items": [1, 2, 3]}'
+        request = self.post(body)
+
+        self.assertEqual(self.policy.capture_body(request), f'{{"items"...[truncated, {len(body)} bytes]')
+        self.assertEqual(request.body, body)
+
+    def test_body_without_length_is_read_up_to_the_limit(self):
+        body = b'{"items": [1, 2, 3]}'
+        request = self.post(b'')
+        del request.META['CONTENT_LENGTH']
+        request._stream = io.BytesIO(body)
+
+        self.assertEqual(self.policy.capture_body(request), '{"items"...[truncated, over 8 bytes]')
+        self.assertEqual(request._stream._stream.tell(), 9)
+        self.assertEqual(request.read(), body)
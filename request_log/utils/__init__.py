@@ -1 +1,16 @@
-from .threading import get_current_request_log, set_current_request_log, get_current_user, set_current_user
\ No newline at end of file
+from .threading import get_current_request_log, set_current_request_log, get_current_user, set_current_user
+from .buffer import RequestLogBuffer, request_log_buffer
+from .stream import RequestLogStreamConsumer, publish_request_log
+from .geoip import get_geoip_reader, lookup_location, geoip_stats, enrich_pending_locations
+from .schema import qualified_table, validate_schema
+from .capture import CapturePolicy, get_capture_policy
+from .sampling import RequestLogSampler, request_log_sampler
+from .bulk import BulkRecordError, UnsupportedContentTypeError, ingest_bulk
+from .timing import phase, timed_phase, TimedJSONRenderer
+from .indexes import ensure_indexes
+from .partitions import convert_to_partitioned, ensure_partitions, list_partitions
+from .retention import parse_retention_policy, purge_central_request_logs, purge_request_logs
+from .routes import RouteNormalizer, normalize_route, route_normalizer
+from .dimensions import DimensionCache, decode_sql, dimension_cache, encode_records, filter_sql
+from .central import get_central_schema, sync_central_store
+from .watermark import advance_commit_horizon
@@ -0,0 +1,155 @@
+# request_log_buffer_util.py
+"""
+Write-behind buffer for `RequestLog` rows.
+Finished logs are collected in memory per process and persisted with a
+single `bulk_create` once the size or time threshold is reached.
+"""
+
+import atexit
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.db import connections
+
+from request_log.models.request_log_model import RequestLog
+from request_log.utils.central import get_central_schema
+from request_log.utils.dimensions import encode_request_logs, is_compact_storage_enabled
+from request_log.utils.stream import copy_central_records, get_stream_app, instance_values, to_stream_record
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUFFER_SIZE = 100
+DEFAULT_FLUSH_INTERVAL = 5  # seconds
+
+
+class RequestLogBuffer:
+    """
+    Collects finished `RequestLog` instances and flushes them in batches.
+
+    A flush happens when the buffer holds `max_size` logs, when
+    `flush_interval` seconds have passed since the last flush, or when
+    the process exits gracefully.
+    """
+
+    def __init__(self, max_size=None, flush_interval=None):
+        self.max_size = max_size or getattr(settings, "REQUEST_LOG_BUFFER_SIZE", DEFAULT_BUFFER_SIZE)
+        self.flush_interval = flush_interval or getattr(settings, "REQUEST_LOG_FLUSH_INTERVAL", DEFAULT_FLUSH_INTERVAL)
+        self._reset()
+        atexit.register(self.flush)
+
+    def _reset(self):
+        """
+        (Re)initialise per-process state. Called again after a fork so that
+        children never share the parent's lock, pending logs or timer thread.
+        """
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending = []
+        self._timer = None
+        self._wakeup = threading.Event()
+        self._last_flush = time.monotonic()
+        self._counters = {
+            "flushes": 0,
+            "flushed_logs": 0,
+            "failed_flushes": 0,
+            "dropped_logs": 0,
+            "last_flush_ms": 0.0,
+            "max_flush_ms": 0.0,
+            "total_flush_ms": 0.0,
+        }
+
+    def _ensure_process(self):
+        if self._pid != os.getpid():
+            self._reset()
+
+    def _ensure_timer(self):
+        if self._timer is None or not self._timer.is_alive():
+            self._timer = threading.Thread(target=self._run_timer, name="request-log-buffer", daemon=True)
+            self._timer.start()
+
+    def _run_timer(self):
+        while True:
+            woken = self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            if woken or time.monotonic() - self._last_flush >= self.flush_interval:
+                self.flush()
+                # The timer thread owns its own DB connection, release it.
+                connections.close_all()
+
+    def add(self, request_log: RequestLog, flush_inline: bool = True) -> None:
+        """
+        Queue a finished `request_log` for persistence.
+
+        With `flush_inline=False` (used on the event loop) a full buffer is
+        handed to the timer thread instead of being flushed by the caller.
+        """
+        self._ensure_process()
+        with self._lock:
+            self._pending.append(request_log)
+            self._ensure_timer()
+            should_flush = len(self._pending) >= self.max_size
+
+        if should_flush:
+            if flush_inline:
+                self.flush()
+            else:
+                self._wakeup.set()
+
+    def flush(self) -> int:
+        """
+        Persist every pending log with one `bulk_create`, or one `COPY` into the central store.
+        Returns the number of logs written.
+        """
+        self._ensure_process()
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, []
+                self._last_flush = time.monotonic()
+
+            if not batch:
+                return 0
+
+            started = time.perf_counter()
+            try:
+                if get_central_schema():
+                    copy_central_records(get_stream_app(), [to_stream_record(instance_values(log)) for log in batch])
+                else:
+                    if is_compact_storage_enabled():
+                        encode_request_logs(batch)
+                    RequestLog.objects.bulk_create(batch, batch_size=self.max_size)
+            except Exception:
+                logger.exception("Failed to flush %s request logs.", len(batch))
+                self._counters["failed_flushes"] += 1
+                self._counters["dropped_logs"] += len(batch)
+                return 0
+
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            self._counters["flushes"] += 1
+            self._counters["flushed_logs"] += len(batch)
+            self._counters["last_flush_ms"] = round(elapsed_ms, 4)
+            self._counters["max_flush_ms"] = round(max(self._counters["max_flush_ms"], elapsed_ms), 4)
+            self._counters["total_flush_ms"] += elapsed_ms
+            return len(batch)
+
+    def stats(self) -> dict:
+        """
+        Returns buffer depth and flush counters for the current process.
+        """
+        self._ensure_process()
+        flushes = self._counters["flushes"]
+        return {
+            **self._counters,
+            "pid": self._pid,
+            "depth": len(self._pending),
+            "max_size": self.max_size,
+            "flush_interval": self.flush_interval,
+            "total_flush_ms": round(self._counters["total_flush_ms"], 4),
+            "avg_flush_ms": round(self._counters["total_flush_ms"] / flushes, 4) if flushes else 0,
+        }
+
+
+request_log_buffer = RequestLogBuffer()
@@ -0,0 +1,193 @@
+# request_log_bulk_util.py
+"""
+Streaming parsing and validation of bulk request log uploads.
+Records are read one at a time from NDJSON or msgpack bodies, validated
+with plain type checks instead of a serializer per record, and loaded
+with `COPY` in fixed-size chunks.
+"""
+
+import ipaddress
+import json
+from datetime import datetime
+
+import msgpack
+from django.utils import timezone
+
+from request_log.utils.stream import copy_records, to_stream_record
+
+NDJSON_CONTENT_TYPES = {"application/x-ndjson", "application/ndjson", "application/jsonl", "application/json-lines"}
+MSGPACK_CONTENT_TYPES = {"application/msgpack", "application/x-msgpack", "application/vnd.msgpack"}
+DEFAULT_CHUNK_SIZE = 5000
+MAX_REPORTED_ERRORS = 100
+# NOT NULL columns defaulted in Python only, sent as 0 when a record leaves them out
+TIMING_COLUMNS = ("auth_time_ms", "view_time_ms", "serialize_time_ms", "db_time_ms")
+
+
+class BulkRecordError(ValueError):
+    """Raised for a record that can not be stored."""
+
+
+class UnsupportedContentTypeError(BulkRecordError):
+    """Raised for a body in a format bulk uploads do not accept."""
+
+
+def iter_raw_records(stream, content_type: str):
+    """
+    Yields decoded records from `stream` without buffering the whole body.
+    Undecodable NDJSON lines are yielded as `BulkRecordError` instances, a
+    malformed msgpack body can not be resynchronized and raises it.
+    """
+    content_type = (content_type or "").split(";")[0].strip().lower()
+
+    if content_type in NDJSON_CONTENT_TYPES:
+        for line in iter(stream.readline, b""):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError as e:
+                yield BulkRecordError(f"Invalid JSON: {e}")
+    elif content_type in MSGPACK_CONTENT_TYPES:
+        # Either a stream of maps or a single array of maps
+        unpacker = msgpack.Unpacker(stream, raw=False, timestamp=3)
+        while True:
+            try:
+                item = next(unpacker)
+            except StopIteration:
+                break
+            except (msgpack.ExtraData, msgpack.FormatError, msgpack.StackError, msgpack.UnpackValueError, ValueError) as e:
+                raise BulkRecordError(f"Invalid msgpack: {e}")
+            if isinstance(item, list):
+                yield from item
+            else:
+                yield item
+    else:
+        raise UnsupportedContentTypeError(f"Unsupported content type: {content_type or 'none'}")
+
+
+def _required(raw: dict, key: str):
+    value = raw.get(key)
+    if value is None or value == "":
+        raise BulkRecordError(f"`{key}` is required")
+    return value
+
+
+def _optional_text(raw: dict, key: str, max_length: "int | None" = None):
+    value = raw.get(key)
+    if value is None or value == "":
+        return None
+    value = str(value)
+    if max_length is not None and len(value) > max_length:
+        raise BulkRecordError(f"`{key}` is longer than {max_length} characters")
+    return value
+
+
+def validate_record(raw) -> dict:
+    """
+    Returns `raw` as a `RequestLog` values dict or raises `BulkRecordError`.
+    Nullable columns not handled here are left NULL on `COPY`.
+    """
+    if isinstance(raw, BulkRecordError):
+        raise raw
+    if not isinstance(raw, dict):
+        raise BulkRecordError("Record must be an object")
+
+    method = str(_required(raw, "method")).upper()
+    if len(method) > 8:
+        raise BulkRecordError("`method` is longer than 8 characters")
+
+    ip = str(_required(raw, "ip_address"))
+    try:
+        ipaddress.ip_address(ip)
+    except ValueError:
+        raise BulkRecordError(f"`ip_address` is not a valid IP address: {ip}")
+
+    try:
+        status_code = int(_required(raw, "status_code"))
+        process_time_ms = float(_required(raw, "process_time_ms"))
+        sample_weight = float(raw.get("sample_weight") or 1.0)
+    except (TypeError, ValueError) as e:
+        raise BulkRecordError(f"Invalid number: {e}")
+    if not 100 <= status_code <= 599:
+        raise BulkRecordError(f"`status_code` out of range: {status_code}")
+    if process_time_ms < 0 or sample_weight <= 0:
+        raise BulkRecordError("`process_time_ms` and `sample_weight` must be positive")
+
+    try:
+        timing = {key: float(raw.get(key) or 0) for key in TIMING_COLUMNS}
+        timing["db_query_count"] = int(raw.get("db_query_count") or 0)
+    except (TypeError, ValueError) as e:
+        raise BulkRecordError(f"Invalid number: {e}")
+    if any(value < 0 for value in timing.values()):
+        raise BulkRecordError("Phase timings and `db_query_count` must not be negative")
+
+    created_at = raw.get("created_at")
+    if created_at is None:
+        created_at = timezone.now()
+    elif not isinstance(created_at, datetime):
+        try:
+            created_at = datetime.fromisoformat(str(created_at))
+        except ValueError:
+            raise BulkRecordError(f"`created_at` is not an ISO 8601 datetime: {created_at}")
+    if timezone.is_naive(created_at):
+        created_at = timezone.make_aware(created_at)
+
+    headers = raw.get("headers")
+    if headers is not None and not isinstance(headers, dict):
+        raise BulkRecordError("`headers` must be an object")
+
+    body = raw.get("body")
+    if body is None:
+        body = "{}"
+    elif not isinstance(body, str):
+        body = json.dumps(body, default=str)
+
+    location = {key: _optional_text(raw, key, 255) for key in ("city", "country_name", "country_code")}
+
+    return {
+        "path": str(_required(raw, "path")),
+        # Normalized on COPY when not sent, see `copy_records`
+        "route": _optional_text(raw, "route"),
+        "body": body,
+        "headers": headers,
+        "method": method,
+        "ip_address": ip,
+        "user_agent": str(raw.get("user_agent") or ""),
+        **location,
+        # Records without a location are enriched in the background
+        "geo_enriched": any(location.values()),
+        "process_time_ms": process_time_ms,
+        **timing,
+        "status_code": status_code,
+        "sample_weight": sample_weight,
+        "error_message": _optional_text(raw, "error_message"),
+        "created_at": created_at,
+    }
+
+
+def ingest_bulk(stream, content_type: str, schema: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> dict:
+    """
+    Validates every record of `stream` and loads the valid ones into
+    `schema` with one `COPY` per `chunk_size` records.
+    """
+    accepted, rejected, errors = 0, 0, []
+    chunk = []
+
+    for index, raw in enumerate(iter_raw_records(stream, content_type)):
+        try:
+            chunk.append(to_stream_record(validate_record(raw)))
+        except BulkRecordError as e:
+            rejected += 1
+            if len(errors) < MAX_REPORTED_ERRORS:
+                errors.append({"index": index, "error": str(e)})
+            continue
+
+        if len(chunk) >= chunk_size:
+            accepted += copy_records(schema, chunk)
+            chunk = []
+
+    if chunk:
+        accepted += copy_records(schema, chunk)
+
+    return {"accepted": accepted, "rejected": rejected, "errors": errors}
@@ -0,0 +1,186 @@
+# request_log_capture_util.py
+"""
+Capture policy for request bodies and headers.
+Keeps the memory and CPU spent per request, and the size of every
+`request_log_requestlog` row, bounded regardless of what clients send.
+"""
+
+import fnmatch
+import io
+import json
+import re
+from functools import lru_cache
+
+from django.conf import settings
+
+DEFAULT_MAX_BODY_SIZE = 10 * 1024  # bytes
+DEFAULT_MAX_HEADER_SIZE = 1024  # characters per header value
+DEFAULT_BODY_CONTENT_TYPES = [
+    "application/json",
+    "application/*+json",
+    "application/x-www-form-urlencoded",
+    "text/*",
+]
+DEFAULT_HEADER_DENYLIST = [
+    "Authorization",
+    "Cookie",
+    "Proxy-Authorization",
+    "X-Api-Key",
+    "X-Csrftoken",
+]
+
+EMPTY_BODY = "{}"
+
+
+class ReplayStream:
+    """
+    Request stream returning `prefix`, already read for the log, then the rest of `stream`.
+    """
+
+    def __init__(self, prefix: bytes, stream):
+        self._prefix = io.BytesIO(prefix)
+        self._stream = stream
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            return self._prefix.read() + self._stream.read()
+        data = self._prefix.read(size)
+        if len(data) < size:
+            data += self._stream.read(size - len(data))
+        return data
+
+    def readline(self, size=-1):
+        line = self._prefix.readline(size)
+        if line.endswith(b"\n") or (size is not None and 0 <= size <= len(line)):
+            return line
+        return line + self._stream.readline(size - len(line) if size is not None and size >= 0 else -1)
+
+
+def read_bounded(stream, size: int) -> bytes:
+    """
+    Returns the next `size` bytes of `stream`, fewer only at its end.
+    """
+    chunks, remaining = [], size
+    while remaining > 0:
+        chunk = stream.read(remaining)
+        if not chunk:
+            break
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return b"".join(chunks)
+
+
+class CapturePolicy:
+    """
+    Decides what part of a request is stored in its log.
+
+    `rules` is a list of dicts matched in order against `request.path`, e.g.
+    `{"path": r"^/api/upload", "body": False}`. The first matching rule may
+    override `body`, `headers` and `max_body_size`.
+    """
+
+    def __init__(self, max_body_size=None, max_header_size=None, body_content_types=None,
+                 header_allowlist=None, header_denylist=None, rules=None):
+        self.max_body_size = max_body_size if max_body_size is not None else getattr(settings, "REQUEST_LOG_MAX_BODY_SIZE", DEFAULT_MAX_BODY_SIZE)
+        self.max_header_size = max_header_size if max_header_size is not None else getattr(settings, "REQUEST_LOG_MAX_HEADER_SIZE", DEFAULT_MAX_HEADER_SIZE)
+        self.body_content_types = body_content_types if body_content_types is not None else getattr(settings, "REQUEST_LOG_BODY_CONTENT_TYPES", DEFAULT_BODY_CONTENT_TYPES)
+
+        allowlist = header_allowlist if header_allowlist is not None else getattr(settings, "REQUEST_LOG_HEADER_ALLOWLIST", None)
+        denylist = header_denylist if header_denylist is not None else getattr(settings, "REQUEST_LOG_HEADER_DENYLIST", DEFAULT_HEADER_DENYLIST)
+        self.header_allowlist = {header.lower() for header in allowlist} if allowlist is not None else None
+        self.header_denylist = {header.lower() for header in denylist}
+
+        rules = rules if rules is not None else getattr(settings, "REQUEST_LOG_CAPTURE_RULES", [])
+        self.rules = [(re.compile(rule["path"]), rule) for rule in rules]
+
+    def rule_for(self, path: str) -> dict:
+        for pattern, rule in self.rules:
+            if pattern.match(path):
+                return rule
+        return {}
+
+    def is_body_content_type(self, content_type: str) -> bool:
+        content_type = (content_type or "").lower()
+        return any(fnmatch.fnmatch(content_type, pattern) for pattern in self.body_content_types)
+
+    def capture_headers(self, request, rule=None) -> dict:
+        """
+        Returns the allowed headers with each value cut to `max_header_size`.
+        """
+        rule = self.rule_for(request.path) if rule is None else rule
+        if not rule.get("headers", True):
+            return {}
+
+        headers = {}
+        for name, value in request.headers.items():
+            key = name.lower()
+            if key in self.header_denylist:
+                continue
+            if self.header_allowlist is not None and key not in self.header_allowlist:
+                continue
+            headers[name] = value[:self.max_header_size]
+        return headers
+
+    def capture_body(self, request, rule=None) -> str:
+        """
+        Returns the body as text, without parsing it, bounded by `max_body_size`.
+
+        Bodies over the limit, or without a length (chunked), are never read
+        whole here: at most one byte past the limit is read from the stream and
+        replayed to the view, and a body over the limit is stored as its prefix
+        followed by its size.
+        """
+        rule = self.rule_for(request.path) if rule is None else rule
+        if not rule.get("body", True) or not self.is_body_content_type(request.content_type):
+            return EMPTY_BODY
+
+        max_body_size = rule.get("max_body_size", self.max_body_size)
+        try:
+            content_length = int(request.META.get("CONTENT_LENGTH") or 0)
+        except ValueError:
+            content_length = 0
+
+        if content_length > max_body_size:
+            return self.truncated_body(self.read_prefix(request, max_body_size), content_length)
+
+        if not content_length:
+            # One byte past the limit tells whether a body of unknown length fits
+            prefix = self.read_prefix(request, max_body_size + 1)
+            if prefix is not None and len(prefix) > max_body_size:
+                return self.truncated_body(prefix[:max_body_size], f"over {max_body_size}")
+
+        if request.content_type == "application/x-www-form-urlencoded":
+            return json.dumps(dict(request.POST), default=str)
+
+        try:
+            body = request.body
+        except Exception:  # RawPostDataException, body already streamed by a parser
+            return EMPTY_BODY
+        return body[:max_body_size].decode("utf-8", errors="replace") or EMPTY_BODY
+
+    def read_prefix(self, request, size: int) -> "bytes | None":
+        """
+        Returns the first `size` bytes of the body, reading them from the
+        request stream and replaying them to the view unless the body is
+        already buffered. `None` once a parser has streamed the body.
+        """
+        buffered = getattr(request, "_body", None)
+        if buffered is not None:
+            return buffered[:size]
+        if getattr(request, "_read_started", False):
+            return None
+        prefix = read_bounded(request._stream, size)
+        request._stream = ReplayStream(prefix, request._stream)
+        return prefix
+
+    def truncated_body(self, prefix: "bytes | None", size) -> str:
+        prefix = (prefix or b"").decode("utf-8", errors="replace")
+        return f"{prefix}...[truncated, {size} bytes]"
+
+
+@lru_cache(maxsize=1)
+def get_capture_policy() -> CapturePolicy:
+    """
+    Returns the policy built from settings, compiled once per process.
+    """
+    return CapturePolicy()
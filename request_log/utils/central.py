@@ -0,0 +1,143 @@
+# request_log_central_util.py
+"""
+Central request log store.
+
+`request_log_central` keeps the logs of every application in one table
+partitioned by `created_at`, each row tagged with the `app_id` of its
+`Application`, so one indexed query serves any set of applications. It lives
+in the schema of the monitoring service and is fed either directly by the
+ingestion path of monitored services setting `REQUEST_LOG_CENTRAL_SCHEMA`, or
+by `sync_central_store` copying new rows from the per-schema tables. An
+application should use one of the two, not both.
+"""
+
+import logging
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from request_log.models.request_log_model import RequestLog
+from request_log.utils.dimensions import DIMENSIONS, decode_sql
+from request_log.utils.schema import qualified_table, validate_schema
+from request_log.utils.watermark import advance_commit_horizon
+
+logger = logging.getLogger(__name__)
+
+CENTRAL_TABLE = "request_log_central"
+SYNC_TABLE = "request_log_central_sync"  # Commit horizon of `sync_central_store` per application
+APPLICATION_TABLE = "api_application"  # Application registry of the monitoring service
+DEFAULT_SYNC_BATCH_SIZE = 50000
+DEFAULT_SYNC_MAX_BATCHES = 20  # per application and run
+
+# Dimension ids only mean something in their own schema, central rows keep plain values
+REQUEST_LOG_COLUMNS = [
+    field.attname for field in RequestLog._meta.concrete_fields
+    if field.attname not in {f"{dimension}_key" for dimension in DIMENSIONS}
+]
+
+_columns = {}
+_app_ids = {}
+
+
+def get_central_schema() -> "str | None":
+    """
+    Returns the schema of the central store this service writes into, `None` when it writes locally.
+    """
+    return getattr(settings, "REQUEST_LOG_CENTRAL_SCHEMA", None)
+
+
+def central_table(schema: "str | None" = None, table: str = CENTRAL_TABLE) -> str:
+    return qualified_table(schema, table) if schema else connection.ops.quote_name(table)
+
+
+def central_columns(schema: "str | None" = None) -> list:
+    """
+    Returns the request log columns present in the central table, cached per
+    process, so writers keep working while a new column is not yet added to it.
+    """
+    if schema not in _columns:
+        name = f"{validate_schema(schema)}.{CENTRAL_TABLE}" if schema else CENTRAL_TABLE
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT attname FROM pg_attribute WHERE attrelid = to_regclass(%s) AND attnum > 0 AND NOT attisdropped",
+                [name],
+            )
+            existing = {row[0] for row in cursor.fetchall()}
+        if not existing:
+            raise ValueError(f"Central request log table {name} does not exist")
+        _columns[schema] = [column for column in REQUEST_LOG_COLUMNS if column in existing]
+    return _columns[schema]
+
+
+def get_app_id(app: str, schema: "str | None" = None) -> int:
+    """
+    Returns the `Application` id of `app`, looked up once per process.
+    """
+    key = (schema, app.lower())
+    if key not in _app_ids:
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT id FROM {central_table(schema, APPLICATION_TABLE)} WHERE lower(app) = %s", [app.lower()])
+            row = cursor.fetchone()
+        if row is None:
+            raise ValueError(f"Unknown application: {app}")
+        _app_ids[key] = row[0]
+    return _app_ids[key]
+
+
+def advance_sync_horizon(app_id: int, schema: str) -> int:
+    """
+    Move the commit horizon of the `schema` table synced as `app_id` forward,
+    see `request_log.utils.watermark`. Returns the id rows may be copied up to.
+    """
+    table = central_table(table=SYNC_TABLE)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"INSERT INTO {table} (app_id) VALUES (%s) ON CONFLICT (app_id) DO NOTHING", [app_id])
+        cursor.execute(f"SELECT safe_id, pending_id, pending_xid FROM {table} WHERE app_id = %s FOR UPDATE", [app_id])
+        safe_id, pending_id, pending_xid = cursor.fetchone()
+        horizon = advance_commit_horizon(
+            cursor, {"safe_id": safe_id, "pending_id": pending_id, "pending_xid": pending_xid}, qualified_table(schema),
+        )
+        cursor.execute(
+            f"UPDATE {table} SET safe_id = %s, pending_id = %s, pending_xid = %s WHERE app_id = %s",
+            [horizon["safe_id"], horizon["pending_id"], horizon["pending_xid"], app_id],
+        )
+    return horizon["safe_id"]
+
+
+def sync_central_store(app_id: int, schema: str, batch_size=None, max_batches=None) -> int:
+    """
+    Copy the rows of `schema.request_log_requestlog` newer than the newest
+    central row of `app_id`, in id order and batches of `batch_size`.
+    Central rows keep their source id, so the copy resumes where it stopped.
+    Rows are only copied up to the commit horizon, a row committing after a
+    higher id is copied once its transaction has ended, see
+    `request_log.utils.watermark` for the window left open.
+    Returns the number of rows copied.
+    """
+    batch_size = batch_size or getattr(settings, "REQUEST_LOG_CENTRAL_SYNC_BATCH_SIZE", DEFAULT_SYNC_BATCH_SIZE)
+    max_batches = max_batches or DEFAULT_SYNC_MAX_BATCHES
+
+    table = central_table()
+    columns = central_columns()
+    # Values interned under compact storage are decoded on the way
+    select = ", ".join(decode_sql(schema, column) if column in DIMENSIONS else column for column in columns)
+    query = (
+        f"INSERT INTO {table} (app_id, {', '.join(columns)}) "
+        f"SELECT %s, {select} FROM {qualified_table(schema)} WHERE id > %s AND id <= %s ORDER BY id LIMIT %s"
+    )
+
+    safe_id = advance_sync_horizon(app_id, schema)
+    copied = 0
+    for _ in range(max_batches):
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table} WHERE app_id = %s", [app_id])
+            last_id = cursor.fetchone()[0]
+            if last_id >= safe_id:
+                break
+            cursor.execute(query, [app_id, last_id, safe_id, batch_size])
+            rows = cursor.rowcount
+
+        copied += rows
+        if rows < batch_size:
+            break
+    return copied
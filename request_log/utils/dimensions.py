@@ -0,0 +1,205 @@
+# request_log_dimension_util.py
+"""
+Dictionary encoding of long, repeated request log values.
+
+With `REQUEST_LOG_COMPACT_STORAGE`, `path`, `user_agent`, `headers` and
+`error_message` are interned into `request_log_requestlogdimension` and a row
+only keeps the id of its value in `<column>_key`, storing `path` and
+`user_agent` empty and `headers` and `error_message` as NULL. Ids are
+resolved through an in-process cache, so a known value costs a dict lookup
+and the new values of a batch one upsert. Readers decode with
+`decode_sql`, which falls back to the plain column for rows stored without keys,
+and filter with `filter_sql`, which matches ids instead of decoded values.
+"""
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from request_log.models.request_log_dimension_model import RequestLogDimension
+from request_log.utils.schema import qualified_table
+
+DIMENSIONS = ("path", "user_agent", "headers", "error_message")
+JSON_DIMENSIONS = ("headers",)
+# What the plain column holds once its value is interned, NOT NULL columns are left empty
+ENCODED_VALUES = {"path": "", "user_agent": "", "headers": None, "error_message": None}
+DEFAULT_CACHE_SIZE = 100000  # ids kept per process
+
+
+def is_compact_storage_enabled() -> bool:
+    return getattr(settings, "REQUEST_LOG_COMPACT_STORAGE", False)
+
+
+def dimension_table(schema: "str | None" = None) -> str:
+    """
+    Returns the quoted dimension table of `schema`, or of the current search path.
+    """
+    table = RequestLogDimension._meta.db_table
+    return qualified_table(schema, table) if schema else connection.ops.quote_name(table)
+
+
+def decode_sql(schema: "str | None", column: str) -> str:
+    """
+    Returns SQL for the value of `column` of a request log row of `schema`,
+    looked up by primary key only for rows stored with a `<column>_key`.
+    """
+    value = "d.value::jsonb" if column in JSON_DIMENSIONS else "d.value"
+    return f"COALESCE((SELECT {value} FROM {dimension_table(schema)} d WHERE d.id = {column}_key), {column})"
+
+
+def _text(value) -> str:
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, sort_keys=True, default=str)
+    return str(value)
+
+
+def _digest(value: str) -> str:
+    return hashlib.md5(value.encode("utf-8")).hexdigest()
+
+
+class DimensionCache:
+    """
+    Maps `(schema, kind, digest)` to dimension ids, least recently used first out.
+    Ids never change once committed, so ids read or interned inside a
+    transaction are only cached once it commits, a rollback forgets them.
+    """
+
+    def __init__(self, max_size=None):
+        self.max_size = max_size or getattr(settings, "REQUEST_LOG_DIMENSION_CACHE_SIZE", DEFAULT_CACHE_SIZE)
+        self._lock = threading.Lock()
+        self._ids = OrderedDict()
+        self._stats = {"hits": 0, "misses": 0}
+
+    def get_ids(self, schema: "str | None", kind: str, values) -> dict:
+        """
+        Returns `{value: id}` for every value, interning the unknown ones.
+        """
+        digests = {_digest(value): value for value in values}
+        result, missing = {}, {}
+        with self._lock:
+            for digest, value in digests.items():
+                dimension_id = self._ids.get((schema, kind, digest))
+                if dimension_id is None:
+                    missing[digest] = value
+                    continue
+                self._ids.move_to_end((schema, kind, digest))
+                result[value] = dimension_id
+            self._stats["hits"] += len(result)
+            self._stats["misses"] += len(missing)
+
+        if missing:
+            self._remember(schema, kind, missing, self._store(schema, kind, missing), result)
+        return result
+
+    def find_ids(self, schema: "str | None", kind: str, values) -> dict:
+        """
+        Returns `{value: id}` for the values already interned, without interning the others.
+        """
+        digests = {_digest(value): value for value in values}
+        result, missing = {}, {}
+        with self._lock:
+            for digest, value in digests.items():
+                dimension_id = self._ids.get((schema, kind, digest))
+                if dimension_id is None:
+                    missing[digest] = value
+                else:
+                    result[value] = dimension_id
+
+        if missing:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"SELECT digest, id FROM {dimension_table(schema)} WHERE kind = %s AND digest = ANY(%s)",
+                    [kind, list(missing)],
+                )
+                self._remember(schema, kind, missing, dict(cursor.fetchall()), result)
+        return result
+
+    def _remember(self, schema: "str | None", kind: str, values: dict, ids: dict, result: dict) -> None:
+        """
+        Adds `{digest: id}` of `values` (`{digest: value}`) to `result` and
+        caches them, after the commit of the current transaction if any.
+        """
+        for digest, dimension_id in ids.items():
+            result[values[digest]] = dimension_id
+        if connection.in_atomic_block:
+            transaction.on_commit(lambda: self._cache(schema, kind, ids))
+        else:
+            self._cache(schema, kind, ids)
+
+    def _cache(self, schema: "str | None", kind: str, ids: dict) -> None:
+        with self._lock:
+            for digest, dimension_id in ids.items():
+                self._ids[(schema, kind, digest)] = dimension_id
+            while len(self._ids) > self.max_size:
+                self._ids.popitem(last=False)
+
+    def _store(self, schema: "str | None", kind: str, values: dict) -> dict:
+        """
+        Upserts `{digest: value}` and returns `{digest: id}`.
+        """
+        # Sorted so concurrent writers lock the same keys in the same order
+        digests = sorted(values)
+        with connection.cursor() as cursor:
+            # The no-op update makes RETURNING also report values interned before
+            cursor.execute(
+                f"INSERT INTO {dimension_table(schema)} (kind, digest, value) "
+                f"SELECT %s, digest, value FROM unnest(%s::text[], %s::text[]) AS v(digest, value) "
+                f"ON CONFLICT (kind, digest) DO UPDATE SET kind = EXCLUDED.kind "
+                f"RETURNING digest, id",
+                [kind, digests, [values[digest] for digest in digests]],
+            )
+            return dict(cursor.fetchall())
+
+    def stats(self) -> dict:
+        return {**self._stats, "size": len(self._ids), "max_size": self.max_size}
+
+
+dimension_cache = DimensionCache()
+
+
+def filter_sql(schema: "str | None", column: str, values: list) -> tuple:
+    """
+    Returns SQL and its params keeping the rows of `schema` whose decoded
+    `column` is one of `values`. Interned values are matched by id, so both
+    `<column>_key` and `column` are compared with index scans instead of
+    decoding every row with `decode_sql`.
+    """
+    values = [_text(value) for value in values]
+    sql = f"{column} IN ({', '.join(['%s'] * len(values))})"
+    ids = list(dimension_cache.find_ids(schema, column, values).values())
+    if not ids:
+        return sql, values
+    return f"({column}_key IN ({', '.join(['%s'] * len(ids))}) OR {sql})", [*ids, *values]
+
+
+def encode_records(schema: "str | None", records: list) -> list:
+    """
+    Returns copies of `records` (column to value dicts) with every dimension
+    value replaced by its id in `<column>_key`.
+    """
+    encoded = [dict(record) for record in records]
+    for kind in DIMENSIONS:
+        values = {_text(record[kind]) for record in encoded if record.get(kind) not in (None, "")}
+        if not values:
+            continue
+        ids = dimension_cache.get_ids(schema, kind, values)
+        for record in encoded:
+            if record.get(kind) in (None, ""):
+                continue
+            record[f"{kind}_key"] = ids[_text(record[kind])]
+            record[kind] = ENCODED_VALUES[kind]
+    return encoded
+
+
+def encode_request_logs(request_logs: list, schema: "str | None" = None) -> None:
+    """
+    Encodes unsaved `RequestLog` instances in place.
+    """
+    values = [{kind: getattr(request_log, kind) for kind in DIMENSIONS} for request_log in request_logs]
+    for request_log, record in zip(request_logs, encode_records(schema, values)):
+        for column, value in record.items():
+            setattr(request_log, column, value)
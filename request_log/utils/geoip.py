@@ -0,0 +1,191 @@
+# request_log_geoip_util.py
+"""
+Process-wide GeoIP2 reader and IP-to-location cache.
+The reader is opened once per process in memory-mapped mode, so every
+worker shares the database pages through the OS page cache.
+"""
+
+import ipaddress
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.gis.geoip2 import GeoIP2
+from django.db import connection
+
+from request_log.utils.schema import qualified_table
+
+DEFAULT_CACHE_SIZE = 10_000
+DEFAULT_CACHE_TTL = 60 * 60  # seconds
+DEFAULT_ENRICH_BATCH_SIZE = 5000
+
+EMPTY_LOCATION = {"city": None, "country_name": None, "country_code": None}
+
+_reader = None
+_reader_pid = None
+_reader_lock = threading.Lock()
+_reader_stats = {"opened": 0, "lookups": 0, "lookup_errors": 0}
+
+
+def get_geoip_reader() -> GeoIP2:
+    """
+    Returns the shared memory-mapped `GeoIP2` reader of the current process.
+    """
+    global _reader, _reader_pid
+    if _reader is None or _reader_pid != os.getpid():
+        with _reader_lock:
+            if _reader is None or _reader_pid != os.getpid():
+                _reader = GeoIP2(cache=GeoIP2.MODE_MMAP)
+                _reader_pid = os.getpid()
+                _reader_stats["opened"] += 1
+    return _reader
+
+
+class GeoIPCache:
+    """
+    Bounded LRU cache of lookup results with a TTL per entry.
+
+    When `prefix_v4` / `prefix_v6` are set, results are keyed by network
+    (e.g. /24) instead of by address, so neighbouring clients share an entry.
+    """
+
+    def __init__(self, max_size=None, ttl=None, prefix_v4=None, prefix_v6=None):
+        self.max_size = max_size or getattr(settings, "REQUEST_LOG_GEOIP_CACHE_SIZE", DEFAULT_CACHE_SIZE)
+        self.ttl = ttl or getattr(settings, "REQUEST_LOG_GEOIP_CACHE_TTL", DEFAULT_CACHE_TTL)
+        self.prefix_v4 = prefix_v4 or getattr(settings, "REQUEST_LOG_GEOIP_CACHE_PREFIX_V4", None)
+        self.prefix_v6 = prefix_v6 or getattr(settings, "REQUEST_LOG_GEOIP_CACHE_PREFIX_V6", None)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "expired": 0, "evictions": 0}
+
+    def key_for(self, ip: str) -> str:
+        try:
+            address = ipaddress.ip_address(ip)
+        except ValueError:
+            return ip
+        prefix = self.prefix_v4 if address.version == 4 else self.prefix_v6
+        if not prefix:
+            return str(address)
+        return str(ipaddress.ip_network(f"{address}/{prefix}", strict=False))
+
+    def get(self, ip: str):
+        """
+        Returns the cached location or `None` when missing or expired.
+        """
+        key = self.key_for(ip)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            expires_at, location = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self._stats["expired"] += 1
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return location
+
+    def set(self, ip: str, location: dict) -> None:
+        key = self.key_for(ip)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, location)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self._stats["hits"] + self._stats["misses"]
+        return {
+            **self._stats,
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl": self.ttl,
+            "hit_rate": round(self._stats["hits"] / lookups, 4) if lookups else 0,
+        }
+
+
+geoip_cache = GeoIPCache()
+
+
+def lookup_location(ip: "str | None") -> dict:
+    """
+    Returns `city`, `country_name` and `country_code` of `ip`.
+    Unknown and private addresses are cached as empty locations too.
+    """
+    if not ip:
+        return dict(EMPTY_LOCATION)
+
+    location = geoip_cache.get(ip)
+    if location is not None:
+        return dict(location)
+
+    _reader_stats["lookups"] += 1
+    try:
+        data = get_geoip_reader().city(ip)
+        location = {key: data.get(key) or None for key in EMPTY_LOCATION}
+    except Exception:
+        _reader_stats["lookup_errors"] += 1
+        location = dict(EMPTY_LOCATION)
+
+    geoip_cache.set(ip, location)
+    return dict(location)
+
+
+def geoip_stats() -> dict:
+    """
+    Returns reader and cache counters of the current process.
+    """
+    return {
+        "reader": {**_reader_stats, "pid": os.getpid()},
+        "cache": geoip_cache.stats(),
+    }
+
+
+def enrich_pending_locations(schema: str, batch_size: "int | None" = None) -> dict:
+    """
+    Fill `city`, `country_name` and `country_code` of up to `batch_size`
+    rows of `schema` that were logged without a location.
+
+    Each distinct IP of the batch is looked up once and all of its rows are
+    updated with a single set-based `UPDATE ... FROM (VALUES ...)`.
+    """
+    batch_size = batch_size or getattr(settings, "REQUEST_LOG_GEOIP_ENRICH_BATCH_SIZE", DEFAULT_ENRICH_BATCH_SIZE)
+    table = qualified_table(schema)
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT MAX(id), array_agg(DISTINCT host(ip_address)) FROM ("
+            f"SELECT id, ip_address FROM {table} WHERE NOT geo_enriched ORDER BY id LIMIT %s"
+            f") AS pending",
+            [batch_size],
+        )
+        max_id, ips = cursor.fetchone()
+        if max_id is None:
+            return {"rows": 0, "ips": 0}
+
+        values, params = [], []
+        for ip in ips:
+            location = lookup_location(ip)
+            values.append("(%s::inet, %s, %s, %s)")
+            params += [ip, location["city"], location["country_name"], location["country_code"]]
+
+        # Rows up to max_id are exactly the selected batch, plus any rows of the
+        # same IPs written concurrently, which get the same location anyway.
+        cursor.execute(
+            f"UPDATE {table} AS r SET city = v.city, country_name = v.country_name, "
+            f"country_code = v.country_code, geo_enriched = TRUE "
+            f"FROM (VALUES {', '.join(values)}) AS v(ip_address, city, country_name, country_code) "
+            f"WHERE r.ip_address = v.ip_address AND NOT r.geo_enriched AND r.id <= %s",
+            params + [max_id],
+        )
+        return {"rows": cursor.rowcount, "ips": len(ips)}
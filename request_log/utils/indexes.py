@@ -0,0 +1,152 @@
+# request_log_index_util.py
+"""
+Applies and verifies the `RequestLog` indexes inside any application schema.
+The model's `Meta.indexes` is the single source of truth, each index is built
+with `CREATE INDEX CONCURRENTLY` so ingestion is never blocked. On a
+partitioned table the index is built concurrently on every partition and
+attached to an `ON ONLY` index of the parent. Migrations add indexes through
+`add_index_operation` for the same reason.
+"""
+
+from contextlib import contextmanager
+
+from django.db import connection, migrations
+
+from request_log.models.request_log_model import RequestLog
+from request_log.utils.schema import qualified_table, validate_schema
+
+MISSING = "missing"
+INVALID = "invalid"
+VALID = "valid"
+CREATED = "created"
+
+
+@contextmanager
+def schema_search_path(schema: str):
+    """
+    Point unqualified names at `schema` for the enclosed block.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(f"SET search_path TO {connection.ops.quote_name(validate_schema(schema))}")
+    try:
+        yield
+    finally:
+        with connection.cursor() as cursor:
+            cursor.execute("RESET search_path")
+
+
+def get_index_status(schema: str, name: str) -> str:
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT i.indisvalid FROM pg_index i "
+            "JOIN pg_class c ON c.oid = i.indexrelid "
+            "JOIN pg_namespace n ON n.oid = c.relnamespace "
+            "WHERE n.nspname = %s AND c.relname = %s",
+            [schema, name],
+        )
+        row = cursor.fetchone()
+    if row is None:
+        return MISSING
+    return VALID if row[0] else INVALID
+
+
+def ensure_indexes(schema: str, check_only: bool = False, indexes=None) -> list:
+    """
+    Create every missing index of `schema` concurrently and rebuild the ones
+    left invalid by an interrupted build. Returns one status dict per index.
+    """
+    indexes = indexes if indexes is not None else RequestLog._meta.indexes
+    results = []
+
+    for index in indexes:
+        status = get_index_status(schema, index.name)
+        if check_only or status == VALID:
+            results.append({"schema": schema, "index": index.name, "status": status})
+            continue
+
+        if is_partitioned_table(schema):
+            ensure_partitioned_index(schema, index)
+            status = get_index_status(schema, index.name)
+            results.append({"schema": schema, "index": index.name, "status": CREATED if status == VALID else status})
+            continue
+
+        with schema_search_path(schema), connection.schema_editor(atomic=False) as schema_editor:
+            if status == INVALID:
+                schema_editor.execute(index.remove_sql(RequestLog, schema_editor, concurrently=True))
+            schema_editor.execute(index.create_sql(RequestLog, schema_editor, concurrently=True))
+
+        status = get_index_status(schema, index.name)
+        results.append({"schema": schema, "index": index.name, "status": CREATED if status == VALID else status})
+
+    return results
+
+
+def is_partitioned_table(schema: str) -> bool:
+    from request_log.utils.partitions import is_partitioned
+    return is_partitioned(schema)
+
+
+def _is_attached(schema: str, parent_index: str, partition: str) -> bool:
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_inherits i JOIN pg_index x ON x.indexrelid = i.inhrelid "
+            "WHERE i.inhparent = to_regclass(%s) AND x.indrelid = to_regclass(%s)",
+            [f"{schema}.{parent_index}", f"{schema}.{partition}"],
+        )
+        return cursor.fetchone() is not None
+
+
+def ensure_partitioned_index(schema: str, index) -> None:
+    """
+    `CREATE INDEX CONCURRENTLY` is not supported on a partitioned table, so the
+    parent index is created `ON ONLY` (instant, left invalid) and becomes valid
+    once a concurrently built index of every partition is attached to it.
+    """
+    from request_log.utils.partitions import list_partitions
+
+    table = RequestLog._meta.db_table
+    with schema_search_path(schema), connection.schema_editor(atomic=False) as schema_editor:
+        if get_index_status(schema, index.name) == MISSING:
+            statement = index.create_sql(RequestLog, schema_editor)
+            statement.parts["table"] = f"ONLY {schema_editor.quote_name(table)}"
+            schema_editor.execute(statement)
+
+        for partition, _, _ in list_partitions(schema):
+            if _is_attached(schema, index.name, partition):
+                continue
+
+            child_name = f"{partition}_{index.name}"[:63]
+            child_status = get_index_status(schema, child_name)
+            if child_status == INVALID:
+                schema_editor.execute(f"DROP INDEX CONCURRENTLY {qualified_table(schema, child_name)}")
+            if child_status != VALID:
+                statement = index.create_sql(RequestLog, schema_editor, concurrently=True)
+                statement.rename_table_references(table, partition)
+                statement.parts["name"] = schema_editor.quote_name(child_name)
+                schema_editor.execute(statement)
+
+            schema_editor.execute(
+                f"ALTER INDEX {qualified_table(schema, index.name)} ATTACH PARTITION {qualified_table(schema, child_name)}"
+            )
+
+
+def add_index_operation(model_name: str, index):
+    """
+    Migration operation adding `index` to the model state and building it with
+    `ensure_indexes` in the schema being migrated. Unlike `AddIndexConcurrently`
+    it also works once `partition_request_logs` partitioned the table.
+    """
+    def create_index(apps, schema_editor):
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute("SELECT current_schema()")
+            schema = cursor.fetchone()[0]
+        ensure_indexes(schema, indexes=[index])
+
+    def drop_index(apps, schema_editor):
+        # Dropping the parent index of a partitioned table drops the partitions' ones too
+        schema_editor.execute(f"DROP INDEX IF EXISTS {schema_editor.quote_name(index.name)}")
+
+    return migrations.SeparateDatabaseAndState(
+        state_operations=[migrations.AddIndex(model_name=model_name, index=index)],
+        database_operations=[migrations.RunPython(create_index, drop_index)],
+    )
@@ -0,0 +1,255 @@
+# request_log_partition_util.py
+"""
+Time-based range partitioning of `request_log_requestlog` on `created_at`.
+
+`convert_to_partitioned` turns an existing table into a partitioned one by
+attaching it, unchanged, as the first partition. Later partitions are named
+`request_log_requestlog_pYYYYMMDD` after the start of their range and are
+pre-created by `ensure_partitions`. Rows written to the default partition
+for a period before its partition existed are moved into it on creation.
+"""
+
+import logging
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from request_log.models.request_log_model import RequestLog
+from request_log.utils.schema import qualified_table, validate_schema
+
+logger = logging.getLogger(__name__)
+
+DAILY = "day"
+WEEKLY = "week"
+DEFAULT_INTERVAL = DAILY
+DEFAULT_PRECREATE = 7  # partitions created ahead of time
+
+TABLE = RequestLog._meta.db_table
+LEGACY_SUFFIX = "legacy"
+DEFAULT_SUFFIX = "default"
+LOCK_TIMEOUT = "5s"
+
+
+def get_interval() -> str:
+    return getattr(settings, "REQUEST_LOG_PARTITION_INTERVAL", DEFAULT_INTERVAL)
+
+
+def period_start(moment: datetime, interval: "str | None" = None) -> datetime:
+    """
+    Returns the UTC start of the partition period containing `moment`.
+    """
+    interval = interval or get_interval()
+    moment = moment.astimezone(dt_timezone.utc)
+    start = datetime.combine(moment.date(), time.min, tzinfo=dt_timezone.utc)
+    if interval == WEEKLY:
+        start -= timedelta(days=start.weekday())  # Weeks start on Monday
+    return start
+
+
+def period_length(interval: "str | None" = None) -> timedelta:
+    return timedelta(weeks=1) if (interval or get_interval()) == WEEKLY else timedelta(days=1)
+
+
+def partition_name(start: datetime, table: str = TABLE) -> str:
+    return f"{table}_p{start:%Y%m%d}"
+
+
+def is_partitioned(schema: str, table: str = TABLE) -> bool:
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relkind FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace "
+            "WHERE n.nspname = %s AND c.relname = %s",
+            [validate_schema(schema), table],
+        )
+        row = cursor.fetchone()
+    return row is not None and row[0] == "p"
+
+
+def list_partitions(schema: str, table: str = TABLE) -> list:
+    """
+    Returns `(name, lower_bound, upper_bound)` of every partition, bounds are
+    `None` for MINVALUE/MAXVALUE and for the default partition.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT child.relname, pg_get_expr(child.relpartbound, child.oid) "
+            "FROM pg_inherits i "
+            "JOIN pg_class parent ON parent.oid = i.inhparent "
+            "JOIN pg_namespace n ON n.oid = parent.relnamespace "
+            "JOIN pg_class child ON child.oid = i.inhrelid "
+            "WHERE n.nspname = %s AND parent.relname = %s",
+            [validate_schema(schema), table],
+        )
+        rows = cursor.fetchall()
+
+    partitions = []
+    for name, bound in rows:
+        lower, upper = _parse_bound(bound)
+        partitions.append((name, lower, upper))
+    return sorted(partitions, key=lambda p: p[1] or datetime.min.replace(tzinfo=dt_timezone.utc))
+
+
+def _parse_bound(bound: str):
+    # e.g. "FOR VALUES FROM ('2026-10-18 00:00:00+00') TO ('2026-10-19 00:00:00+00')"
+    if not bound or bound == "DEFAULT":
+        return None, None
+    values = []
+    for part in bound.split("FROM", 1)[1].split("TO"):
+        value = part.strip().strip("()").strip("'")
+        values.append(None if value in ("MINVALUE", "MAXVALUE") else datetime.fromisoformat(value))
+    return values[0], values[1]
+
+
+def create_partition(schema: str, start: datetime, interval: "str | None" = None, table: str = TABLE) -> bool:
+    """
+    Create the partition for the period starting at `start`. Returns whether it was created.
+
+    PostgreSQL refuses a range some rows of the default partition belong to,
+    so the default partition is then detached, its rows of the range moved
+    to the new partition and attached again, in one transaction.
+    """
+    name = partition_name(start, table)
+    end = start + period_length(interval)
+    parent = qualified_table(schema, table)
+    default = qualified_table(schema, f"{table}_{DEFAULT_SUFFIX}")
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace "
+            "WHERE n.nspname = %s AND c.relname = %s",
+            [schema, name],
+        )
+        if cursor.fetchone():
+            return False
+
+        cursor.execute("SELECT to_regclass(%s) IS NOT NULL", [f"{schema}.{table}_{DEFAULT_SUFFIX}"])
+        rows_in_default = False
+        if cursor.fetchone()[0]:
+            cursor.execute(f"SELECT EXISTS (SELECT 1 FROM {default} WHERE created_at >= %s AND created_at < %s)", [start, end])
+            rows_in_default = cursor.fetchone()[0]
+
+        if not rows_in_default:
+            cursor.execute(f"CREATE TABLE {qualified_table(schema, name)} PARTITION OF {parent} FOR VALUES FROM (%s) TO (%s)", [start, end])
+            return True
+
+        # Writers wait on the parent until the commit, give up rather than queue them for long
+        cursor.execute(f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT}'")
+        cursor.execute(f"ALTER TABLE {parent} DETACH PARTITION {default}")
+        cursor.execute(f"CREATE TABLE {qualified_table(schema, name)} PARTITION OF {parent} FOR VALUES FROM (%s) TO (%s)", [start, end])
+        cursor.execute(
+            f"WITH moved AS (DELETE FROM {default} WHERE created_at >= %s AND created_at < %s RETURNING *) "
+            f"INSERT INTO {qualified_table(schema, name)} SELECT * FROM moved",
+            [start, end],
+        )
+        logger.info(f"Moved {cursor.rowcount} rows of {schema}.{table}_{DEFAULT_SUFFIX} into {schema}.{name}")
+        cursor.execute(f"ALTER TABLE {parent} ATTACH PARTITION {default} DEFAULT")
+    return True
+
+
+def ensure_partitions(schema: str, ahead: "int | None" = None, interval: "str | None" = None, table: str = TABLE) -> list:
+    """
+    Pre-create the partitions of the current and next `ahead` periods, plus a
+    default partition catching rows outside every range. Returns created names.
+    `table` is any table partitioned by `created_at`, `request_log_requestlog` by default.
+    """
+    if not is_partitioned(schema, table):
+        return []
+
+    ahead = ahead if ahead is not None else getattr(settings, "REQUEST_LOG_PARTITION_PRECREATE", DEFAULT_PRECREATE)
+    existing = list_partitions(schema, table)
+
+    created = []
+    start = period_start(datetime.now(dt_timezone.utc), interval)
+    for _ in range(ahead + 1):
+        # Periods still covered by the legacy partition are skipped
+        if not _is_covered(existing, start):
+            try:
+                if create_partition(schema, start, interval, table):
+                    created.append(partition_name(start, table))
+            except Exception as e:
+                logger.error(f"Failed to create partition {partition_name(start, table)} in {schema}: {e}")
+        start += period_length(interval)
+
+    default_name = f"{table}_{DEFAULT_SUFFIX}"
+    if not any(name == default_name for name, _, _ in existing):
+        with connection.cursor() as cursor:
+            cursor.execute(f"CREATE TABLE IF NOT EXISTS {qualified_table(schema, default_name)} PARTITION OF {qualified_table(schema, table)} DEFAULT")
+        created.append(default_name)
+
+    return created
+
+
+def _is_covered(partitions: list, moment: datetime) -> bool:
+    for _, lower, upper in partitions:
+        if upper is None and lower is None:
+            continue  # Default partition
+        if (lower is None or lower <= moment) and (upper is None or moment < upper):
+            return True
+    return False
+
+
+def convert_to_partitioned(schema: str, interval: "str | None" = None) -> str:
+    """
+    Convert `schema.request_log_requestlog` into a table partitioned by `created_at`.
+
+    The existing table is renamed to `request_log_requestlog_legacy` and
+    attached as the partition of everything before the first new period. Its
+    rows are never copied, the exclusive lock is held only for catalog changes.
+    Returns the name of the legacy partition.
+    """
+    from request_log.utils.indexes import schema_search_path
+
+    validate_schema(schema)
+    if is_partitioned(schema):
+        raise ValueError(f"{schema}.{TABLE} is already partitioned")
+
+    table = qualified_table(schema)
+    legacy = f"{TABLE}_{LEGACY_SUFFIX}"
+    # Leave a full period of headroom so rows written during the conversion still fit
+    boundary = period_start(datetime.now(dt_timezone.utc), interval) + 2 * period_length(interval)
+
+    # Build what ATTACH PARTITION needs without blocking writes: a unique index
+    # matching the new primary key and a validated bound constraint.
+    with connection.cursor() as cursor:
+        cursor.execute(f"CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS {connection.ops.quote_name(legacy + '_pk_idx')} ON {table} (id, created_at)")
+        cursor.execute(f"ALTER TABLE {table} ADD CONSTRAINT {connection.ops.quote_name(legacy + '_bound')} CHECK (created_at < %s) NOT VALID", [boundary])
+        cursor.execute(f"ALTER TABLE {table} VALIDATE CONSTRAINT {connection.ops.quote_name(legacy + '_bound')}")
+
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(f"LOCK TABLE {table} IN ACCESS EXCLUSIVE MODE")
+            cursor.execute(f"ALTER TABLE {table} RENAME TO {connection.ops.quote_name(legacy)}")
+            legacy_table = qualified_table(schema, legacy)
+
+            # Free the names the partitioned parent is going to use
+            cursor.execute(f"ALTER TABLE {legacy_table} RENAME CONSTRAINT {connection.ops.quote_name(TABLE + '_pkey')} TO {connection.ops.quote_name(legacy + '_pkey')}")
+            for index in RequestLog._meta.indexes:
+                cursor.execute(
+                    f"ALTER INDEX IF EXISTS {qualified_table(schema, index.name)} "
+                    f"RENAME TO {connection.ops.quote_name((index.name + '_' + LEGACY_SUFFIX)[:63])}"
+                )
+
+            cursor.execute(
+                f"CREATE TABLE {table} (LIKE {legacy_table} INCLUDING DEFAULTS INCLUDING IDENTITY) "
+                f"PARTITION BY RANGE (created_at)"
+            )
+            # The primary key of a partitioned table must contain the partition key
+            cursor.execute(f"ALTER TABLE {table} ADD PRIMARY KEY (id, created_at)")
+            cursor.execute(
+                f"SELECT setval(pg_get_serial_sequence(%s, 'id'), COALESCE((SELECT MAX(id) FROM {legacy_table}), 0) + 1, false)",
+                [f"{schema}.{TABLE}"],
+            )
+            # Ids now come from the parent, a partition can not keep its own identity
+            cursor.execute(f"ALTER TABLE {legacy_table} ALTER COLUMN id DROP IDENTITY IF EXISTS")
+            cursor.execute(f"ALTER TABLE {legacy_table} ALTER COLUMN id DROP DEFAULT")
+
+        # Indexes on the still empty parent are instant, ATTACH adopts the matching legacy ones
+        with schema_search_path(schema), connection.schema_editor(atomic=False) as schema_editor:
+            for index in RequestLog._meta.indexes:
+                schema_editor.execute(index.create_sql(RequestLog, schema_editor))
+
+        with connection.cursor() as cursor:
+            cursor.execute(f"ALTER TABLE {table} ATTACH PARTITION {legacy_table} FOR VALUES FROM (MINVALUE) TO (%s)", [boundary])
+
+    ensure_partitions(schema, interval=interval)
+    return legacy
@@ -0,0 +1,191 @@
+# request_log_retention_util.py
+"""
+Retention of request logs per status class.
+A policy maps status classes to days kept, e.g. `{"2xx": 7, "5xx": 90}`.
+Classes left out are kept forever. Partitions older than the longest
+retention are dropped whole, everything else expires with small batched
+DELETEs that never hold locks long enough to stall ingestion. The central
+store applies the policy of each application to its own rows.
+"""
+
+import ast
+import logging
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from request_log.utils.central import CENTRAL_TABLE
+from request_log.utils.partitions import TABLE, is_partitioned, list_partitions
+from request_log.utils.schema import qualified_table, validate_schema
+
+logger = logging.getLogger(__name__)
+
+STATUS_CLASSES = ("1xx", "2xx", "3xx", "4xx", "5xx")
+DEFAULT_BATCH_SIZE = 5000
+DEFAULT_PAUSE = 0.1  # seconds between batches
+DEFAULT_MAX_BATCHES = 200  # per status class and run
+LOCK_TIMEOUT = "5s"
+
+
+def parse_retention_policy(value) -> dict:
+    """
+    Returns `{status_class: days}` from a dict or its string form, raising
+    `ValueError` on unknown classes or days that are not positive integers.
+    """
+    if value in (None, ""):
+        return {}
+    policy = ast.literal_eval(value) if isinstance(value, str) else value
+    if not isinstance(policy, dict):
+        raise ValueError("Retention policy must be a dict of status class to days")
+
+    parsed = {}
+    for status_class, days in policy.items():
+        status_class = str(status_class).lower()
+        if status_class not in STATUS_CLASSES:
+            raise ValueError(f"Unknown status class: {status_class}")
+        if days is None:
+            continue  # Keep forever
+        # bool is an int, True would otherwise mean one day
+        if isinstance(days, bool) or not isinstance(days, int) or days <= 0:
+            raise ValueError(f"Retention of {status_class} must be a positive number of days")
+        parsed[status_class] = days
+    return parsed
+
+
+def _status_range(status_class: str) -> tuple:
+    low = int(status_class[0]) * 100
+    return low, low + 100
+
+
+def drop_expired_partitions(schema: str, before: datetime, table: str = TABLE) -> dict:
+    """
+    Drop every partition of `table` whose range ends at or before `before`.
+    Row counts are the planner's estimate, bytes include indexes and TOAST.
+    """
+    stats = {"partitions": [], "rows": 0, "bytes": 0}
+    for name, lower, upper in list_partitions(schema, table):
+        if upper is None or upper > before:
+            continue
+
+        partition = qualified_table(schema, name)
+        try:
+            with transaction.atomic(), connection.cursor() as cursor:
+                # Dropping a partition briefly locks the parent, give up rather than queue writers behind it
+                cursor.execute(f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT}'")
+                cursor.execute(
+                    "SELECT GREATEST(reltuples, 0)::bigint, pg_total_relation_size(oid) FROM pg_class WHERE oid = to_regclass(%s)",
+                    [f"{schema}.{name}"],
+                )
+                rows, size = cursor.fetchone()
+                cursor.execute(f"DROP TABLE {partition}")
+        except Exception as e:
+            logger.warning(f"Could not drop partition {schema}.{name}, retrying next run: {e}")
+            continue
+
+        stats["partitions"].append(name)
+        stats["rows"] += rows
+        stats["bytes"] += size
+    return stats
+
+
+def delete_expired_rows(schema: str, status_class: str, before: datetime, batch_size=None, pause=None, max_batches=None,
+                        table: str = TABLE, app_id: "int | None" = None) -> dict:
+    """
+    Delete rows of `status_class` created before `before` in batches of
+    `batch_size`, each in its own short transaction. Bytes are the size of
+    the deleted tuples, reusable once autovacuum has processed the table.
+    `app_id` limits the central store to the rows of one application.
+    """
+    batch_size = batch_size or getattr(settings, "REQUEST_LOG_RETENTION_BATCH_SIZE", DEFAULT_BATCH_SIZE)
+    pause = pause if pause is not None else getattr(settings, "REQUEST_LOG_RETENTION_PAUSE", DEFAULT_PAUSE)
+    max_batches = max_batches or getattr(settings, "REQUEST_LOG_RETENTION_MAX_BATCHES", DEFAULT_MAX_BATCHES)
+
+    low, high = _status_range(status_class)
+    # Central rows are identified by application too
+    app_condition, app_params, app_join = "", [], ""
+    if app_id is not None:
+        app_condition, app_params, app_join = "AND app_id = %s ", [app_id], " AND t.app_id = e.app_id"
+    # SKIP LOCKED leaves rows being enriched or written to for the next batch
+    query = (
+        f"WITH expired AS ("
+        f"SELECT {'app_id, ' if app_id is not None else ''}id, created_at FROM {qualified_table(schema, table)} "
+        f"WHERE created_at < %s AND status_code >= %s AND status_code < %s {app_condition}"
+        f"LIMIT %s FOR UPDATE SKIP LOCKED"
+        f"), deleted AS ("
+        f"DELETE FROM {qualified_table(schema, table)} t USING expired e "
+        f"WHERE t.id = e.id AND t.created_at = e.created_at{app_join} "
+        f"RETURNING pg_column_size(t.*) AS size"
+        f") SELECT COUNT(*), COALESCE(SUM(size), 0) FROM deleted"
+    )
+
+    stats = {"rows": 0, "bytes": 0, "batches": 0}
+    for _ in range(max_batches):
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(query, [before, low, high, *app_params, batch_size])
+            rows, size = cursor.fetchone()
+
+        stats["rows"] += rows
+        stats["bytes"] += int(size)
+        stats["batches"] += 1
+        if rows < batch_size:
+            break
+        time.sleep(pause)
+    return stats
+
+
+def purge_request_logs(schema: str, policy: dict, now: "datetime | None" = None) -> dict:
+    """
+    Enforce `policy` on `schema`, returning rows and bytes reclaimed.
+    """
+    validate_schema(schema)
+    now = now or datetime.now(dt_timezone.utc)
+    report = {"schema": schema, "partitions_dropped": [], "rows": 0, "bytes": 0, "by_status_class": {}}
+    if not policy:
+        return report
+
+    # A partition can only go once every status class in it has expired
+    if is_partitioned(schema) and all(status_class in policy for status_class in STATUS_CLASSES):
+        dropped = drop_expired_partitions(schema, now - timedelta(days=max(policy.values())))
+        report["partitions_dropped"] = dropped["partitions"]
+        report["rows"] += dropped["rows"]
+        report["bytes"] += dropped["bytes"]
+
+    for status_class, days in policy.items():
+        deleted = delete_expired_rows(schema, status_class, now - timedelta(days=days))
+        report["by_status_class"][status_class] = deleted
+        report["rows"] += deleted["rows"]
+        report["bytes"] += deleted["bytes"]
+
+    return report
+
+
+def purge_central_request_logs(schema: str, policies: dict, now: "datetime | None" = None) -> dict:
+    """
+    Enforce the policy of each application (`{app_id: policy}`) on its rows of
+    the central store in `schema`, returning rows and bytes reclaimed.
+    """
+    validate_schema(schema)
+    now = now or datetime.now(dt_timezone.utc)
+    report = {"schema": schema, "table": CENTRAL_TABLE, "partitions_dropped": [], "rows": 0, "bytes": 0, "by_app": {}}
+    if not any(policies.values()):
+        return report
+
+    # Partitions hold every application, one can only go once all their rows have expired
+    if policies and all(status_class in policy for policy in policies.values() for status_class in STATUS_CLASSES):
+        longest = max(days for policy in policies.values() for days in policy.values())
+        dropped = drop_expired_partitions(schema, now - timedelta(days=longest), table=CENTRAL_TABLE)
+        report["partitions_dropped"] = dropped["partitions"]
+        report["rows"] += dropped["rows"]
+        report["bytes"] += dropped["bytes"]
+
+    for app_id, policy in policies.items():
+        by_status_class = report["by_app"][app_id] = {}
+        for status_class, days in policy.items():
+            deleted = delete_expired_rows(schema, status_class, now - timedelta(days=days), table=CENTRAL_TABLE, app_id=app_id)
+            by_status_class[status_class] = deleted
+            report["rows"] += deleted["rows"]
+            report["bytes"] += deleted["bytes"]
+
+    return report
@@ -0,0 +1,178 @@
+# request_log_route_util.py
+"""
+Normalization of request paths into low-cardinality routes,
+e.g. `/api/users/42/orders/9f3c...` -> `/api/users/{id}/orders/{hash}`.
+
+A route is taken, in order, from the first of:
+1. the application's custom patterns (`REQUEST_LOG_ROUTE_PATTERNS`),
+2. the Django URL pattern that matched the request, when it is a plain route,
+3. the built-in segment rules for ids, UUIDs, hashes and opaque tokens,
+   followed, with `REQUEST_LOG_ROUTE_LEARNING`, by learned templates that
+   collapse a segment position into `{param}` once it took more than
+   `REQUEST_LOG_ROUTE_LEARNING_THRESHOLD` distinct values.
+"""
+
+import re
+import threading
+
+from django.conf import settings
+
+DEFAULT_LEARNING_THRESHOLD = 100  # distinct values before a segment becomes a parameter
+DEFAULT_MAX_LEARNED_NODES = 10000  # per application, learning stops beyond it
+PARAM = "{param}"
+
+# Applied to every path segment, first match wins
+BUILTIN_RULES = (
+    (re.compile(r"[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}"), "{uuid}"),
+    (re.compile(r"\d+"), "{id}"),
+    (re.compile(r"[0-9a-fA-F]{16,}"), "{hash}"),  # Digests and object ids
+    (re.compile(r"(?=.*\d)[A-Za-z0-9_\-]{20,}"), "{token}"),  # Long opaque keys mixing letters and digits
+)
+
+# `<int:pk>` and `(?P<pk>...)` in Django URL patterns
+_CONVERTER_RE = re.compile(r"<(?:\w+:)?(\w+)>")
+_NAMED_GROUP_RE = re.compile(r"\(\?P<(\w+)>(?:[^()]|\([^()]*\))*\)")
+_REGEX_CHARS = set("()[]*+?|\\$^")
+
+
+def route_from_resolver(resolver_match) -> "str | None":
+    """
+    Returns the matched URL pattern with `{name}` placeholders, `None` when
+    there is no match or the pattern is not a plain route (optional parts,
+    format suffixes, ...).
+    """
+    route = getattr(resolver_match, "route", None)
+    if not route:
+        return None
+
+    route = _CONVERTER_RE.sub(r"{\1}", _NAMED_GROUP_RE.sub(r"{\1}", route))
+    route = route.removeprefix("^").removesuffix("$")
+    if _REGEX_CHARS & set(route):
+        return None
+    return "/" + route.lstrip("/")
+
+
+def normalize_segment(segment: str) -> str:
+    for pattern, placeholder in BUILTIN_RULES:
+        if pattern.fullmatch(segment):
+            return placeholder
+    return segment
+
+
+class RouteLearner:
+    """
+    Learns the variable positions of an application's paths.
+
+    Segments are kept in a trie. A node whose children exceed `threshold`
+    distinct values is replaced by a single `{param}` child, so every later
+    path through it shares one route. Memory is bounded by `max_nodes`.
+    """
+
+    def __init__(self, threshold=None, max_nodes=None):
+        self.threshold = threshold or getattr(settings, "REQUEST_LOG_ROUTE_LEARNING_THRESHOLD", DEFAULT_LEARNING_THRESHOLD)
+        self.max_nodes = max_nodes or DEFAULT_MAX_LEARNED_NODES
+
+        self._lock = threading.Lock()
+        self._root = {}
+        self._nodes = 0
+
+    def learn(self, segments: list) -> list:
+        """
+        Record `segments` and return them with learned parameters substituted.
+        """
+        result = []
+        with self._lock:
+            node = self._root
+            for segment in segments:
+                if PARAM in node:
+                    result.append(PARAM)
+                    node = node[PARAM]
+                    continue
+
+                if segment not in node:
+                    if len(node) >= self.threshold:
+                        # Too many values seen at this position, collapse them
+                        self._nodes -= self._count(node)
+                        node.clear()
+                        node[PARAM] = {}
+                        self._nodes += 1
+                        result.append(PARAM)
+                        node = node[PARAM]
+                        continue
+                    if self._nodes >= self.max_nodes:
+                        # Full, keep normalizing with what was learned so far
+                        result.append(segment)
+                        node = {}
+                        continue
+                    node[segment] = {}
+                    self._nodes += 1
+
+                result.append(segment)
+                node = node[segment]
+        return result
+
+    def _count(self, node: dict) -> int:
+        return sum(1 + self._count(child) for child in node.values())
+
+
+class RouteNormalizer:
+    """
+    Maps request paths to routes, see the module docstring.
+
+    `patterns` is a list of `(regex, route)` applied to the whole path, or a
+    dict of such lists keyed by application name, `"*"` applying to all.
+    """
+
+    def __init__(self, patterns=None, learning=None, threshold=None):
+        patterns = patterns if patterns is not None else getattr(settings, "REQUEST_LOG_ROUTE_PATTERNS", {})
+        if not isinstance(patterns, dict):
+            patterns = {"*": patterns}
+        self.patterns = {
+            app.lower(): [(re.compile(regex), route) for regex, route in app_patterns]
+            for app, app_patterns in patterns.items()
+        }
+        self.learning = learning if learning is not None else getattr(settings, "REQUEST_LOG_ROUTE_LEARNING", False)
+        self.threshold = threshold
+
+        self._lock = threading.Lock()
+        self._learners = {}
+
+    def get_learner(self, app: "str | None") -> RouteLearner:
+        with self._lock:
+            if app not in self._learners:
+                self._learners[app] = RouteLearner(threshold=self.threshold)
+            return self._learners[app]
+
+    def match_pattern(self, path: str, app: "str | None") -> "str | None":
+        for key in (app.lower() if app else None, "*"):
+            for pattern, route in self.patterns.get(key, ()):
+                if pattern.fullmatch(path):
+                    return route
+        return None
+
+    def normalize(self, path: str, app: "str | None" = None, resolver_match=None) -> str:
+        """
+        Returns the route of `path` requested from application `app`.
+        """
+        if not path:
+            return path
+
+        route = self.match_pattern(path, app) or route_from_resolver(resolver_match)
+        if route:
+            return route
+
+        segments = [normalize_segment(segment) for segment in path.strip("/").split("/") if segment]
+        if self.learning and segments:
+            segments = self.get_learner(app).learn(segments)
+
+        route = "/" + "/".join(segments)
+        if path.endswith("/") and segments:
+            route += "/"
+        return route
+
+
+route_normalizer = RouteNormalizer()
+
+
+def normalize_route(path: str, app: "str | None" = None, resolver_match=None) -> str:
+    return route_normalizer.normalize(path, app=app, resolver_match=resolver_match)
@@ -0,0 +1,91 @@
+# request_log_sampling_util.py
+"""
+Sampling of healthy requests.
+Errors (status >= 400) and slow requests are always kept. Other requests are
+kept with probability `rate` and stored with `sample_weight = 1 / rate`, so
+weighted sums over the stored rows stay unbiased estimates of the totals.
+"""
+
+import random
+import threading
+import time
+
+from django.conf import settings
+
+from request_log.models.request_log_model import RequestLog
+
+DEFAULT_SAMPLE_RATE = 1.0
+DEFAULT_MIN_SAMPLE_RATE = 0.01
+DEFAULT_SLOW_THRESHOLD = 1000  # milliseconds
+DEFAULT_WINDOW = 10  # seconds
+
+
+class RequestLogSampler:
+    """
+    Decides whether a finished request log is stored.
+
+    With `target_per_second` set, the rate adapts every `window` seconds so
+    that roughly that many healthy requests per second are stored by this
+    process, never going below `min_rate`. Otherwise `rate` is fixed.
+    """
+
+    def __init__(self, rate=None, target_per_second=None, min_rate=None, slow_threshold=None, window=None):
+        self.rate = rate if rate is not None else getattr(settings, "REQUEST_LOG_SAMPLE_RATE", DEFAULT_SAMPLE_RATE)
+        self.target_per_second = target_per_second if target_per_second is not None else getattr(settings, "REQUEST_LOG_SAMPLE_TARGET_PER_SECOND", None)
+        self.min_rate = min_rate if min_rate is not None else getattr(settings, "REQUEST_LOG_SAMPLE_MIN_RATE", DEFAULT_MIN_SAMPLE_RATE)
+        self.slow_threshold = slow_threshold if slow_threshold is not None else getattr(settings, "REQUEST_LOG_SAMPLE_SLOW_THRESHOLD", DEFAULT_SLOW_THRESHOLD)
+        self.window = window or DEFAULT_WINDOW
+
+        self._lock = threading.Lock()
+        self._window_start = time.monotonic()
+        self._window_seen = 0
+        self._stats = {"kept": 0, "kept_always": 0, "dropped": 0}
+
+    def is_always_kept(self, request_log: RequestLog) -> bool:
+        return int(request_log.status_code) >= 400 or float(request_log.process_time_ms) >= self.slow_threshold
+
+    def current_rate(self) -> float:
+        """
+        Returns the keep probability for healthy requests, adapting it once per window.
+        """
+        if self.target_per_second is None:
+            return self.rate
+
+        with self._lock:
+            self._window_seen += 1
+            elapsed = time.monotonic() - self._window_start
+            if elapsed >= self.window:
+                observed_per_second = self._window_seen / elapsed
+                self.rate = max(self.min_rate, min(1.0, self.target_per_second / observed_per_second))
+                self._window_start = time.monotonic()
+                self._window_seen = 0
+            return self.rate
+
+    def should_keep(self, request_log: RequestLog) -> bool:
+        """
+        Returns whether `request_log` is stored and sets its `sample_weight`.
+        """
+        if self.is_always_kept(request_log):
+            request_log.sample_weight = 1.0
+            self._stats["kept_always"] += 1
+            return True
+
+        rate = self.current_rate()
+        if rate >= 1.0 or random.random() < rate:
+            request_log.sample_weight = 1.0 / rate
+            self._stats["kept"] += 1
+            return True
+
+        self._stats["dropped"] += 1
+        return False
+
+    def stats(self) -> dict:
+        return {
+            **self._stats,
+            "rate": round(self.rate, 4),
+            "target_per_second": self.target_per_second,
+            "slow_threshold": self.slow_threshold,
+        }
+
+
+request_log_sampler = RequestLogSampler()
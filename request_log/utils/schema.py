@@ -0,0 +1,30 @@
+# request_log_schema_util.py
+"""
+Helpers for addressing `request_log_requestlog` inside an application schema.
+Schema names come from configuration, so they are validated before being
+interpolated into SQL.
+"""
+
+import re
+
+from django.db import connection
+
+from request_log.models.request_log_model import RequestLog
+
+SCHEMA_NAME_RE = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+
+def validate_schema(schema: str) -> str:
+    """
+    Returns `schema` unchanged or raises `ValueError` if it is not a plain identifier.
+    """
+    if not isinstance(schema, str) or not SCHEMA_NAME_RE.match(schema):
+        raise ValueError(f"Invalid schema name: {schema!r}")
+    return schema
+
+
+def qualified_table(schema: str, table: str = RequestLog._meta.db_table) -> str:
+    """
+    Returns the quoted `schema.table` name, e.g. `"app"."request_log_requestlog"`.
+    """
+    return f"{connection.ops.quote_name(validate_schema(schema))}.{connection.ops.quote_name(table)}"
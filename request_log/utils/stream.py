@@ -0,0 +1,334 @@
+# request_log_stream_util.py
+"""
+Redis Streams ingestion for `RequestLog`.
+Producers append a compact msgpack record per request, consumers drain the
+stream through a consumer group and load each batch with PostgreSQL `COPY`.
+"""
+
+import asyncio
+import io
+import json
+import logging
+import os
+import socket
+from datetime import datetime
+
+import msgpack
+import redis
+import redis.asyncio
+from django.conf import settings
+from django.db import connection
+
+from request_log.models.request_log_model import RequestLog
+from request_log.utils.central import central_columns, central_table, get_app_id, get_central_schema
+from request_log.utils.dimensions import encode_records, is_compact_storage_enabled
+from request_log.utils.routes import normalize_route
+from request_log.utils.schema import qualified_table
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STREAM_KEY = "request_log:stream"
+DEFAULT_GROUP = "request_log"
+DEFAULT_MAXLEN = 1_000_000
+DEFAULT_BATCH_SIZE = 5000
+DEFAULT_CLAIM_IDLE_MS = 60_000
+
+# Columns carried in every record, primary key is assigned by the database
+STREAM_COLUMNS = [field.attname for field in RequestLog._meta.concrete_fields if not field.primary_key]
+JSON_COLUMNS = {field.attname for field in RequestLog._meta.concrete_fields if field.get_internal_type() == "JSONField"}
+FIELDS_BY_COLUMN = {field.attname: field for field in RequestLog._meta.concrete_fields}
+
+_client = None
+_client_pid = None
+_async_client = None
+_async_client_loop = None
+
+
+def get_stream_client() -> redis.Redis:
+    """
+    Returns the per-process Redis client used for the request log stream.
+    """
+    global _client, _client_pid
+    if _client is None or _client_pid != os.getpid():
+        url = getattr(settings, "REQUEST_LOG_STREAM_URL", None) or getattr(settings, "CELERY_BROKER_URL")
+        _client = redis.Redis.from_url(url)
+        _client_pid = os.getpid()
+    return _client
+
+
+def get_async_stream_client() -> redis.asyncio.Redis:
+    """
+    Returns the `redis.asyncio` client of the running event loop.
+    Async connections are bound to the loop that created them.
+    """
+    global _async_client, _async_client_loop
+    loop = asyncio.get_running_loop()
+    if _async_client is None or _async_client_loop is not loop:
+        url = getattr(settings, "REQUEST_LOG_STREAM_URL", None) or getattr(settings, "CELERY_BROKER_URL")
+        _async_client = redis.asyncio.Redis.from_url(url)
+        _async_client_loop = loop
+    return _async_client
+
+
+def get_stream_key() -> str:
+    return getattr(settings, "REQUEST_LOG_STREAM_KEY", DEFAULT_STREAM_KEY)
+
+
+def get_stream_app() -> str:
+    """
+    Returns the schema name logs from this process are loaded into.
+    """
+    return getattr(settings, "REQUEST_LOG_APP", None) or getattr(settings, "POSTGRES_SCHEMA", "public")
+
+
+def _stream_value(column: str, value):
+    if value is None:
+        return None
+    if column in JSON_COLUMNS:
+        return json.dumps(value, default=str)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def _default_value(column: str):
+    field = FIELDS_BY_COLUMN[column]
+    return field.get_default() if field.has_default() else None
+
+
+def to_stream_record(values: dict) -> dict:
+    """
+    Converts model values (a `RequestLog` instance's fields or validated
+    serializer data) into a flat dict of text values ready for `COPY`.
+    Columns missing from `values` take their model default, columns
+    explicitly set to `None` stay NULL.
+    """
+    return {
+        column: _stream_value(column, values[column] if column in values else _default_value(column))
+        for column in STREAM_COLUMNS
+    }
+
+
+def instance_values(request_log: RequestLog) -> dict:
+    return {column: getattr(request_log, column) for column in STREAM_COLUMNS}
+
+
+def _stream_entry(values, app: "str | None" = None) -> dict:
+    """
+    Returns the `XADD` fields of one request log. `values` is either a
+    `RequestLog` instance or a dict of its field values.
+    """
+    if isinstance(values, RequestLog):
+        values = instance_values(values)
+
+    payload = msgpack.packb(to_stream_record(values), use_bin_type=True)
+    return {"app": app or get_stream_app(), "d": payload}
+
+
+def publish_request_log(values, app: "str | None" = None) -> str:
+    """
+    Append one request log to the stream. Returns the stream entry id.
+    """
+    entry_id = get_stream_client().xadd(
+        get_stream_key(),
+        _stream_entry(values, app),
+        maxlen=getattr(settings, "REQUEST_LOG_STREAM_MAXLEN", DEFAULT_MAXLEN),
+        approximate=True,
+    )
+    return entry_id.decode() if isinstance(entry_id, bytes) else entry_id
+
+
+async def apublish_request_log(values, app: "str | None" = None) -> str:
+    """
+    Async counterpart of `publish_request_log` for the ASGI middleware.
+    """
+    entry_id = await get_async_stream_client().xadd(
+        get_stream_key(),
+        _stream_entry(values, app),
+        maxlen=getattr(settings, "REQUEST_LOG_STREAM_MAXLEN", DEFAULT_MAXLEN),
+        approximate=True,
+    )
+    return entry_id.decode() if isinstance(entry_id, bytes) else entry_id
+
+
+def _copy_value(value) -> str:
+    """
+    Escapes a value for PostgreSQL `COPY ... FROM STDIN` text format.
+    """
+    if value is None:
+        return "\\N"
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+
+
+def _column_value(record: dict, column: str):
+    """
+    Returns the record's value for `column`, falling back to the model default
+    for records published before the column existed.
+    """
+    if column in record:
+        return record[column]
+    return _stream_value(column, _default_value(column))
+
+
+def _copy(table: str, columns: list, rows) -> None:
+    data = io.StringIO()
+    for row in rows:
+        data.write("\t".join(_copy_value(value) for value in row))
+        data.write("\n")
+    data.seek(0)
+
+    columns = ", ".join(connection.ops.quote_name(column) for column in columns)
+    with connection.cursor() as cursor:
+        cursor.copy_expert(f"COPY {table} ({columns}) FROM STDIN", data)
+
+
+def copy_central_records(app: str, records: list) -> int:
+    """
+    Load `records` of application `app` into the central store with a single `COPY`.
+    Returns the number of rows loaded.
+    """
+    schema = get_central_schema()
+    app_id = get_app_id(app, schema)
+    # Ids come from the central table
+    columns = [column for column in central_columns(schema) if column != "id"]
+    rows = ([app_id, *(_column_value(record, column) for column in columns)] for record in records)
+    _copy(central_table(schema), ["app_id", *columns], rows)
+    return len(records)
+
+
+def copy_records(schema: str, records: list) -> int:
+    """
+    Load `records` into `{schema}.request_log_requestlog` with a single `COPY`,
+    or into the central store when `REQUEST_LOG_CENTRAL_SCHEMA` is set.
+    Returns the number of rows loaded.
+    """
+    table = qualified_table(schema)
+    if not records:
+        return 0
+
+    records = [
+        {**record, "route": normalize_route(record["path"], app=schema)} if not record.get("route") and record.get("path") else record
+        for record in records
+    ]
+    if get_central_schema():
+        return copy_central_records(schema, records)
+
+    if is_compact_storage_enabled():
+        # Routes are taken from the plain path, encode afterwards
+        records = encode_records(schema, records)
+
+    rows = ([_column_value(record, column) for column in STREAM_COLUMNS] for record in records)
+    _copy(table, STREAM_COLUMNS, rows)
+    return len(records)
+
+
+class RequestLogStreamConsumer:
+    """
+    Drains the request log stream through a Redis consumer group.
+
+    Entries are acknowledged only after their `COPY` committed, so a worker
+    crash leaves them pending and another consumer reclaims them after
+    `claim_idle_ms` (at-least-once). Run any number of consumers with
+    different names to scale horizontally.
+    """
+
+    def __init__(self, client=None, stream_key=None, group=None, consumer=None,
+                 batch_size=None, block_ms=None, claim_idle_ms=None):
+        self.client = client or get_stream_client()
+        self.stream_key = stream_key or get_stream_key()
+        self.group = group or getattr(settings, "REQUEST_LOG_STREAM_GROUP", DEFAULT_GROUP)
+        self.consumer = consumer or f"{socket.gethostname()}-{os.getpid()}"
+        self.batch_size = batch_size or getattr(settings, "REQUEST_LOG_STREAM_BATCH_SIZE", DEFAULT_BATCH_SIZE)
+        self.block_ms = block_ms
+        self.claim_idle_ms = claim_idle_ms or getattr(settings, "REQUEST_LOG_STREAM_CLAIM_IDLE_MS", DEFAULT_CLAIM_IDLE_MS)
+        self.dead_letter_key = f"{self.stream_key}:dead"
+
+    def ensure_group(self) -> None:
+        try:
+            self.client.xgroup_create(self.stream_key, self.group, id="0", mkstream=True)
+        except redis.ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    def read_batch(self) -> list:
+        """
+        Returns up to `batch_size` entries, reclaiming stale pending entries
+        of dead consumers before reading new ones.
+        """
+        _, claimed, *_ = self.client.xautoclaim(
+            self.stream_key, self.group, self.consumer,
+            min_idle_time=self.claim_idle_ms, start_id="0-0", count=self.batch_size,
+        )
+        if claimed:
+            return claimed
+
+        response = self.client.xreadgroup(
+            self.group, self.consumer, {self.stream_key: ">"},
+            count=self.batch_size, block=self.block_ms,
+        )
+        return response[0][1] if response else []
+
+    def process_batch(self, entries: list, allowed_apps: "set | None" = None) -> dict:
+        """
+        Groups entries per application schema, loads each group with `COPY`
+        and acknowledges them. Entries that can not be loaded are moved to
+        the dead-letter stream so they never block the group.
+        """
+        stats = {"loaded": 0, "dead": 0}
+        by_app = {}
+        for entry_id, fields in entries:
+            if not fields:  # Trimmed by MAXLEN while pending
+                self.client.xack(self.stream_key, self.group, entry_id)
+                continue
+            app = fields[b"app"].decode().lower()
+            by_app.setdefault(app, []).append((entry_id, fields))
+
+        for app, app_entries in by_app.items():
+            if allowed_apps is not None and app not in allowed_apps:
+                stats["dead"] += self._dead_letter(app_entries, "Unknown application")
+                continue
+
+            records = [msgpack.unpackb(fields[b"d"], raw=False) for _, fields in app_entries]
+            try:
+                stats["loaded"] += copy_records(app, records)
+                self.client.xack(self.stream_key, self.group, *[entry_id for entry_id, _ in app_entries])
+            except Exception:
+                logger.exception("COPY of %s request logs into %s failed, retrying one by one.", len(records), app)
+                for entry, record in zip(app_entries, records):
+                    try:
+                        stats["loaded"] += copy_records(app, [record])
+                        self.client.xack(self.stream_key, self.group, entry[0])
+                    except Exception as e:
+                        stats["dead"] += self._dead_letter([entry], str(e))
+        return stats
+
+    def _dead_letter(self, entries: list, reason: str) -> int:
+        pipe = self.client.pipeline()
+        for entry_id, fields in entries:
+            pipe.xadd(self.dead_letter_key, {**fields, "reason": reason[:500]})
+            pipe.xack(self.stream_key, self.group, entry_id)
+        pipe.execute()
+        logger.warning("Moved %s request log entries to %s: %s", len(entries), self.dead_letter_key, reason)
+        return len(entries)
+
+    def drain(self, max_batches: "int | None" = None, allowed_apps: "set | None" = None) -> dict:
+        """
+        Process batches until the stream is empty or `max_batches` is reached.
+        """
+        self.ensure_group()
+        stats = {"batches": 0, "loaded": 0, "dead": 0}
+        while max_batches is None or stats["batches"] < max_batches:
+            entries = self.read_batch()
+            if not entries:
+                break
+            batch_stats = self.process_batch(entries, allowed_apps=allowed_apps)
+            stats["batches"] += 1
+            stats["loaded"] += batch_stats["loaded"]
+            stats["dead"] += batch_stats["dead"]
+        return stats
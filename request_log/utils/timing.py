@@ -0,0 +1,128 @@
+# request_log_timing_util.py
+"""
+High-resolution phase timing for the current request log.
+Phases are measured with `time.perf_counter` and accumulated on the log
+found in the current request context, so they work from any layer
+(authentication classes, renderers, services) without passing it around.
+Queries are counted by a wrapper installed on every connection as it opens
+(`install_query_wrapper`, connected by the app config) that reports to the
+`QueryTimer` of the current context, so the queries of sync views run by
+`sync_to_async` under ASGI, on another thread and connection than the
+middleware, are counted too.
+"""
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from rest_framework.renderers import JSONRenderer
+
+from request_log.utils.threading import get_current_request_log
+
+AUTH_PHASE = "auth"
+SERIALIZE_PHASE = "serialize"
+
+
+def add_phase_time(name: str, elapsed_ms: float) -> None:
+    """
+    Add `elapsed_ms` to phase `name` of the current request log, if any.
+    """
+    req_log = get_current_request_log()
+    if req_log is None:
+        return
+    phases = getattr(req_log, "_phases", None)
+    if phases is None:
+        phases = req_log._phases = {}
+    phases[name] = phases.get(name, 0.0) + elapsed_ms
+
+
+@contextmanager
+def phase(name: str):
+    """
+    Measure the enclosed block as phase `name` of the current request.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        add_phase_time(name, (time.perf_counter() - started) * 1000)
+
+
+def timed_phase(name: str):
+    """
+    Decorator form of `phase`, e.g. on an authentication class' `authenticate`.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with phase(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def get_phase_time(req_log, name: str) -> float:
+    return getattr(req_log, "_phases", {}).get(name, 0.0)
+
+
+class QueryTimer:
+    """
+    `connection.execute_wrapper` that counts queries and their total time.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.total_ms += (time.perf_counter() - started) * 1000
+
+
+_current_query_timer = ContextVar("request_log_query_timer", default=None)
+
+
+def record_query(execute, sql, params, many, context):
+    """
+    `connection.execute_wrapper` handing queries to the `QueryTimer` of the current context, if any.
+    """
+    query_timer = _current_query_timer.get()
+    if query_timer is None:
+        return execute(sql, params, many, context)
+    return query_timer(execute, sql, params, many, context)
+
+
+def install_query_wrapper(sender=None, connection=None, **kwargs):
+    """
+    `connection_created` receiver installing `record_query` once per connection.
+    """
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+@contextmanager
+def instrument_queries(query_timer: QueryTimer):
+    """
+    Count the queries of the current context with `query_timer`, on any
+    thread the context is copied to.
+    """
+    token = _current_query_timer.set(query_timer)
+    try:
+        yield query_timer
+    finally:
+        _current_query_timer.reset(token)
+
+
+class TimedJSONRenderer(JSONRenderer):
+    """
+    `JSONRenderer` that records rendering as the serialization phase.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with phase(SERIALIZE_PHASE):
+            return super().render(data, accepted_media_type, renderer_context)
@@ -0,0 +1,52 @@
+# request_log_watermark_util.py
+"""
+Id watermarks for readers resuming from the last request log id.
+
+Ids are drawn from a sequence before the inserting transaction commits, so a
+row with a lower id can become visible after a higher one, and a reader
+resuming from `MAX(id)` would skip it for good. A commit horizon records the
+newest visible id together with a transaction horizon taken right after it
+was read, and only releases that id once every transaction running at the
+time has ended: by then the lower ids of those transactions are committed or
+rolled back.
+
+A transaction only gets a transaction id when it first writes, and `nextval`
+does not write, so one remaining window is not covered: a transaction that
+drew an id before `MAX(id)` was read but had not written anything yet when
+the horizon was taken. An `INSERT` evaluates its id default and writes the
+row within the same statement, so this takes a stall between the two, or an
+id drawn with `nextval` ahead of its `INSERT`.
+"""
+
+
+def oldest_running_xid(cursor) -> int:
+    """
+    Returns the id of the oldest transaction still running.
+    """
+    cursor.execute("SELECT pg_snapshot_xmin(pg_current_snapshot())::text::bigint")
+    return cursor.fetchone()[0]
+
+
+def advance_commit_horizon(cursor, horizon: dict, source: str, condition: str = "", params: list = None) -> dict:
+    """
+    Returns `horizon` (`safe_id`, `pending_id`, `pending_xid`) moved forward.
+    The pending id becomes safe once no transaction older than `pending_xid`
+    runs anymore, then the newest visible id of `source` is recorded as
+    pending. `condition` is empty or ends in AND, like `WHERE {condition}TRUE`.
+    Readers may stop at `safe_id`, see the module docstring for the window
+    left open.
+    """
+    horizon = {"safe_id": horizon.get("safe_id") or 0, "pending_id": horizon.get("pending_id") or 0, "pending_xid": horizon.get("pending_xid")}
+
+    if horizon["pending_xid"] is not None and oldest_running_xid(cursor) >= horizon["pending_xid"]:
+        horizon["safe_id"] = max(horizon["safe_id"], horizon["pending_id"])
+        horizon["pending_xid"] = None
+
+    if horizon["pending_xid"] is None:
+        cursor.execute(f"SELECT COALESCE(MAX(id), 0) FROM {source} WHERE {condition}TRUE", params or [])
+        horizon["pending_id"] = cursor.fetchone()[0]
+        # Taken after the read, so a transaction that drew a lower id and wrote
+        # while it ran is waited for too, not only those already writing before
+        cursor.execute("SELECT pg_snapshot_xmax(pg_current_snapshot())::text::bigint")
+        horizon["pending_xid"] = cursor.fetchone()[0]
+    return horizon
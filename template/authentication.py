@@ -4,11 +4,13 @@ from api.models import AuthToken
 from request_log.exceptions.api_exception import UnauthorizedException
 from django.contrib.auth.models import AnonymousUser
 from rest_framework_api_key.models import APIKey
+from request_log.utils.timing import AUTH_PHASE, timed_phase
 
 class TokenAuthentication(authentication.BaseAuthentication):
     keyword = 'Token'
     api_key_prefix = 'Api-Key'
 
+    @timed_phase(AUTH_PHASE)
     def authenticate(self, request):
         auth = authentication.get_authorization_header(request).split()
 
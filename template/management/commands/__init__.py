@@ -1,3 +1,8 @@
 from .setup_celery_beat import Command as SetupCeleryBeatCommand
 from .seed_configuration import Command as SeedConfigurationCommand
-from .seed_role import Command as SeedRoleCommand
\ No newline at end of file
+from .seed_role import Command as SeedRoleCommand
+from .consume_request_log_stream import Command as ConsumeRequestLogStreamCommand
+from .ensure_request_log_indexes import Command as EnsureRequestLogIndexesCommand
+from .partition_request_logs import Command as PartitionRequestLogsCommand
+from .normalize_request_log_routes import Command as NormalizeRequestLogRoutesCommand
+from .refresh_request_log_view import Command as RefreshRequestLogViewCommand
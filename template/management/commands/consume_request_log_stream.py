@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from api.models import Application
+from request_log.utils.stream import RequestLogStreamConsumer
+
+class Command(BaseCommand):
+    help = "Run a standalone consumer that loads the request log stream into PostgreSQL"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--consumer', help="Consumer name, defaults to <hostname>-<pid>")
+        parser.add_argument('--batch-size', type=int, help="Entries loaded per COPY")
+        parser.add_argument('--block-ms', type=int, default=5000, help="How long to wait for new entries")
+
+    def handle(self, *args, **options):
+        consumer = RequestLogStreamConsumer(
+            consumer=options['consumer'],
+            batch_size=options['batch_size'],
+            block_ms=options['block_ms'],
+        )
+        self.stdout.write(self.style.SUCCESS(f"Consuming {consumer.stream_key} as {consumer.consumer}."))
+
+        while True:
+            # Refresh on every round so newly registered applications are accepted
+            allowed_apps = {app.lower() for app in Application.objects.values_list('app', flat=True)}
+            stats = consumer.drain(max_batches=1, allowed_apps=allowed_apps)
+            if stats['batches']:
+                self.stdout.write(f"Loaded {stats['loaded']} request logs ({stats['dead']} dead-lettered).")
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models.functions import Lower
+from api.models import Application
+from request_log.utils.indexes import ensure_indexes, VALID, CREATED
+
+class Command(BaseCommand):
+    help = "Create and verify request log indexes concurrently in every application schema"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--app', action='append', help="Only this application schema (repeatable)")
+        parser.add_argument('--check', action='store_true', help="Only report index status, do not build anything")
+
+    def handle(self, *args, **options):
+        applications = Application.objects.all()
+        if options['app']:
+            # Schemas are the lowercased application names, match them either way
+            applications = applications.annotate(app_lower=Lower('app')).filter(app_lower__in=[app.lower() for app in options['app']])
+
+        failed = False
+        for app in applications.values_list('app', flat=True):
+            schema = app.lower()
+            try:
+                results = ensure_indexes(schema, check_only=options['check'])
+            except Exception as e:
+                failed = True
+                self.stdout.write(self.style.ERROR(f"{schema}: {e}"))
+                continue
+
+            for result in results:
+                message = f"{schema}.{result['index']}: {result['status']}"
+                if result['status'] in (VALID, CREATED):
+                    self.stdout.write(self.style.SUCCESS(message))
+                else:
+                    failed = True
+                    self.stdout.write(self.style.WARNING(message))
+
+        if failed:
+            raise CommandError("Some request log indexes are missing or invalid.")
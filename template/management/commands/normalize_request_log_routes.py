@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from api.models import Application
+from request_log.utils.routes import normalize_route
+from request_log.utils.schema import qualified_table
+
+class Command(BaseCommand):
+    help = "Fill the route of request logs stored before routes were normalized at ingest"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--app', action='append', help="Only this application schema (repeatable)")
+        parser.add_argument('--batch-size', type=int, default=5000, help="Rows updated per transaction")
+
+    def handle(self, *args, **options):
+        applications = Application.objects.all()
+        if options['app']:
+            applications = applications.filter(app__in=options['app'])
+
+        failed = False
+        for app in applications.values_list('app', flat=True):
+            schema = app.lower()
+            try:
+                updated = self.backfill(schema, options['batch_size'])
+                self.stdout.write(self.style.SUCCESS(f"{schema}: {updated} routes filled"))
+            except Exception as e:
+                failed = True
+                self.stdout.write(self.style.ERROR(f"{schema}: {e}"))
+
+        if failed:
+            raise CommandError("Some request log routes could not be filled.")
+
+    def backfill(self, schema, batch_size):
+        table = qualified_table(schema)
+        updated, last_id = 0, 0
+        while True:
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute(
+                    f"SELECT id, path FROM {table} WHERE route IS NULL AND id > %s ORDER BY id LIMIT %s",
+                    [last_id, batch_size],
+                )
+                rows = cursor.fetchall()
+                if not rows:
+                    return updated
+
+                # Distinct paths repeat a lot, normalize each once
+                routes = {path: normalize_route(path, app=schema) for path in {path for _, path in rows}}
+                cursor.executemany(
+                    f"UPDATE {table} SET route = %s WHERE id = %s AND route IS NULL",
+                    [(routes[path], row_id) for row_id, path in rows],
+                )
+            updated += len(rows)
+            last_id = rows[-1][0]
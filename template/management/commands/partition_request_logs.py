@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+from api.models import Application
+from request_log.utils.partitions import DAILY, WEEKLY, convert_to_partitioned, ensure_partitions, is_partitioned, list_partitions
+
+class Command(BaseCommand):
+    help = "Convert request log tables to time partitioned tables and pre-create upcoming partitions"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--app', action='append', help="Only this application schema (repeatable)")
+        parser.add_argument('--interval', choices=[DAILY, WEEKLY], help="Partition interval, defaults to REQUEST_LOG_PARTITION_INTERVAL")
+        parser.add_argument('--check', action='store_true', help="Only list partitions, do not convert anything")
+
+    def handle(self, *args, **options):
+        applications = Application.objects.all()
+        if options['app']:
+            applications = applications.filter(app__in=options['app'])
+
+        failed = False
+        for app in applications.values_list('app', flat=True):
+            schema = app.lower()
+            try:
+                if options['check']:
+                    partitions = list_partitions(schema) if is_partitioned(schema) else []
+                    self.stdout.write(f"{schema}: {len(partitions)} partitions")
+                    for name, lower, upper in partitions:
+                        self.stdout.write(f"  {name}: {lower or 'MINVALUE'} -> {upper or 'MAXVALUE'}")
+                    continue
+
+                if is_partitioned(schema):
+                    created = ensure_partitions(schema, interval=options['interval'])
+                    self.stdout.write(self.style.WARNING(f"{schema}: already partitioned, created {len(created)} partitions"))
+                    continue
+
+                legacy = convert_to_partitioned(schema, interval=options['interval'])
+                self.stdout.write(self.style.SUCCESS(f"{schema}: partitioned, existing rows kept in {legacy}"))
+            except Exception as e:
+                failed = True
+                self.stdout.write(self.style.ERROR(f"{schema}: {e}"))
+
+        if failed:
+            raise CommandError("Some request log tables could not be partitioned.")
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+from api.models import Application
+from api.utils.matview import VIEW_NAME, get_view_signature, refresh_view
+from api.views.request_log_view import RequestLogView
+
+class Command(BaseCommand):
+    help = "Create or concurrently refresh the materialized view combining every application's request logs"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true', help="Rebuild the view even if its applications and columns did not change")
+        parser.add_argument('--check', action='store_true', help="Only show what the view was built for")
+
+    def handle(self, *args, **options):
+        if options['check']:
+            signature = get_view_signature()
+            if signature is None:
+                self.stdout.write(self.style.WARNING(f"{VIEW_NAME} does not exist"))
+            else:
+                self.stdout.write(f"{VIEW_NAME}: {signature}")
+            return
+
+        apps = [app.lower() for app in Application.objects.values_list('app', flat=True)]
+        try:
+            stats = refresh_view(apps, RequestLogView.GUEST_COLUMNS, rebuild=options['rebuild'])
+        except Exception as e:
+            raise CommandError(f"Could not refresh {VIEW_NAME}: {e}")
+
+        action = "rebuilt" if stats['rebuilt'] else "refreshed"
+        self.stdout.write(self.style.SUCCESS(f"{VIEW_NAME} {action} for {len(apps)} applications, ~{stats['rows']} rows in {stats['elapsed_ms']} ms"))
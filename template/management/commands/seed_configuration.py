@@ -13,7 +13,8 @@ class Command(BaseCommand):
             ("DEFAULT_DATE_RANGE", "7D"),
             ("ERROR_RATE_THRESHOLD", "5"),
             ("ERROR_THRESHOLD", "25"),
-            ("RESPONSE_TIME_THRESHOLD", "10"),
+            ("RESPONSE_TIME_THRESHOLD", "10000"),  # milliseconds
+            ("RETENTION_DAYS", "{}"),  # Keep every log until a policy is set, override per app with RETENTION_DAYS_<APP>
             ("APPLICATIONS", f"['{POSTGRES_SCHEMA}']")
         ]
 
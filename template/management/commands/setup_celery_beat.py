@@ -20,4 +20,78 @@ class Command(BaseCommand):
         if created:
             self.stdout.write(self.style.SUCCESS("Periodic task created!"))
         else:
-            self.stdout.write(self.style.WARNING("Task already exists."))
\ No newline at end of file
+            self.stdout.write(self.style.WARNING("Task already exists."))
+
+        self.create_interval_task(
+            name="Consume Request Log Stream",
+            task="api.tasks.consume_request_log_stream",
+            every=10,
+            period=IntervalSchedule.SECONDS,
+        )
+
+        self.create_interval_task(
+            name="Enrich Request Log Locations",
+            task="api.tasks.enrich_request_log_locations",
+            every=5,
+            period=IntervalSchedule.SECONDS,
+        )
+
+        self.create_interval_task(
+            name="Create Request Log Partitions",
+            task="api.tasks.create_request_log_partitions",
+            every=1,
+            period=IntervalSchedule.HOURS,
+        )
+
+        self.create_interval_task(
+            name="Purge Request Logs",
+            task="api.tasks.purge_request_logs",
+            every=1,
+            period=IntervalSchedule.HOURS,
+        )
+
+        self.create_interval_task(
+            name="Update Request Log Rollups",
+            task="api.tasks.update_request_log_rollups",
+            every=1,
+            period=IntervalSchedule.MINUTES,
+        )
+
+        self.create_interval_task(
+            name="Compact Request Log Rollups",
+            task="api.tasks.compact_request_log_rollups",
+            every=15,
+            period=IntervalSchedule.MINUTES,
+        )
+
+        self.create_interval_task(
+            name="Sync Central Request Log Store",
+            task="api.tasks.sync_central_request_logs",
+            every=1,
+            period=IntervalSchedule.MINUTES,
+        )
+
+        self.create_interval_task(
+            name="Refresh Request Log Materialized View",
+            task="api.tasks.refresh_request_log_view",
+            every=5,
+            period=IntervalSchedule.MINUTES,
+        )
+
+    def create_interval_task(self, name, task, every, period):
+        schedule, _ = IntervalSchedule.objects.get_or_create(
+            every=every,
+            period=period,
+        )
+
+        _, created = PeriodicTask.objects.get_or_create(
+            name=name,
+            task=task,
+            interval=schedule,
+            defaults={'enabled': True},
+        )
+
+        if created:
+            self.stdout.write(self.style.SUCCESS(f"Periodic task '{name}' created!"))
+        else:
+            self.stdout.write(self.style.WARNING(f"Task '{name}' already exists."))
\ No newline at end of file
@@ -1,50 +1,58 @@
 # user_threading_util.py
 """
-Utils for storing/accessing something within a local thread.
+Utils for storing/accessing something within the current request context.
 These utils are usually used, but not limited to, middlewares.
+
+Values live in `contextvars`, which are isolated per thread under WSGI and
+per task under ASGI, and are copied into `sync_to_async` threads so sync
+views and exception handlers see the value set by an async middleware.
 """
 
-from threading import local
+from contextvars import ContextVar
 
 from request_log.models.request_log_model import RequestLog
 
-_local_thread = local()
+_current_user = ContextVar("user", default="")
+_current_user_id = ContextVar("user_id", default=0)
+_current_request = ContextVar("request", default=None)
+_current_request_log = ContextVar("request_log", default=None)
+_current_role = ContextVar("role", default="")
 
 
 def get_current_user() -> str:
     """
-    Returns current thread's `user`.
+    Returns current context's `user`.
     Guaranteed to always return string (including empty)
     """
-    return getattr(_local_thread, "user", "")
+    return _current_user.get()
 
 
 def set_current_user(user: str) -> None:
     """
-    Set current thread's `user`
+    Set current context's `user`
     """
     assert isinstance(user, str), "`user` must be string"
-    _local_thread.user = user
+    _current_user.set(user)
 
 
 def get_current_request_log() -> "RequestLog | None":
     """
-    Returns current thread's `request_log`,
+    Returns current context's `request_log`,
     either `RequestLog` instance or `None`
 
     Used in log 500 middleware
     """
-    return getattr(_local_thread, "request_log", None)
+    return _current_request_log.get()
 
 
 def set_current_request_log(request_log: RequestLog):
     """
-    Set current thread's `request_log`. Used in request log middleware
+    Set current context's `request_log`. Used in request log middleware
     """
     assert isinstance(
         request_log, RequestLog
     ), "`request_log` must be `RequestLog` instance"
-    _local_thread.request_log = request_log
+    _current_request_log.set(request_log)
 
 
 # functions below are not used in template, but exists in other apps. for reference only
@@ -52,50 +60,50 @@ def set_current_request_log(request_log: RequestLog):
 
 def get_current_user_id() -> int:
     """
-    Returns current thread's `user_id`.
+    Returns current context's `user_id`.
     Guaranteed to always return int (including 0 if invalid)
     """
-    return getattr(_local_thread, "user_id", 0)
+    return _current_user_id.get()
 
 
 def set_current_user_id(user_id: "int | str") -> None:
     """
-    Set current thread's `user_id`
+    Set current context's `user_id`
     """
     assert isinstance(user_id, (int, str)), "`user_id` must be `int` or `str`"
-    _local_thread.user_id = str(user_id)
+    _current_user_id.set(str(user_id))
 
 
 def get_current_request():
     """
-    Returns current thread's `request`
+    Returns current context's `request`
 
     Commonly used to get `delete_reason` when doing
     soft-delete (if needed, based on requirement)
     """
-    return getattr(_local_thread, "request", None)
+    return _current_request.get()
 
 
 def set_current_request(request):
     """
-    Set current thread's `request`
+    Set current context's `request`
 
     Commonly used to get current request from incoming request
     """
-    _local_thread.request = request
+    _current_request.set(request)
 
 
 def get_current_role() -> str:
     """
-    Returns current thread's `role`.
+    Returns current context's `role`.
     Guaranteed to always return string (including empty)
     """
-    return getattr(_local_thread, "role", "")
+    return _current_role.get()
 
 
 def set_current_role(role: str) -> None:
     """
-    Set current thread's `role`
+    Set current context's `role`
     """
     assert isinstance(role, str), "`role` must be string"
-    _local_thread.role = role
\ No newline at end of file
+    _current_role.set(role)
\ No newline at end of file